@@ -0,0 +1,73 @@
+"""Benchmark of the Prometheus JSON -> DataFrame conversion path.
+
+Compares the previous row-by-row conversion (per-row numpy rows, per-row strftime and string
+re-parsing) with the columnar conversion path for synthetic query_range results.
+
+Usage:
+    python -m benchmarks.bench_ingest [--samples 1000000] [--series 1]
+"""
+# standard imports
+import argparse
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# custom imports
+from f3tch import timeseries
+
+
+def synthetic_result(num_samples, num_series, step_size=15, start=1652904485):
+    """Build the result list of a synthetic query_range response"""
+    per_series = num_samples // num_series
+    return [{"metric": {"series": str(i)},
+             "values": [[start + step_size * j, str((i * per_series + j) % 1000 / 7)]
+                        for j in range(per_series)]}
+            for i in range(num_series)]
+
+
+def legacy_conversion(result, metric_name):
+    """Conversion path used before the columnar ingestion"""
+    time_series = []
+    for _result in result:
+        time_series.extend(np.asarray(_result.get("values", []), float))
+    time_series_df = pd.DataFrame(time_series, columns=["timestamp", metric_name])
+    time_series_df.timestamp = time_series_df.timestamp.apply(
+        lambda y: datetime.fromtimestamp(y).strftime('%Y-%m-%d %H:%M:%S')).astype("datetime64[ns]")
+    return time_series_df.set_index("timestamp")
+
+
+def columnar_conversion(result, metric_name):
+    """Columnar conversion path"""
+    columns = [np.column_stack(timeseries.values_to_columns(_result.get("values", [])))
+               for _result in result]
+    return timeseries.array_to_dataframe(np.concatenate(columns), metric_name)
+
+
+def measure(func, *args):
+    """Run func once and return (elapsed seconds, result)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    """Run the benchmark and print the timings"""
+    parser = argparse.ArgumentParser("bench_ingest")
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--series", type=int, default=1)
+    args = parser.parse_args()
+
+    result = synthetic_result(args.samples, args.series)
+    legacy_time, legacy_df = measure(legacy_conversion, result, "metric")
+    columnar_time, columnar_df = measure(columnar_conversion, result, "metric")
+
+    assert legacy_df.equals(columnar_df), "conversion paths disagree"
+    print(f"samples={args.samples} series={args.series}")
+    print(f"legacy   : {legacy_time:8.3f}s")
+    print(f"columnar : {columnar_time:8.3f}s")
+    print(f"speedup  : {legacy_time / columnar_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
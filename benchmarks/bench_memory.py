@@ -0,0 +1,69 @@
+"""Peak memory benchmark of query_range response parsing.
+
+Compares decoding the whole response with json.loads and converting it to numpy arrays
+afterwards with the streaming parser, for a synthetic response. Peak memory is measured
+with tracemalloc and reported relative to the size of the final sample arrays.
+
+Usage:
+    python -m benchmarks.bench_memory [--series 100] [--samples 20000]
+"""
+# standard imports
+import argparse
+import io
+import json
+import time
+import tracemalloc
+import numpy as np
+
+# custom imports
+from f3tch import parser
+from benchmarks.synthetic import query_range_payload
+
+
+def parse_json_tree(body):
+    """Parsing path used before the streaming parser: the payload is decoded as one string
+    and materialized as a JSON tree before the numpy arrays are built"""
+    output = json.loads(body.read().decode("utf8"), strict=False)
+    return [(result.get("metric", {}), np.asarray(result.get("values", []), float))
+            for result in output["data"]["result"]]
+
+
+def parse_streaming(body):
+    """Streaming parsing path"""
+    return parser.parse_query_range(body)[2]
+
+
+def measure(func, payload):
+    """Run func over payload and return (elapsed seconds, peak bytes, sample array bytes).
+    The timing run is separate from the traced run, as tracemalloc slows allocations down."""
+    start = time.perf_counter()
+    func(io.BytesIO(payload))
+    elapsed = time.perf_counter() - start
+
+    body = io.BytesIO(payload)
+    tracemalloc.start()
+    series = func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, sum(values.nbytes for _, values in series)
+
+
+def main():
+    """Run the benchmark and print the measurements"""
+    arg_parser = argparse.ArgumentParser("bench_memory")
+    arg_parser.add_argument("--series", type=int, default=100)
+    arg_parser.add_argument("--samples", type=int, default=20000,
+                            help="samples per series")
+    args = arg_parser.parse_args()
+
+    payload = query_range_payload(args.series, args.samples)
+    print(f"series={args.series} samples/series={args.samples} "
+          f"payload={len(payload) / 1024 ** 2:.1f}MiB")
+    for name, func in (("json tree", parse_json_tree), ("streaming", parse_streaming)):
+        elapsed, peak, array_bytes = measure(func, payload)
+        print(f"{name:10}: {elapsed:7.3f}s  peak={peak / 1024 ** 2:8.1f}MiB  "
+              f"arrays={array_bytes / 1024 ** 2:6.1f}MiB  peak/arrays={peak / array_bytes:5.2f}")
+
+
+if __name__ == '__main__':
+    main()
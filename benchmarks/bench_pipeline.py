@@ -0,0 +1,239 @@
+"""End-to-end benchmark of the processing pipeline with regression thresholds.
+
+Each scenario serves a synthetic query_range response through a fake transport and runs it
+through every stage of a f3tch run:
+
+    parse -> dataframe -> slicing -> rolling -> plot -> save
+
+recording the wall time of each stage and the peak resident set size (RSS) of the process
+at the end of each stage. Every scenario runs in a fresh process, so that its peak RSS is
+not inflated by the previous ones.
+
+Measurements can be stored as baselines, and later runs compared against them: the
+benchmark exits with a non-zero status when a stage takes more than --threshold longer, or
+its peak RSS grows by more than --rss-threshold, than in the baseline.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--scenario small medium] [--repeat 3]
+        [--save-baseline] [--baseline benchmarks/baselines.json] [--threshold 0.25]
+"""
+# standard imports
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# custom imports
+from f3tch import core, export, parser, rolling
+from f3tch.render import Renderer
+from f3tch.series import SeriesSet
+from f3tch.slices import TimeSliceIndex
+from benchmarks.synthetic import FakeTransport
+
+STAGES = ["parse", "dataframe", "slicing", "rolling", "plot", "save"]
+# (number of series, samples per series)
+SCENARIOS = {"small": (1, 10_000),
+             "medium": (10, 100_000),
+             "wide": (1_000, 10_000),
+             "long": (1, 10_000_000)}
+DEFAULT_SCENARIOS = ["small", "medium"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+STEP_SIZE = 15
+START = 1652904485
+
+
+def peak_rss():
+    """Peak resident set size of the current process, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _metric(num_samples, moving_window):
+    """Metric information of a scenario, with two time-slices over its first and last third"""
+    to_timestamp = START + STEP_SIZE * (num_samples - 1)
+    third = (to_timestamp - START) // 3
+
+    def time_range(from_timestamp, to_timestamp):
+        return [datetime.fromtimestamp(timestamp).strftime("%d.%m.%Y %H:%M:%S")
+                for timestamp in (from_timestamp, to_timestamp)]
+
+    return {"metric_name": "container_cpu_usage_seconds_total",
+            "from_timestamp": START, "to_timestamp": to_timestamp, "step_size": STEP_SIZE,
+            "moving_window": moving_window, "moving_quantiles": [],
+            "time_slices": [{"label": "first", "color": "green",
+                             "time_range": time_range(START, START + third)},
+                            {"label": "last", "color": "red",
+                             "time_range": time_range(to_timestamp - third, to_timestamp)}],
+            "plot_title": "benchmark", "plot_color": "blue",
+            "plot_time_slices_overlaid": True}
+
+
+def run_scenario(num_series, samples_per_series, moving_window=20, plotted_series=1,
+                 output_format="parquet"):
+    """Run a scenario once, in the current process
+
+    Args:
+        num_series (int): number of series of the response
+        samples_per_series (int): number of samples per series
+        moving_window (int, optional): rolling statistics window. Defaults to 20.
+        plotted_series (int, optional): number of series plotted. Defaults to 1.
+        output_format (str, optional): export format. Defaults to "parquet".
+
+    Returns:
+        (dict): seconds and peak_rss of each stage, and of the whole pipeline under "total"
+    """
+    fake_transport = FakeTransport(num_series, samples_per_series, step_size=STEP_SIZE,
+                                   start=START)
+    metric = _metric(samples_per_series, moving_window)
+    results = {}
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        results[name] = {"seconds": time.perf_counter() - start, "peak_rss": peak_rss()}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        with stage("parse"):
+            with fake_transport.stream("/api/v1/query_range", {}) as body:
+                _, _, series = parser.parse_query_range(body, capacity=samples_per_series)
+            series_set = SeriesSet.from_series(metric["metric_name"], series)
+        with stage("dataframe"):
+            time_series_df = series_set.to_dataframe()
+        with stage("slicing"):
+            slice_index = TimeSliceIndex(time_series_df.index, metric["time_slices"])
+            for _, from_index, to_index in slice_index:
+                time_series_df.iloc[from_index:to_index]
+        with stage("rolling"):
+            rolling_stats = rolling.compute_rolling_stats(time_series_df, moving_window)
+        with stage("plot"):
+            renderer = Renderer(headless=True)
+            for i, column in enumerate(time_series_df.columns[:plotted_series]):
+                core.plot(metric, time_series_df[[column]], column, metric["plot_title"],
+                          os.path.join(output_dir, f"plot_{i}.png"), True, renderer,
+                          slice_index, rolling_stats[column])
+            renderer.close()
+        with stage("save"):
+            export.save(time_series_df, os.path.join(output_dir, "data"),
+                        output_format=output_format)
+        results["total"] = {"seconds": time.perf_counter() - start, "peak_rss": peak_rss()}
+    return results
+
+
+def measure(scenario, repeat=1, **kwargs):
+    """Run a scenario repeat times, each in a fresh process
+
+    Args:
+        scenario (str): scenario name, one of SCENARIOS
+        repeat (int, optional): number of runs. Defaults to 1.
+        **kwargs: run_scenario arguments
+
+    Returns:
+        (dict): fastest seconds and lowest peak_rss of each stage over the runs
+    """
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            runs.append(executor.submit(run_scenario, *SCENARIOS[scenario], **kwargs).result())
+    return {name: {"seconds": min(run[name]["seconds"] for run in runs),
+                   "peak_rss": min(run[name]["peak_rss"] for run in runs)}
+            for name in STAGES + ["total"]}
+
+
+def compare(results, baselines, threshold=0.25, rss_threshold=0.25, min_seconds=0.05):
+    """Compare measurements against baselines
+
+    Args:
+        results (dict): measurements of each scenario, as returned by measure
+        baselines (dict): baseline measurements of each scenario
+        threshold (float, optional): tolerated relative increase of the stage wall time.
+            Defaults to 0.25.
+        rss_threshold (float, optional): tolerated relative increase of the stage peak RSS.
+            Defaults to 0.25.
+        min_seconds (float, optional): wall time increases below this many seconds are
+            never reported, as noise. Defaults to 0.05.
+
+    Returns:
+        list(str): description of each regression, empty if none
+    """
+    regressions = []
+    for scenario, stages in results.items():
+        for name, result in stages.items():
+            baseline = baselines.get(scenario, {}).get(name)
+            if baseline is None:
+                continue
+            seconds, baseline_seconds = result["seconds"], baseline["seconds"]
+            if seconds > baseline_seconds * (1 + threshold) and \
+                    seconds - baseline_seconds > min_seconds:
+                regressions.append(f"{scenario}/{name}: {seconds:.3f}s vs "
+                                   f"{baseline_seconds:.3f}s baseline")
+            if result["peak_rss"] > baseline["peak_rss"] * (1 + rss_threshold):
+                regressions.append(f"{scenario}/{name}: peak RSS "
+                                   f"{result['peak_rss'] / 1024 ** 2:.1f}MiB vs "
+                                   f"{baseline['peak_rss'] / 1024 ** 2:.1f}MiB baseline")
+    return regressions
+
+
+def main():
+    """Run the benchmark, print the measurements and compare them against the baselines"""
+    arg_parser = argparse.ArgumentParser("bench_pipeline")
+    arg_parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS),
+                            default=DEFAULT_SCENARIOS)
+    arg_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs per scenario, the fastest one is kept")
+    arg_parser.add_argument("--moving-window", type=int, default=20)
+    arg_parser.add_argument("--plotted-series", type=int, default=1)
+    arg_parser.add_argument("--output-format", default="parquet")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                            help="baseline file")
+    arg_parser.add_argument("--save-baseline", action="store_true",
+                            help="store the measurements as the baselines of their scenarios")
+    arg_parser.add_argument("--threshold", type=float, default=0.25,
+                            help="tolerated relative increase of a stage wall time")
+    arg_parser.add_argument("--rss-threshold", type=float, default=0.25,
+                            help="tolerated relative increase of a stage peak RSS")
+    args = arg_parser.parse_args()
+
+    results = {}
+    for scenario in args.scenario:
+        num_series, samples_per_series = SCENARIOS[scenario]
+        results[scenario] = measure(scenario, repeat=args.repeat,
+                                    moving_window=args.moving_window,
+                                    plotted_series=args.plotted_series,
+                                    output_format=args.output_format)
+        print(f"{scenario}: series={num_series} samples/series={samples_per_series}")
+        for name, result in results[scenario].items():
+            print(f"  {name:10}: {result['seconds']:8.3f}s  "
+                  f"peak RSS={result['peak_rss'] / 1024 ** 2:8.1f}MiB")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf8") as file:
+            baselines = json.load(file)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w", encoding="utf8") as file:
+            json.dump(baselines, file, indent=2)
+        print(f"Baselines saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baselines, threshold=args.threshold,
+                          rss_threshold=args.rss_threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
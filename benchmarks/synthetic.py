@@ -0,0 +1,81 @@
+"""Synthetic Prometheus query_range responses for benchmarks
+"""
+
+# standard imports
+import io
+import random
+from contextlib import contextmanager
+
+# custom imports
+from f3tch import transport
+
+
+def query_range_payload(num_series, samples_per_series, step_size=15, start=1652904485,
+                        seed=0):
+    """Build the body of a synthetic query_range response
+
+    Args:
+        num_series (int): number of series in the result
+        samples_per_series (int): number of samples per series
+        step_size (int, optional): step between samples in seconds. Defaults to 15.
+        start (int, optional): timestamp of the first sample. Defaults to 1652904485.
+        seed (int, optional): random seed of the sample values. Defaults to 0.
+
+    Returns:
+        (bytes): JSON encoded response body
+    """
+    rng = random.Random(seed)
+    results = []
+    for i in range(num_series):
+        labels = (f'{{"__name__":"container_cpu_usage_seconds_total","namespace":"ns-{i % 50}",'
+                  f'"pod":"pod-{i}","container":"app"}}')
+        values = ",".join(f'[{start + step_size * j},"{rng.random() * 100:.6g}"]'
+                          for j in range(samples_per_series))
+        results.append(f'{{"metric":{labels},"values":[{values}]}}')
+    return ('{"status":"success","data":{"resultType":"matrix","result":['
+            + ",".join(results) + ']}}').encode("utf8")
+
+
+class FakeTransport(transport.Transport):
+    """Transport serving synthetic query_range responses without any cluster, in chunks of
+    the size a socket read would return
+    """
+
+    def __init__(self, num_series, samples_per_series, step_size=15, start=1652904485,
+                 seed=0, chunk_size=64 * 1024):
+        """Intialization function
+
+        Args:
+            num_series (int): number of series of every response
+            samples_per_series (int): number of samples per series of every response
+            step_size (int, optional): step between samples in seconds. Defaults to 15.
+            start (int, optional): timestamp of the first sample. Defaults to 1652904485.
+            seed (int, optional): random seed of the sample values. Defaults to 0.
+            chunk_size (int, optional): maximum number of bytes returned by a single read.
+                Defaults to 64KiB.
+        """
+        self.payload = query_range_payload(num_series, samples_per_series, step_size=step_size,
+                                           start=start, seed=seed)
+        self.chunk_size = chunk_size
+        self.requests = []
+
+    def get(self, path, params):
+        self.requests.append((path, params))
+        return self.payload
+
+    @contextmanager
+    def stream(self, path, params):
+        self.requests.append((path, params))
+        yield _ChunkedReader(self.payload, self.chunk_size)
+
+
+class _ChunkedReader(io.BytesIO):
+    """In-memory binary stream returning at most chunk_size bytes per read"""
+
+    def __init__(self, payload, chunk_size):
+        super().__init__(payload)
+        self.chunk_size = chunk_size
+
+    def read(self, size=-1):
+        size = self.chunk_size if size is None or size < 0 else min(size, self.chunk_size)
+        return super().read(size)
@@ -6,7 +6,7 @@ import argparse
 import sys
 
 #custom imports
-from f3tch import core
+from f3tch import cache, decimate, discovery, export, tunnel
 from f3tch.status import ExitStatus
 
 
@@ -18,9 +18,127 @@ def get_parser():
     """
     parser = argparse.ArgumentParser("f3tch")
     parser.add_argument("-k", "--kubeconfig", dest="kubeconfig", required=True,
-                        help="kubeconfig file path")
+                        action="append",
+                        help="kubeconfig file path, repeated to query several clusters at once")
+    parser.add_argument("--context", dest="context", action="append", default=None,
+                        help="kubeconfig context of the cluster to query instead of the \
+                            current-context, repeated to query several clusters at once")
+    parser.add_argument("--compare-clusters", dest="compare_clusters", action='store_true',
+                        help="Also plot the series of every cluster on the same axes when \
+                            several clusters are queried")
     parser.add_argument("-d", "--data-specification", dest="data_spec_file", required=True,
                         help="JSON formatted data specification file")
+    parser.add_argument("--prometheus-pod", dest="prometheus_fqname",
+                        default=discovery.DEFAULT_PROMETHEUS_FQNAME,
+                        help="Fully qualified Prometheus pod name (namespace:pod/name)")
+    parser.add_argument("--prometheus-namespace", dest="prometheus_namespace", default=None,
+                        help="Namespace searched for the Prometheus pod with \
+                            --prometheus-selector (defaults to the namespace of \
+                            --prometheus-pod)")
+    parser.add_argument("--prometheus-selector", dest="prometheus_selector", default=None,
+                        help="Label selector of the Prometheus pod, e.g. \
+                            app.kubernetes.io/name=prometheus")
+    parser.add_argument("--discovery-cache-ttl", dest="discovery_cache_ttl", type=int,
+                        default=discovery.DEFAULT_CACHE_TTL,
+                        help="Seconds the discovered Prometheus pod is cached on disk \
+                            (0 disables the discovery cache)")
+    parser.add_argument("-u", "--prometheus-url", dest="prometheus_url", default=None,
+                        action="append",
+                        help="Prometheus route URL, service URL or local port-forward URL to \
+                            query directly over HTTP instead of through `oc exec`; given as \
+                            <cluster>=<url> once per cluster when several are queried")
+    parser.add_argument("--ca-bundle", dest="ca_bundle", default=None,
+                        help="CA bundle used to verify the Prometheus TLS certificate")
+    parser.add_argument("--insecure-skip-tls-verify", dest="insecure_skip_tls_verify",
+                        action='store_true',
+                        help="Do not verify the Prometheus TLS certificate")
+    parser.add_argument("--exec-compression", dest="exec_compression", action='store_true',
+                        help="Have Prometheus gzip the responses sent back through `oc exec` \
+                            (requires sh and base64 in the Prometheus pod)")
+    parser.add_argument("--port-forward", dest="port_forward", action='store_true',
+                        help="Query the Prometheus pod through a single `oc port-forward` kept \
+                            open for the run instead of one `oc exec` per request")
+    parser.add_argument("--port-forward-port", dest="port_forward_port", type=int,
+                        default=tunnel.DEFAULT_REMOTE_PORT,
+                        help="Prometheus pod port forwarded to with --port-forward")
+    parser.add_argument("-j", "--max-concurrent-queries", dest="max_concurrent_queries",
+                        type=int, default=None,
+                        help="Maximum number of Prometheus queries in flight at any time per \
+                            cluster (overrides max_concurrent_queries in the data \
+                            specification file)")
+    parser.add_argument("--max-points-per-request", dest="max_points_per_request",
+                        type=int, default=None,
+                        help="Maximum number of points per series requested by a single \
+                            query_range request; longer windows are split into sub-ranges \
+                            (overrides max_points_per_request in the data specification file)")
+    parser.add_argument("--chunk-concurrency", dest="chunk_concurrency", type=int, default=None,
+                        help="Maximum number of sub-range requests of a single metric in flight \
+                            (overrides chunk_concurrency in the data specification file)")
+    parser.add_argument("--no-cache", dest="no_cache", action='store_true',
+                        help="Bypass the local cache of fetched time-series data")
+    parser.add_argument("--purge-cache", dest="purge_cache", action='store_true',
+                        help="Remove all cached time-series data before fetching")
+    parser.add_argument("--cache-dir", dest="cache_dir", default=cache.DEFAULT_CACHE_DIR,
+                        help="Directory of the local cache of fetched time-series data")
+    parser.add_argument("--cache-max-size", dest="cache_max_size", type=int,
+                        default=cache.DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="Maximum size in MiB of the local cache of fetched time-series \
+                            data; the least recently used entries are evicted beyond it")
+    parser.add_argument("--cache-mutable-horizon", dest="cache_mutable_horizon", type=int,
+                        default=cache.DEFAULT_MUTABLE_HORIZON,
+                        help="Samples more recent than this many seconds are always re-fetched")
+    parser.add_argument("-f", "--output-format", dest="output_format", default=None,
+                        choices=list(export.FORMATS),
+                        help="Format the fetched data is saved in \
+                            (overrides output_format in the data specification file)")
+    parser.add_argument("--compression", dest="compression", default=None,
+                        help="Compression codec the fetched data is saved with, or none \
+                            (overrides output_compression in the data specification file)")
+    parser.add_argument("--dataset", dest="dataset", action='store_true', default=None,
+                        help="Save the data of all metrics into one dataset partitioned by \
+                            metric instead of one file per metric")
+    parser.add_argument("-o", "--output-dir", dest="output_dir", default=None,
+                        help="Directory the fetched data is saved in \
+                            (overrides output_directory in the data specification file)")
+    parser.add_argument("--float32", dest="value_dtype", action='store_const', const="float32",
+                        default=None,
+                        help="Hold the fetched values as float32 on the step grid of each \
+                            metric, halving their memory at the cost of precision")
+    parser.add_argument("--memmap-dir", dest="memmap_dir", default=None,
+                        help="Hold the fetched values in memory-mapped files created in this \
+                            directory instead of in memory")
+    parser.add_argument("--stream-memory", dest="stream_memory", type=float, default=None,
+                        metavar="MIB",
+                        help="Fetch, save and plot each metric in consecutive chunks held \
+                            within about MIB mebibytes of memory, for time ranges too long \
+                            to be held at once")
+    parser.add_argument("--headless", dest="headless", action='store_true',
+                        help="Only save the plots, rendered with the Agg backend, without \
+                            displaying them")
+    parser.add_argument("--watch", dest="watch", type=float, default=None, metavar="INTERVAL",
+                        help="Keep running, fetching the samples added since the previous \
+                            fetch every INTERVAL seconds and saving and plotting a trailing \
+                            window the length of the data specification time range")
+    parser.add_argument("--render-workers", dest="render_workers", type=int, default=None,
+                        help="Number of processes rendering plots in headless mode \
+                            (defaults to the number of CPUs)")
+    parser.add_argument("--decimation", dest="decimation", default=None,
+                        choices=decimate.METHODS,
+                        help="Method each plotted line is downsampled with \
+                            (overrides plot_decimation in the data specification file)")
+    parser.add_argument("--plot-max-points", dest="plot_max_points", type=int, default=None,
+                        help="Number of points each plotted line is downsampled to, 0 to plot \
+                            every sample (defaults to two points per pixel column)")
+    parser.add_argument("--explain", dest="explain", action='store_true',
+                        help="Print the fetch plan and the estimated number of samples \
+                            without querying Prometheus")
+    parser.add_argument("--profile", dest="profile", default=None, metavar="TRACE_FILE",
+                        help="Time each stage, print a summary table and save a JSON trace \
+                            (chrome://tracing, Perfetto or speedscope) to TRACE_FILE")
+    parser.add_argument("--profile-metrics", dest="profile_metrics", default=None,
+                        metavar="METRICS_FILE",
+                        help="Time each stage and save the counters to METRICS_FILE in the \
+                            Prometheus text format")
     parser.add_argument("-v", "--verbose", dest="verbose", action='store_true',
                         help="Verbose flag to display additional information")
 
@@ -40,6 +158,9 @@ def main(args=None):
     try:
         parser = get_parser()
         args = parser.parse_args(args)
+        # imported once the arguments are parsed, so that --help does not load the
+        # dependencies of fetching and plotting
+        from f3tch import core  # pylint: disable=import-outside-toplevel
         exit_status = core.main(args=args)
     except argparse.ArgumentError as error:
         print(f"Error: invalid argument.\n{error}")
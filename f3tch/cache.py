@@ -0,0 +1,165 @@
+"""Local on-disk cache of fetched time-series data.
+
+Each entry holds the series returned by one PromQL expression at one step on one cluster,
+together with the time ranges already fetched, so that later requests only need to fetch
+the uncovered gaps.
+"""
+# standard imports
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# custom imports
+from f3tch import ranges
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "f3tch", "series")
+DEFAULT_MAX_BYTES = 1024 ** 3
+DEFAULT_MUTABLE_HORIZON = 300
+
+
+class SeriesCache:
+    """Size-bounded, least-recently-used on-disk cache of fetched time-series data
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 mutable_horizon=DEFAULT_MUTABLE_HORIZON):
+        """Initialization function
+
+        Args:
+            directory (str, optional): cache directory. Defaults to DEFAULT_CACHE_DIR.
+            max_bytes (int, optional): maximum size of the cached data; the least recently
+                used entries are evicted beyond it. Defaults to 1 GiB.
+            mutable_horizon (int, optional): samples more recent than this many seconds ago
+                may still change and are never cached. Defaults to 300.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mutable_horizon = mutable_horizon
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(cluster, metric_name, step_size, from_timestamp):
+        """Build the cache key of a query. Queries only share an entry if they evaluate the
+        same step grid, i.e. their start timestamps are equal modulo step_size.
+
+        Args:
+            cluster (str): cluster identifier
+            metric_name (str): PromQL expression
+            step_size (int): Step size specified in seconds
+            from_timestamp (int): Starting Unix timestamp
+
+        Returns:
+            (str): cache key
+        """
+        raw = json.dumps([cluster, metric_name, step_size, from_timestamp % step_size])
+        return hashlib.sha256(raw.encode("utf8")).hexdigest()
+
+    def __index_filename(self):
+        return os.path.join(self.directory, "index.json")
+
+    def __data_filename(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def __load_index(self):
+        try:
+            with open(self.__index_filename(), "r", encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def __save_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_filename = f"{self.__index_filename()}.{os.getpid()}.tmp"
+        with open(tmp_filename, "w", encoding="utf8") as file:
+            json.dump(index, file)
+        os.replace(tmp_filename, self.__index_filename())
+
+    def load(self, key):
+        """Retrieve a cache entry
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            (tuple): (ranges, series) where ranges is the list of (from_timestamp, to_timestamp)
+                ranges already fetched and series is a list of (labels, values) for each series,
+                values being a 2-dimensional time-series array. Both are empty on a cache miss.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        with self.lock:
+            index = self.__load_index()
+            entry = index.get(key)
+            if entry is None:
+                return [], []
+            try:
+                with np.load(self.__data_filename(key)) as data:
+                    series = [(labels, data[f"values_{i}"])
+                              for i, labels in enumerate(entry["labels"])]
+            except (OSError, ValueError, KeyError):
+                index.pop(key)
+                self.__save_index(index)
+                return [], []
+
+            entry["last_access"] = time.time()
+            self.__save_index(index)
+        return [tuple(held) for held in entry["ranges"]], series
+
+    def store(self, key, held, series, step_size):
+        """Store a cache entry, dropping the part of it within the mutable horizon
+
+        Args:
+            key (str): cache key
+            held (list(tuple)): (from_timestamp, to_timestamp) ranges fetched
+            series (list(tuple)): (labels, values) for each series fetched within held
+            step_size (int): Step size specified in seconds
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        horizon = time.time() - self.mutable_horizon
+        held = [(start, min(end, start + ((horizon - start) // step_size) * step_size))
+                for start, end in ranges.merge_ranges(held, step_size) if start <= horizon]
+        held = [(int(start), int(end)) for start, end in held]
+        if len(held) == 0:
+            return
+
+        labels = [labels for labels, _ in series]
+        arrays = {}
+        for i, (_, values) in enumerate(series):
+            arrays[f"values_{i}"] = values[ranges.within_ranges(values[:, 0], held)]
+
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_filename = f"{self.__data_filename(key)}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_filename, **arrays)
+            os.replace(tmp_filename, self.__data_filename(key))
+
+            index = self.__load_index()
+            index[key] = {"ranges": held, "labels": labels,
+                          "bytes": os.path.getsize(self.__data_filename(key)),
+                          "last_access": time.time()}
+            self.__evict(index)
+            self.__save_index(index)
+
+    def __evict(self, index):
+        """Private method to evict the least recently used entries until the cached data fits
+        within max_bytes
+
+        Args:
+            index (dict): cache index, updated in place
+        """
+        total_bytes = sum(entry["bytes"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_access"]):
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= index.pop(key)["bytes"]
+            try:
+                os.remove(self.__data_filename(key))
+            except OSError:
+                pass
+
+    def purge(self):
+        """Remove every cache entry"""
+        with self.lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,146 @@
+"""Asynchronous client for using f3tch as a library.
+
+Queries are run on a dedicated pool of threads, so that hundreds of them can be awaited
+concurrently from an asyncio event loop without blocking it. Results are series.SeriesSet
+objects backed by NumPy arrays; pandas is only imported when a result is converted to a
+DataFrame.
+
+Example:
+    async with AsyncClient(kubeconfig="kubeconfig") as client:
+        series_set = await client.range_query("up", start, end, step=60)
+        timestamps, values = series_set.series(0)
+
+Raises:
+    exceptions.OpenshiftConnectionFailure: failure to connect to OpenShift cluster in the
+    given kubeconfig file
+    exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+    exceptions.PortForwardFailure: the port-forward to the Prometheus pod could not be
+    established
+    exceptions.PrometheusQueryFailure: a query could not be run by Prometheus
+"""
+# standard imports
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import functools
+
+# custom imports
+from f3tch.series import SeriesSet
+
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+def _to_timestamp(value):
+    """Unix timestamp of a datetime or of a number of seconds"""
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def _to_seconds(value):
+    """Number of seconds of a timedelta or of a number of seconds"""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    return int(value)
+
+
+class AsyncClient:
+    """Asynchronous Prometheus client, connected to the Prometheus pod of the cluster of a
+    kubeconfig file or to a Prometheus URL
+    """
+
+    def __init__(self, kubeconfig, max_concurrency=DEFAULT_MAX_CONCURRENCY, **kwargs):
+        """Initialization function
+
+        Args:
+            kubeconfig (str): path to kube-config file for the OpenShift cluster being queried
+            max_concurrency (int, optional): maximum number of queries run at any time; the
+                others wait for their turn. Defaults to 64.
+            **kwargs: prometheus.Prometheus arguments, e.g. prometheus_url, port_forward or
+                max_points_per_request
+        """
+        self.kubeconfig = kubeconfig
+        self.max_concurrency = max(1, max_concurrency)
+        self.kwargs = dict(kwargs)
+        self.kwargs.setdefault("pool_size", self.max_concurrency)
+        self.executor = None
+        self.prometheus = None
+        # created in the event loop of the first query
+        self.lock = None
+
+    async def __run(self, function, *args, **kwargs):
+        """Private method to run a blocking function on the query threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(function, *args, **kwargs))
+
+    async def connect(self):
+        """Connect to the OpenShift cluster and locate Prometheus; called by range_query if
+        needed
+
+        Raises:
+            exceptions.OpenshiftConnectionFailure: failure to connect to OpenShift cluster
+            exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+            exceptions.PortForwardFailure: the port-forward could not be established
+
+        Returns:
+            (AsyncClient): self
+        """
+        if self.prometheus is not None:
+            return self
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        # queries started before the connection is established share it
+        async with self.lock:
+            if self.prometheus is not None:
+                return self
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                   thread_name_prefix="f3tch")
+            # imported here, so that importing the client does not load the OpenShift client
+            from f3tch.prometheus import Prometheus  # pylint: disable=import-outside-toplevel
+            self.prometheus = await self.__run(Prometheus, kubeconfig=self.kubeconfig,
+                                               strict=True, **self.kwargs)
+        return self
+
+    async def range_query(self, expr, start, end, step):
+        """Run a range query
+
+        Args:
+            expr (str): PromQL expression
+            start (int or datetime): Starting Unix timestamp
+            end (int or datetime): Ending Unix timestamp
+            step (int or timedelta): Step size, in seconds
+
+        Raises:
+            exceptions.OpenshiftConnectionFailure: failure to connect to OpenShift cluster
+            exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+            exceptions.PortForwardFailure: the port-forward could not be established
+            exceptions.PrometheusQueryFailure: the query could not be run by Prometheus
+
+        Returns:
+            (series.SeriesSet): series returned by the query, empty if there is none
+        """
+        await self.connect()
+        series_set = await self.__run(self.prometheus.get_series_set, metric_name=expr,
+                                      from_timestamp=_to_timestamp(start),
+                                      to_timestamp=_to_timestamp(end),
+                                      step_size=_to_seconds(step))
+        if series_set is None:
+            return SeriesSet.from_series(expr, [])
+        return series_set
+
+    async def close(self):
+        """Release the connections and threads held by the client"""
+        if self.prometheus is not None:
+            await self.__run(self.prometheus.close)
+            self.prometheus = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -0,0 +1,145 @@
+"""Fan-out of a data specification to several clusters.
+
+Every series fetched from a cluster is tagged with a cluster label, so that the series of
+all clusters can be merged into a single result.
+
+Raises:
+    exceptions.OpenshiftConnectionFailure: unknown kubeconfig context
+"""
+# standard imports
+from collections import namedtuple
+from contextlib import contextmanager
+import os
+import tempfile
+
+# custom imports
+from f3tch import exceptions
+
+CLUSTER_LABEL = "cluster"
+
+Cluster = namedtuple("Cluster", ["name", "kubeconfig", "prometheus_url", "origin"],
+                     defaults=[None, None])
+
+
+def _unique_names(names):
+    """Suffix repeated names with their position"""
+    return [name if names.count(name) == 1 else f"{name}-{i}" for i, name in enumerate(names)]
+
+
+def _split_url(value):
+    """Split a name=url Prometheus URL into its cluster name and URL; the name is None for
+    a bare URL"""
+    name, separator, url = value.partition("=")
+    if separator == "" or ":" in name or "/" in name:
+        return None, value
+    return name, url
+
+
+def prometheus_urls(names, urls=None):
+    """Resolve the Prometheus URL of each cluster: a single cluster takes a single URL, and
+    several clusters take one name=url URL each, so that no two clusters are queried at the
+    same URL
+
+    Args:
+        names (list(str)): cluster names
+        urls (list(str), optional): Prometheus URLs, either bare or as name=url.
+            Defaults to None, i.e. every Prometheus pod is located through its cluster.
+
+    Raises:
+        exceptions.OpenshiftConnectionFailure: URLs that do not name exactly one cluster each
+
+    Returns:
+        (list(str)): Prometheus URL of each cluster, None where it is located through the
+            cluster
+    """
+    if not urls:
+        return [None] * len(names)
+    split = [_split_url(url) for url in urls]
+    if len(names) == 1 and len(split) == 1 and split[0][0] in (None, names[0]):
+        return [split[0][1]]
+    by_name = {}
+    for name, url in split:
+        if name not in names or name in by_name:
+            raise exceptions.OpenshiftConnectionFailure(
+                f"Several clusters are queried, so each Prometheus URL should be given once as "
+                f"<cluster>=<url> with a cluster among {names}")
+        by_name[name] = url
+    return [by_name.get(name) for name in names]
+
+
+@contextmanager
+def kubeconfigs(paths, contexts=None, urls=None):
+    """Resolve the clusters to query, from kubeconfig files and optionally contexts of a
+    kubeconfig file. The kubeconfig file of a context is a copy of the original one with the
+    context as its current-context, removed on exit; the original one is its origin.
+
+    Args:
+        paths (list(str)): kubeconfig file paths
+        contexts (list(str), optional): contexts of the single kubeconfig file in paths.
+            Defaults to None, i.e. the current-context of each kubeconfig file.
+        urls (list(str), optional): Prometheus URLs of the clusters (see prometheus_urls).
+            Defaults to None.
+
+    Raises:
+        exceptions.OpenshiftConnectionFailure: unknown kubeconfig context, contexts given
+            with several kubeconfig files, or URLs that do not name one cluster each
+
+    Yields:
+        list(Cluster): name, kubeconfig file, Prometheus URL and origin of each cluster; the
+            name is the context or the kubeconfig file name
+    """
+    if not contexts:
+        names = _unique_names([os.path.splitext(os.path.basename(path))[0] for path in paths])
+        yield [Cluster(name, path, url)
+               for name, path, url in zip(names, paths, prometheus_urls(names, urls))]
+        return
+    if len(paths) != 1:
+        raise exceptions.OpenshiftConnectionFailure(
+            "Contexts can only be selected from a single kubeconfig file")
+
+    import yaml  # pylint: disable=import-outside-toplevel
+    with open(paths[0], "r", encoding="utf8") as file:
+        config = yaml.safe_load(file) or {}
+    known = {context.get("name") for context in config.get("contexts") or []}
+    for context in contexts:
+        if context not in known:
+            raise exceptions.OpenshiftConnectionFailure(
+                f"Context {context} not found in {paths[0]}")
+
+    names = _unique_names(list(contexts))
+    cluster_urls = prometheus_urls(names, urls)
+    with tempfile.TemporaryDirectory(prefix="f3tch-") as directory:
+        clusters = []
+        for name, context, url in zip(names, contexts, cluster_urls):
+            path = os.path.join(directory, f"{len(clusters)}.kubeconfig")
+            # the copy holds the same credentials, so it is only readable by the owner
+            with open(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600), "w",
+                      encoding="utf8") as file:
+                yaml.safe_dump(dict(config, **{"current-context": context}), file)
+            clusters.append(Cluster(name, path, url, paths[0]))
+        yield clusters
+
+
+def merge(metric_name, series_sets):
+    """Merge the series fetched from several clusters, tagging each with its cluster
+
+    Args:
+        metric_name (str): PromQL expression that returned the series
+        series_sets (list(tuple)): (cluster name, series.SeriesSet or None) for each cluster
+
+    Returns:
+        (series.SeriesSet): series of all clusters with a cluster label, or None if no
+            cluster returned any
+    """
+    from f3tch.series import SeriesSet  # pylint: disable=import-outside-toplevel
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    tagged = []
+    for cluster, series_set in series_sets:
+        if series_set is None:
+            continue
+        for i in range(len(series_set)):
+            tagged.append((dict(series_set.labels(i), **{CLUSTER_LABEL: cluster}),
+                           np.column_stack(series_set.series(i))))
+    if len(tagged) == 0:
+        return None
+    return SeriesSet.from_series(metric_name, tagged)
@@ -1,85 +1,612 @@
 """The main entry point.
 """
 # standard imports
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Union
-from os import path
-from matplotlib import pyplot
+from os import makedirs, path
+import time
 
 #custom imports
-from f3tch import exceptions, plots
-from .prometheus import Prometheus
+from f3tch import clusters, decimate, exceptions, export, planner, profiling
+from .cache import SeriesCache
+from .discovery import DiscoveryCache
 from .query_object import Query
+from .render import PoolRenderer, Renderer
+from .slices import TimeSliceIndex
 from .status import ExitStatus
 from .utils import shorten_metric_name
 
 
-def process(prometheus_obj, metric, save_data, plot_data):
-    """This function processes each query metric object as follows:
-     - retrieve the time-series data
-     - save time-series data (save_data==True)
-     - plot time-series data (plot_data==True)
+def fetch(prometheus_obj, metric):
+    """Retrieve the time-series data for a single query metric object
 
     Args:
         prometheus_obj (Prometheus): prometheus pod object
         metric (dictionary): metric information to query prometheus
+
+    Returns:
+        time-series data (Pandas.DataFrame): Time-series data retrieved for the metric
+    """
+    return prometheus_obj.get_time_series(
+        metric_name=metric["metric_name"],
+        from_timestamp=metric["from_timestamp"],
+        to_timestamp=metric["to_timestamp"],
+        step_size=metric["step_size"])
+
+
+def fetch_series(prometheus_obj, metric):
+    """Retrieve the series of a single query metric object, keeping their label sets
+
+    Args:
+        prometheus_obj (Prometheus): prometheus pod object
+        metric (dictionary): metric information to query prometheus
+
+    Returns:
+        (series.SeriesSet): series retrieved for the metric
+    """
+    return prometheus_obj.get_series_set(
+        metric_name=metric["metric_name"],
+        from_timestamp=metric["from_timestamp"],
+        to_timestamp=metric["to_timestamp"],
+        step_size=metric["step_size"])
+
+
+def fetch_all(prometheus_obj, metrics, max_concurrent_queries=1, fetch_function=fetch):
+    """Retrieve the time-series data for all query metric objects, keeping at most
+    max_concurrent_queries queries in flight at any time.
+
+    The results are returned in the same order as metrics, and a failure to fetch one
+    metric does not affect the others.
+
+    Args:
+        prometheus_obj (Prometheus): prometheus pod object
+        metrics (list(dictionary)): list of metric information to query prometheus
+        max_concurrent_queries (int, optional): maximum number of queries in flight.
+            Defaults to 1.
+        fetch_function (function, optional): function retrieving a single metric.
+            Defaults to fetch.
+
+    Returns:
+        list(tuple): (time-series data, error) for each metric, where error is None
+            if the time-series data was retrieved successfully
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrent_queries)) as executor:
+        futures = [executor.submit(fetch_function, prometheus_obj, metric)
+                   for metric in metrics]
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as error:  # pylint: disable=broad-except
+                results.append((None, error))
+    return results
+
+
+@profiling.profiled("core.fetch_planned")
+def fetch_planned(prometheus_obj, metrics, fetches, max_concurrent_queries=1,
+                  serve_function=planner.serve):
+    """Retrieve the time-series data for all query metric objects through a fetch plan: each
+    fetch is retrieved once and every metric it covers is served from its result
+
+    Args:
+        prometheus_obj (Prometheus): prometheus pod object
+        metrics (list(dictionary)): list of metric information to query prometheus
+        fetches (list(dictionary)): fetch plan of metrics, as returned by planner.plan
+        max_concurrent_queries (int, optional): maximum number of fetches in flight.
+            Defaults to 1.
+        serve_function (function, optional): function serving a metric from the result of
+            the fetch covering it. Defaults to planner.serve.
+
+    Returns:
+        list(tuple): (time-series data, error) for each metric, where error is None
+            if the time-series data was retrieved successfully
+    """
+    results = [(None, None)] * len(metrics)
+    fetched = fetch_all(prometheus_obj, fetches, max_concurrent_queries=max_concurrent_queries,
+                        fetch_function=fetch_series)
+    for _fetch, (series_set, error) in zip(fetches, fetched):
+        for i in _fetch["entries"]:
+            if error is not None:
+                results[i] = (None, error)
+                continue
+            try:
+                results[i] = (serve_function(series_set, metrics[i]), None)
+            except exceptions.TimeseriesConversionFailure as exc:
+                results[i] = (None, exc)
+    return results
+
+
+@profiling.profiled("core.fetch_clusters")
+def fetch_clusters(targets, connect_function, metrics, fetches, max_concurrent_queries=1):
+    """Retrieve the time-series data for all query metric objects from several clusters at
+    once, each through the fetch plan with at most max_concurrent_queries fetches in flight,
+    and merge the series of each metric, tagged with the cluster they were fetched from.
+
+    A cluster that cannot be connected to or queried does not affect the others.
+
+    Args:
+        targets (list(clusters.Cluster)): clusters to query
+        connect_function (function): function returning the Prometheus object of a
+            clusters.Cluster, called in the thread querying it
+        metrics (list(dictionary)): list of metric information to query prometheus
+        fetches (list(dictionary)): fetch plan of metrics, as returned by planner.plan
+        max_concurrent_queries (int, optional): maximum number of fetches in flight per
+            cluster. Defaults to 1.
+
+    Returns:
+        list(tuple): (time-series data, error) for each metric, where error is None if the
+            time-series data was retrieved from every cluster; the series of the clusters
+            that succeeded are returned either way
+    """
+    def fetch_cluster(target):
+        prometheus_obj = connect_function(target)
+        try:
+            return fetch_planned(prometheus_obj, metrics, fetches,
+                                 max_concurrent_queries=max_concurrent_queries,
+                                 serve_function=planner.select)
+        finally:
+            prometheus_obj.close()
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = [executor.submit(fetch_cluster, target) for target in targets]
+    fetched = []
+    for future in futures:
+        try:
+            fetched.append(future.result())
+        except Exception as error:  # pylint: disable=broad-except
+            fetched.append([(None, error)] * len(metrics))
+
+    results = []
+    for i, metric in enumerate(metrics):
+        errors = [f"{target.name}: {cluster_results[i][1]}"
+                  for target, cluster_results in zip(targets, fetched)
+                  if cluster_results[i][1] is not None]
+        merged = clusters.merge(metric["metric_name"],
+                                [(target.name, cluster_results[i][0])
+                                 for target, cluster_results in zip(targets, fetched)])
+        time_series_df = None
+        try:
+            time_series_df = merged.to_dataframe() if merged is not None else None
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(f"unable to convert time-series data: {exc}")
+        results.append((time_series_df,
+                        exceptions.ClusterFetchFailure("\n".join(errors))
+                        if len(errors) > 0 else None))
+    return results
+
+
+def plot(metric, time_series_df, metric_name, plot_title, plot_filename, plot_data,
+         renderer=None, slice_index=None, rolling_stats=None):
+    """This function plots a single time-series column of a fetched query metric object
+
+    Args:
+        metric (dictionary): metric information used to query prometheus
+        time_series_df (Pandas.DataFrame): time-series data with a metric_name column
+        metric_name (str): name of the time-series column to plot
+        plot_title (str): plot title
+        plot_filename (str): plot file name
+        plot_data (boolean): Set to True to plot the time-series data
+        renderer (Renderer, optional): renderer the plots are submitted to.
+            Defaults to None, i.e. rendered in the current process.
+        slice_index (TimeSliceIndex, optional): positions of the metric time-slices in the
+            index of time_series_df, shared by all plots. Defaults to None, i.e. resolved
+            from the metric time-slices.
+        rolling_stats (RollingStats, optional): rolling statistics of the metric_name column.
+            Defaults to None, i.e. computed when plotting.
+    """
+    renderer = renderer or Renderer()
+    if slice_index is None:
+        slice_index = TimeSliceIndex(time_series_df.index, metric["time_slices"])
+    if plot_data:
+        renderer.submit("plot_timeseries",
+                        time_series=time_series_df,
+                        metric_name=metric_name,
+                        moving_avg_window_size=metric["moving_window"],
+                        time_slices=metric["time_slices"],
+                        plot_title=plot_title,
+                        plot_filename=plot_filename,
+                        plot_color=metric["plot_color"],
+                        rolling_stats=rolling_stats,
+                        decimation=metric.get("decimation", decimate.DEFAULT_METHOD),
+                        max_points=metric.get("max_points"),
+                        slice_index=slice_index)
+
+    if metric.get("plot_time_slices_overlaid", False):
+        fname, ext = path.splitext(plot_filename)
+        renderer.submit("plot_time_slices_overlaid",
+                        time_series=time_series_df,
+                        metric_name=metric_name,
+                        moving_avg_window_size=metric["moving_window"],
+                        time_slices=metric["time_slices"],
+                        plot_title=f"{plot_title} (unified time-axis)",
+                        plot_filename=f"{fname}_overlaid{ext}",
+                        decimation=metric.get("decimation", decimate.DEFAULT_METHOD),
+                        max_points=metric.get("max_points"),
+                        slice_index=slice_index)
+
+    plot_time_slices_discontiguous = metric.get("plot_time_slices_discontiguous", None)
+    if plot_time_slices_discontiguous is not None:
+        fname, ext = path.splitext(plot_filename)
+        x_spacing = plot_time_slices_discontiguous.get("spacing_between_slices", 10)
+        x_axis_tick_rotation = plot_time_slices_discontiguous.get("x_axis_tick_rotation", 90)
+        renderer.submit("plot_time_slices_discontiguous",
+                        time_series=time_series_df,
+                        metric_name=metric_name,
+                        moving_avg_window_size=metric["moving_window"],
+                        time_slices=metric["time_slices"],
+                        plot_title=f"{plot_title} (discreet time-axis)",
+                        plot_filename=f"{fname}_discontiguous{ext}",
+                        x_spacing=x_spacing,
+                        x_tick_rotation=x_axis_tick_rotation,
+                        decimation=metric.get("decimation", decimate.DEFAULT_METHOD),
+                        max_points=metric.get("max_points"),
+                        slice_index=slice_index)
+
+
+def plot_clusters(metric, time_series_df, plot_data, renderer=None):
+    """This function plots the series of a query metric object fetched from several clusters
+    on the same axes
+
+    Args:
+        metric (dictionary): metric information used to query prometheus
+        time_series_df (Pandas.DataFrame): time-series data of every cluster, one column per
+            series
+        plot_data (boolean): Set to True to plot the time-series data
+        renderer (Renderer, optional): renderer the plot is submitted to.
+            Defaults to None, i.e. rendered in the current process.
+    """
+    if not plot_data or time_series_df is None:
+        return
+    renderer = renderer or Renderer()
+    fname, ext = path.splitext(metric["plot_filename"])
+    renderer.submit("plot_clusters_overlaid",
+                    time_series=time_series_df,
+                    metric_name=metric["metric_name"],
+                    plot_title=f"{metric['plot_title']} (clusters)",
+                    plot_filename=f"{fname}_clusters{ext}" if fname != "" else "",
+                    decimation=metric.get("decimation", decimate.DEFAULT_METHOD),
+                    max_points=metric.get("max_points"))
+
+
+@profiling.profiled("core.process")
+def process(metric, time_series_df, save_data, plot_data, output_format="csv", compression=None,
+            output_dir=".", renderer=None, rolling_stats=None, basename=None):
+    """This function processes each fetched query metric object as follows:
+     - save time-series data (save_data==True)
+     - plot time-series data (plot_data==True), one plot per series when the query
+       returned several series
+
+    Args:
+        metric (dictionary): metric information used to query prometheus
+        time_series_df (Pandas.DataFrame): time-series data retrieved for the metric
         save_data (boolean): Set to True to save time-series data retrieved
         plot_data (boolean): Set to True to plot the time-series data
+        output_format (str, optional): format the time-series data is saved in.
+            Defaults to "csv".
+        compression (str, optional): compression codec the time-series data is saved with.
+            Defaults to None, i.e. the default codec of output_format.
+        output_dir (str, optional): directory the time-series data is saved in.
+            Defaults to ".".
+        renderer (Renderer, optional): renderer the plots are submitted to.
+            Defaults to None, i.e. rendered in the current process.
+        rolling_stats (dict, optional): RollingStats of each column, already computed.
+            Defaults to None, i.e. computed here.
+        basename (str, optional): file name the time-series data is saved under, without
+            extension. Defaults to None, i.e. named after the metric, its time range and the
+            current time.
     """
+    # NumPy is only imported once there is data to process, not for --help or --explain
+    from f3tch import rolling  # pylint: disable=import-outside-toplevel
     metric_name = metric["metric_name"]
     from_timestamp = metric["from_timestamp"]
     to_timestamp = metric["to_timestamp"]
-    time_series_df = prometheus_obj.get_time_series(
-        metric_name=metric_name,
-        from_timestamp=from_timestamp,
-        to_timestamp=to_timestamp,
-        step_size=metric["step_size"])
+
+    if time_series_df is None:
+        return
+
+    # computed once, for every plot and export of the metric
+    if rolling_stats is None and metric["moving_window"] > 0:
+        with profiling.span("core.rolling_stats", samples=time_series_df.size):
+            rolling_stats = rolling.compute_rolling_stats(
+                time_series_df, metric["moving_window"], metric.get("moving_quantiles", []))
+    rolling_stats = rolling_stats or {}
 
     if save_data:
-        current_timestamp = int(datetime.now().timestamp())
-        filename = f"{shorten_metric_name(metric_name)}_{from_timestamp}-\
-            {to_timestamp}_{current_timestamp}.csv"
-        time_series_df.to_csv(filename, sep=",", header=True)
+        if basename is None:
+            current_timestamp = int(datetime.now().timestamp())
+            basename = f"{shorten_metric_name(metric_name)}_{from_timestamp}-" \
+                f"{to_timestamp}_{current_timestamp}"
+        with profiling.span("core.save", samples=time_series_df.size) as counters:
+            filename = export.save(time_series_df, path.join(output_dir, basename),
+                                   output_format=output_format, compression=compression)
+            counters["bytes"] = path.getsize(filename)
+        if metric.get("save_rolling_stats", False) and len(rolling_stats) > 0:
+            with profiling.span("core.save_rolling_stats") as counters:
+                filename = export.save(
+                    rolling.stats_to_dataframe(rolling_stats, time_series_df.index),
+                    path.join(output_dir, f"{basename}_rolling"),
+                    output_format=output_format, compression=compression)
+                counters["bytes"] = path.getsize(filename)
 
     plot_title = metric["plot_title"]
     plot_filename = metric["plot_filename"]
-    if plot_data:
-        plots.plot_timeseries(time_series=time_series_df,
-                                   metric_name=metric_name,
-                                   moving_avg_window_size=metric["moving_window"],
-                                   time_slices=metric["time_slices"],
-                                   plot_title=plot_title,
-                                   plot_filename=plot_filename,
-                                   plot_color=metric["plot_color"])
+    with profiling.span("core.plot", samples=time_series_df.size):
+        # every column shares the index, and so the time-slice positions
+        slice_index = TimeSliceIndex(time_series_df.index, metric["time_slices"])
+        if len(time_series_df.columns) == 1:
+            plot(metric, time_series_df, time_series_df.columns[0], plot_title, plot_filename,
+                 plot_data, renderer, slice_index,
+                 rolling_stats.get(time_series_df.columns[0]))
+            return
 
-    if metric.get("plot_time_slices_overlaid", False):
         fname, ext = path.splitext(plot_filename)
-        plots.plot_time_slices_overlaid(time_series=time_series_df,
-                                   metric_name=metric_name,
-                                   moving_avg_window_size=metric["moving_window"],
-                                   time_slices=metric["time_slices"],
-                                   plot_title=f"{plot_title} (unified time-axis)",
-                                   plot_filename=f"{fname}_overlaid{ext}")
+        for i, series_name in enumerate(time_series_df.columns):
+            labels = series_name[len(metric_name):]
+            plot(metric, time_series_df[[series_name]], series_name, f"{plot_title} {labels}",
+                 f"{fname}_{i}{ext}" if plot_filename != "" else "", plot_data, renderer,
+                 slice_index, rolling_stats.get(series_name))
 
-    plot_time_slices_discontiguous = metric.get("plot_time_slices_discontiguous", None)
-    if plot_time_slices_discontiguous is not None:
+
+def watch(prometheus_obj, metrics, interval, save_data, plot_data, output_format="csv",
+          compression=None, output_dir=".", renderer=None, max_concurrent_queries=1,
+          ticks=None, verbose=False):
+    """Fetch, save and plot the metrics every interval seconds until interrupted, keeping a
+    trailing window of the length of the time range of each metric in memory.
+
+    Every tick only fetches the samples after the last one seen, updates the rolling
+    statistics incrementally and saves and plots the windows that changed, overwriting the
+    outputs of the previous tick.
+
+    Args:
+        prometheus_obj (Prometheus): prometheus pod object
+        metrics (list(dictionary)): list of metric information to query prometheus
+        interval (float): seconds between the start of two ticks
+        save_data (boolean): Set to True to save the time-series data of each window
+        plot_data (boolean): Set to True to plot the time-series data of each window
+        output_format (str, optional): format the time-series data is saved in.
+            Defaults to "csv".
+        compression (str, optional): compression codec the time-series data is saved with.
+            Defaults to None, i.e. the default codec of output_format.
+        output_dir (str, optional): directory the time-series data is saved in.
+            Defaults to ".".
+        renderer (Renderer, optional): headless renderer the plots are submitted to.
+            Defaults to None, i.e. rendered in the current process.
+        max_concurrent_queries (int, optional): maximum number of queries in flight.
+            Defaults to 1.
+        ticks (int, optional): number of ticks to run. Defaults to None, i.e. until
+            interrupted.
+        verbose (bool, optional): Set to True to report the samples fetched at every tick.
+            Defaults to False.
+
+    Returns:
+        ExitStatus: ERROR if any tick failed to fetch a metric or render a plot
+    """
+    from f3tch.watch import MetricWatch  # pylint: disable=import-outside-toplevel
+    renderer = renderer or Renderer(headless=True)
+    watches = [MetricWatch(metric) for metric in metrics]
+    exit_status = ExitStatus.SUCCESS
+    tick = 0
+    try:
+        while ticks is None or tick < ticks:
+            started = time.monotonic()
+            now = time.time()
+            pending = []
+            for metric_watch in watches:
+                time_range = metric_watch.next_range(now)
+                if time_range is not None:
+                    pending.append((metric_watch, dict(metric_watch.metric,
+                                                       from_timestamp=time_range[0],
+                                                       to_timestamp=time_range[1])))
+            results = fetch_all(prometheus_obj, [metric for _, metric in pending],
+                                max_concurrent_queries=max_concurrent_queries,
+                                fetch_function=fetch_series)
+
+            for (metric_watch, metric), (series_set, error) in zip(pending, results):
+                if error is not None:
+                    print(f"Error: unable to fetch {metric['metric_name']}.\n{error}")
+                    exit_status = ExitStatus.ERROR
+                    continue
+                added = metric_watch.update(series_set)
+                if verbose:
+                    print(f"{added} new samples for {metric['metric_name']}")
+                if added == 0:
+                    continue
+                process(metric=metric,
+                        time_series_df=metric_watch.to_dataframe(),
+                        save_data=save_data,
+                        plot_data=plot_data,
+                        output_format=output_format,
+                        compression=compression,
+                        output_dir=output_dir,
+                        renderer=renderer,
+                        rolling_stats=metric_watch.get_rolling_stats(),
+                        basename=f"{shorten_metric_name(metric['metric_name'])}_watch")
+            for error in renderer.flush():
+                print(f"Error: unable to render plot.\n{error}")
+                exit_status = ExitStatus.ERROR
+
+            tick += 1
+            if ticks is None or tick < ticks:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    return exit_status
+
+
+def fetch_chunks(prometheus_obj, metric_stream):
+    """Retrieve the series of a streamed metric one chunk at a time, each chunk only being
+    fetched once the previous one has been processed
+
+    Args:
+        prometheus_obj (Prometheus): prometheus pod object
+        metric_stream (streaming.MetricStream): streamed metric, which sizes the chunks
+
+    Yields:
+        series.SeriesSet: series of consecutive sub-ranges of the metric time range, or None
+    """
+    time_range = metric_stream.next_range()
+    while time_range is not None:
+        yield fetch_series(prometheus_obj, dict(metric_stream.metric,
+                                                from_timestamp=time_range[0],
+                                                to_timestamp=time_range[1]))
+        time_range = metric_stream.next_range()
+
+
+def stream(prometheus_obj, metrics, memory_bytes, save_data, plot_data, output_format="csv",
+           compression=None, output_dir=".", renderer=None, verbose=False):
+    """Fetch, save and plot the metrics one at a time in chunks held within a memory budget,
+    for time ranges too long to be held in memory at once.
+
+    The samples of every chunk are appended to the saved files and decimated into the points
+    that are plotted before the next chunk is fetched, the rolling statistics carrying their
+    window over from one chunk to the next.
+
+    Args:
+        prometheus_obj (Prometheus): prometheus pod object
+        metrics (list(dictionary)): list of metric information to query prometheus
+        memory_bytes (int): memory budget of the chunk in flight
+        save_data (boolean): Set to True to save time-series data retrieved
+        plot_data (boolean): Set to True to plot the time-series data
+        output_format (str, optional): format the time-series data is saved in, but npz.
+            Defaults to "csv".
+        compression (str, optional): compression codec the time-series data is saved with.
+            Defaults to None, i.e. the default codec of output_format.
+        output_dir (str, optional): directory the time-series data is saved in.
+            Defaults to ".".
+        renderer (Renderer, optional): renderer the plots are submitted to.
+            Defaults to None, i.e. rendered in the current process.
+        verbose (bool, optional): Set to True to report the samples of every chunk.
+            Defaults to False.
+
+    Returns:
+        ExitStatus: ERROR if a metric could not be fetched entirely
+    """
+    from f3tch.streaming import MetricStream  # pylint: disable=import-outside-toplevel
+    exit_status = ExitStatus.SUCCESS
+    for metric in metrics:
+        basename = None
+        if save_data:
+            current_timestamp = int(datetime.now().timestamp())
+            basename = path.join(output_dir, f"{shorten_metric_name(metric['metric_name'])}_"
+                                 f"{metric['from_timestamp']}-{metric['to_timestamp']}_"
+                                 f"{current_timestamp}")
+        metric_stream = MetricStream(metric, memory_bytes, basename=basename,
+                                     output_format=output_format, compression=compression)
+        try:
+            for series_set in fetch_chunks(prometheus_obj, metric_stream):
+                with profiling.span("core.stream_chunk",
+                                    samples=series_set.num_samples()
+                                    if series_set is not None else 0):
+                    added = metric_stream.update(series_set)
+                if verbose:
+                    print(f"{added} samples streamed for {metric['metric_name']}")
+        except Exception as error:  # pylint: disable=broad-except
+            print(f"Error: unable to fetch {metric['metric_name']}.\n{error}")
+            exit_status = ExitStatus.ERROR
+        finally:
+            metric_stream.close()
+
+        # only the decimated points of each series are left to plot
+        frames = metric_stream.to_dataframes()
+        plot_title = metric["plot_title"]
+        plot_filename = metric["plot_filename"]
         fname, ext = path.splitext(plot_filename)
-        x_spacing = plot_time_slices_discontiguous.get("spacing_between_slices", 10)
-        x_axis_tick_rotation = plot_time_slices_discontiguous.get("x_axis_tick_rotation", 90)
-        plots.plot_time_slices_discontiguous(time_series=time_series_df,
-                                   metric_name=metric_name,
-                                   moving_avg_window_size=metric["moving_window"],
-                                   time_slices=metric["time_slices"],
-                                   plot_title=f"{plot_title} (discreet time-axis)",
-                                   plot_filename=f"{fname}_discontiguous{ext}",
-                                   x_spacing=x_spacing,
-                                   x_tick_rotation=x_axis_tick_rotation)
+        try:
+            with profiling.span("core.plot"):
+                for i, (series_name, time_series_df, rolling_stats) in enumerate(frames):
+                    if len(frames) == 1:
+                        plot(metric, time_series_df, series_name, plot_title, plot_filename,
+                             plot_data, renderer, rolling_stats=rolling_stats)
+                        continue
+                    labels = series_name[len(metric["metric_name"]):]
+                    plot(metric, time_series_df, series_name, f"{plot_title} {labels}",
+                         f"{fname}_{i}{ext}" if plot_filename != "" else "", plot_data,
+                         renderer, rolling_stats=rolling_stats)
+        except Exception as error:  # pylint: disable=broad-except
+            # as with a PoolRenderer, a plot that fails does not stop the other metrics
+            print(f"Error: unable to render plot.\n{error}")
+            exit_status = ExitStatus.ERROR
+    return exit_status
+
+
+def connect(args, qry, target, max_points_per_request, discovery_cache=None,
+            series_cache=None):
+    """Create the Prometheus object of a cluster, importing the OpenShift and HTTP clients
+    only once a data specification is known to be valid
+
+    Args:
+        args (argparse.Namespace): cli arguments
+        qry (Query): data specification
+        target (clusters.Cluster): cluster being queried, with its kube-config file and
+            Prometheus URL
+        max_points_per_request (int): maximum number of points per series requested by a
+            single query_range request
+        discovery_cache (DiscoveryCache, optional): cache of the resolved Prometheus pod.
+            Defaults to None.
+        series_cache (SeriesCache, optional): cache of fetched time-series data.
+            Defaults to None.
+
+    Raises:
+        exceptions.OpenshiftConnectionFailure: failed to connect to the OpenShift cluster
+        exceptions.PrometheusPodNotFound: failed to find the Prometheus pod
+        exceptions.PortForwardFailure: failed to establish the port-forward
+
+    Returns:
+        (Prometheus): prometheus pod object
+    """
+    from f3tch.prometheus import Prometheus  # pylint: disable=import-outside-toplevel
+    verify_tls = False if args.insecure_skip_tls_verify else (args.ca_bundle or True)
+    return Prometheus(
+        kubeconfig=target.kubeconfig, verbose=args.verbose or False,
+        prometheus_fqname=args.prometheus_fqname,
+        prometheus_namespace=args.prometheus_namespace,
+        prometheus_selector=args.prometheus_selector,
+        discovery_cache=discovery_cache,
+        prometheus_url=target.prometheus_url, verify_tls=verify_tls,
+        max_points_per_request=max_points_per_request,
+        chunk_concurrency=args.chunk_concurrency
+        if args.chunk_concurrency is not None else qry.get_chunk_concurrency(),
+        series_cache=series_cache, exec_compression=args.exec_compression,
+        port_forward=args.port_forward, port_forward_port=args.port_forward_port,
+        kubeconfig_origin=target.origin)
+
 
 def main(
     args: List[Union[str, bytes]]
 ) -> ExitStatus:
     """This is the main function that is responsible for connecting to
-    and querying the Prometheus pod.
+    and querying the Prometheus pod, profiling each stage if requested.
+
+    Args:
+        args (List[Union[str, bytes]], optional): cli arguments.
+
+    Returns:
+        ExitStatus: _description_
+    """
+    if args.profile is None and args.profile_metrics is None:
+        return run(args)
+
+    profiler = profiling.enable()
+    try:
+        with profiling.span("core.main"):
+            exit_status = run(args)
+    finally:
+        profiling.disable()
+    print(profiler.summary())
+    if args.profile is not None:
+        profiler.write_trace(args.profile)
+        print(f"Profile trace saved to {args.profile}")
+    if args.profile_metrics is not None:
+        with open(args.profile_metrics, "w", encoding="utf8") as file:
+            file.write(profiler.to_prometheus_text())
+    return exit_status
+
+
+def run(
+    args: List[Union[str, bytes]]
+) -> ExitStatus:
+    """Connect to and query the Prometheus pod, then save and plot the time-series data.
 
     Args:
         args (List[Union[str, bytes]], optional): cli arguments.
@@ -98,23 +625,171 @@ def main(
         print(f"Error: unable to parse query object file.\n{error}")
         return ExitStatus.ERROR
 
-    # Create prometheus object
+    output_format = args.output_format or qry.get_output_format()
+    compression = args.compression or qry.get_output_compression()
+    output_dir = args.output_dir or qry.get_output_directory()
+    dataset = args.dataset if args.dataset is not None else qry.is_output_dataset_enabled()
     try:
-        prometheus_obj = Prometheus(
-            kubeconfig=args.kubeconfig, verbose=verbose)
+        export.check_format(output_format, compression)
+    except exceptions.UnsupportedOutputFormat as error:
+        print(f"Error: {error}")
+        return ExitStatus.ERROR
+
+    try:
+        metrics = qry.get_metrics()
+        for metric in metrics:
+            if args.decimation is not None:
+                metric["decimation"] = args.decimation
+            if args.plot_max_points is not None:
+                metric["max_points"] = args.plot_max_points
+            if args.value_dtype is not None:
+                metric["value_dtype"] = args.value_dtype
+            if args.memmap_dir is not None:
+                metric["memmap_dir"] = args.memmap_dir
+            decimate.check_method(metric["decimation"])
+        if dataset and qry.is_save_fetched_data_enabled():
+            export.check_dataset([metric["metric_name"] for metric in metrics])
+    except (exceptions.InvalidQueryFileFormat,
+            exceptions.UnsupportedDecimation,
+            exceptions.UnsupportedOutputFormat) as error:
+        print(f"Error: {error}")
+        return ExitStatus.ERROR
+
+    if args.stream_memory is not None and \
+            (args.watch is not None or dataset or output_format == "npz"):
+        print("Error: --stream-memory cannot be combined with --watch, dataset or npz output")
+        return ExitStatus.ERROR
+
+    max_points_per_request = args.max_points_per_request \
+        if args.max_points_per_request is not None else qry.get_max_points_per_request()
+    fetches = planner.plan(metrics)
+    if args.explain:
+        print(planner.explain(fetches, metrics, max_points_per_request))
+        return ExitStatus.SUCCESS
+
+    if qry.is_save_fetched_data_enabled():
+        # checked before fetching, so that the fetched data is not lost when it is saved
+        try:
+            makedirs(output_dir, exist_ok=True)
+        except OSError as error:
+            print(f"Error: unable to create the output directory {output_dir}.\n{error}")
+            return ExitStatus.ERROR
+
+    discovery_cache = DiscoveryCache(ttl=args.discovery_cache_ttl) \
+        if args.discovery_cache_ttl > 0 else None
+    series_cache = SeriesCache(directory=args.cache_dir,
+                               max_bytes=args.cache_max_size * 1024 ** 2,
+                               mutable_horizon=args.cache_mutable_horizon)
+    if args.purge_cache:
+        series_cache.purge()
+    if args.no_cache or args.watch is not None or args.stream_memory is not None:
+        # a watch only fetches the samples it has not seen yet, and a stream cannot hold the
+        # cached samples of a metric
+        series_cache = None
+
+    def connect_function(target):
+        return connect(args, qry, target, max_points_per_request=max_points_per_request,
+                       discovery_cache=discovery_cache, series_cache=series_cache)
+
+    max_concurrent_queries = args.max_concurrent_queries \
+        if args.max_concurrent_queries is not None else qry.get_max_concurrent_queries()
+
+    # plots are saved at every tick of a watch, so never displayed
+    headless = args.headless or args.watch is not None
+
+    # created once connected, so that no renderer is left open when the connection fails
+    def new_renderer():
+        if headless and args.render_workers != 1:
+            return PoolRenderer(workers=args.render_workers)
+        return Renderer(headless=headless)
+
+    try:
+        with clusters.kubeconfigs(args.kubeconfig, args.context,
+                                  args.prometheus_url) as targets:
+            if len(targets) > 1:
+                if args.watch is not None or args.stream_memory is not None:
+                    print("Error: --watch and --stream-memory query a single cluster")
+                    return ExitStatus.ERROR
+                results = fetch_clusters(targets=targets,
+                                         connect_function=connect_function,
+                                         metrics=metrics,
+                                         fetches=fetches,
+                                         max_concurrent_queries=max_concurrent_queries)
+            else:
+                prometheus_obj = connect_function(targets[0])
+                if args.watch is not None or args.stream_memory is not None:
+                    renderer = new_renderer()
+                    if args.watch is not None:
+                        exit_status = watch(prometheus_obj=prometheus_obj,
+                                            metrics=metrics,
+                                            interval=args.watch,
+                                            save_data=qry.is_save_fetched_data_enabled(),
+                                            plot_data=qry.is_plot_data_enabled(),
+                                            output_format=output_format,
+                                            compression=compression,
+                                            output_dir=output_dir,
+                                            renderer=renderer,
+                                            max_concurrent_queries=max_concurrent_queries,
+                                            verbose=verbose)
+                    else:
+                        exit_status = stream(prometheus_obj=prometheus_obj,
+                                             metrics=metrics,
+                                             memory_bytes=int(args.stream_memory * 1024 ** 2),
+                                             save_data=qry.is_save_fetched_data_enabled(),
+                                             plot_data=qry.is_plot_data_enabled(),
+                                             output_format=output_format,
+                                             compression=compression,
+                                             output_dir=output_dir,
+                                             renderer=renderer,
+                                             verbose=verbose)
+                    prometheus_obj.close()
+                    for error in renderer.close():
+                        print(f"Error: unable to render plot.\n{error}")
+                        exit_status = ExitStatus.ERROR
+                    return exit_status
+                results = fetch_planned(prometheus_obj=prometheus_obj,
+                                        metrics=metrics,
+                                        fetches=fetches,
+                                        max_concurrent_queries=max_concurrent_queries)
+                prometheus_obj.close()
 
     except (exceptions.OpenshiftConnectionFailure,
-            exceptions.PrometheusPodNotFound) as error:
+            exceptions.PrometheusPodNotFound,
+            exceptions.PortForwardFailure) as error:
         print(f"Error: {error}")
         return ExitStatus.ERROR
 
-    for metric in qry.get_metrics():
-        process(prometheus_obj=prometheus_obj,
-                metric=metric,
+    renderer = new_renderer()
+    exit_status = ExitStatus.SUCCESS
+    frames = []
+    for metric, (time_series_df, error) in zip(metrics, results):
+        if error is not None:
+            print(f"Error: unable to fetch {metric['metric_name']}.\n{error}")
+            exit_status = ExitStatus.ERROR
+            # the series fetched from the other clusters are still processed
+            if time_series_df is None:
+                continue
+        if dataset and time_series_df is not None:
+            frames.append((metric["metric_name"], time_series_df))
+        process(metric=metric,
+                time_series_df=time_series_df,
                 plot_data=qry.is_plot_data_enabled(),
-                save_data=qry.is_save_fetched_data_enabled())
+                save_data=qry.is_save_fetched_data_enabled() and not dataset,
+                output_format=output_format,
+                compression=compression,
+                output_dir=output_dir,
+                renderer=renderer)
+        if args.compare_clusters and len(targets) > 1:
+            plot_clusters(metric, time_series_df, qry.is_plot_data_enabled(), renderer)
+
+    if qry.is_save_fetched_data_enabled() and dataset and len(frames) > 0:
+        directory = path.join(output_dir, f"f3tch_{int(datetime.now().timestamp())}")
+        export.save_dataset(frames, directory, output_format=output_format,
+                            compression=compression)
+        print(f"Fetched data saved to {directory}")
 
-    if qry.is_plot_data_enabled():
-        pyplot.show()
+    for error in renderer.close():
+        print(f"Error: unable to render plot.\n{error}")
+        exit_status = ExitStatus.ERROR
 
-    return ExitStatus.SUCCESS
+    return exit_status
@@ -0,0 +1,226 @@
+"""Downsampling of plotted lines to a point budget that preserves their visual shape.
+
+Raises:
+    exceptions.UnsupportedDecimation: unknown decimation method
+"""
+
+# custom imports
+from f3tch import exceptions
+
+METHODS = ["minmax", "lttb", "none"]
+DEFAULT_METHOD = "minmax"
+
+
+def check_method(method):
+    """Validate a decimation method
+
+    Args:
+        method (str): one of METHODS
+
+    Raises:
+        exceptions.UnsupportedDecimation: unknown decimation method
+
+    Returns:
+        (str): decimation method
+    """
+    if method not in METHODS:
+        raise exceptions.UnsupportedDecimation(
+            f"Unknown decimation method {method}, expected one of {METHODS}")
+    return method
+
+
+def _gap_indices(y):
+    """Indices of the first sample of each run of NaN values, kept so that gaps still break the
+    plotted line"""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    missing = np.isnan(y)
+    return np.flatnonzero(missing & ~np.concatenate(([False], missing[:-1])))
+
+
+def minmax_indices(y, max_points):
+    """Select the first and last samples, and the first minimum and first maximum sample of
+    (max_points-2)/2 equal-count buckets
+
+    Args:
+        y (numpy.array): sample values
+        max_points (int): maximum number of samples kept, apart from the NaN gap markers
+
+    Returns:
+        (numpy.array): sorted indices of the samples kept
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    num_samples = len(y)
+    num_buckets = (max_points - 2) // 2
+    if num_samples <= max_points or num_buckets < 1:
+        return np.arange(num_samples)
+
+    starts = np.linspace(0, num_samples, num_buckets + 1).astype(np.int64)[:-1]
+    bucket = np.repeat(np.arange(num_buckets), np.diff(np.append(starts, num_samples)))
+    selected = [[0, num_samples - 1], _gap_indices(y)]
+    for reduce in (np.fmin, np.fmax):
+        # buckets made of NaN values only have no extremum and select nothing
+        hits = np.flatnonzero(y == reduce.reduceat(y, starts)[bucket])
+        first = np.concatenate(([True], bucket[hits][1:] != bucket[hits][:-1]))
+        selected.append(hits[first])
+    return np.unique(np.concatenate(selected))
+
+
+def lttb_indices(x, y, max_points):
+    """Select samples with the Largest-Triangle-Three-Buckets algorithm: the first and last
+    samples, and in each of max_points-2 equal-count buckets the sample forming the largest
+    triangle with the previously selected sample and the average of the next bucket.
+    NaN values are skipped.
+
+    Args:
+        x (numpy.array): sample positions, e.g. Unix timestamps
+        y (numpy.array): sample values
+        max_points (int): maximum number of samples kept, apart from the NaN gap markers
+
+    Returns:
+        (numpy.array): sorted indices of the samples kept
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    finite = np.flatnonzero(~np.isnan(y))
+    num_samples = len(finite)
+    if num_samples <= max_points or max_points < 3:
+        return np.arange(len(y))
+    gaps = _gap_indices(y)
+    x = np.asarray(x, dtype=np.float64)[finite]
+    y = np.asarray(y, dtype=np.float64)[finite]
+
+    num_buckets = max_points - 2
+    edges = np.linspace(1, num_samples - 1, num_buckets + 1).astype(np.int64)
+    lengths = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / lengths
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / lengths
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, num_samples - 1
+    anchor = 0
+    for i in range(num_buckets):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs((x[anchor] - avg_x[i]) * (y[start:stop] - y[anchor])
+                      - (x[anchor] - x[start:stop]) * (avg_y[i] - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return np.unique(np.concatenate((finite[selected], gaps)))
+
+
+def decimate_indices(x, y, max_points, method=DEFAULT_METHOD):
+    """Select the samples of a line to plot within a point budget
+
+    Args:
+        x (numpy.array): sample positions, e.g. Unix timestamps
+        y (numpy.array): sample values
+        max_points (int): point budget, None or 0 to keep every sample
+        method (str, optional): one of METHODS. Defaults to DEFAULT_METHOD.
+
+    Raises:
+        exceptions.UnsupportedDecimation: unknown decimation method
+
+    Returns:
+        (numpy.array): sorted indices of the samples kept
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    y = np.asarray(y, dtype=np.float64)
+    if check_method(method) == "none" or not max_points or len(y) <= max_points:
+        return np.arange(len(y))
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    return minmax_indices(y, max_points)
+
+
+class StreamingMinMax:
+    """Minmax decimation of a line fed chunk by chunk, in memory bounded by the point budget.
+
+    The known time range of the line is split into (max_points-2)/2 equal-time buckets, and
+    the first samples, the first and last sample, the first minimum and first maximum sample
+    of each bucket and the first NaN sample of each gap are kept, together with the extra
+    columns of those samples (e.g. their rolling statistics). On a regular grid, equal-time
+    buckets are the equal-count buckets of minmax_indices.
+    """
+
+    def __init__(self, from_timestamp, to_timestamp, max_points, width=0, head=0):
+        """Initialization function
+
+        Args:
+            from_timestamp (float): Starting Unix timestamp of the line
+            to_timestamp (float): Ending Unix timestamp of the line
+            max_points (int): point budget, apart from the first samples and NaN gap markers
+            width (int, optional): number of extra columns of each sample. Defaults to 0.
+            head (int, optional): number of first samples kept as is. Defaults to 0.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        self.from_timestamp = float(from_timestamp)
+        self.span = max(float(to_timestamp) - self.from_timestamp, 1e-9)
+        self.num_buckets = max(1, (max_points - 2) // 2)
+        self.head = head
+        self.kept = []
+        self.first = None
+        self.last = None
+        self.previous_missing = False
+        # sample (timestamp, value, columns...) of the minimum and maximum of each bucket
+        self.extremes = [np.full((self.num_buckets, 2 + width), np.nan) for _ in range(2)]
+
+    def append(self, timestamps, values, columns=None):
+        """Decimate the next samples of the line
+
+        Args:
+            timestamps (numpy.array): sorted Unix timestamps, after those already appended
+            values (numpy.array): sample values
+            columns (numpy.array, optional): (len(values), width) extra columns of the
+                samples. Defaults to None.
+
+        Returns:
+            (StreamingMinMax): self
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        rows = np.column_stack([timestamps, values] + ([] if columns is None else [columns]))
+        if self.head > 0:
+            self.kept.append(rows[:self.head])
+            rows = rows[self.head:]
+            self.head -= len(self.kept[-1])
+        if len(rows) == 0:
+            return self
+        if self.first is None:
+            self.first = rows[0]
+        self.last = rows[-1]
+
+        missing = np.isnan(rows[:, 1])
+        self.kept.append(rows[missing & ~np.concatenate(([self.previous_missing],
+                                                         missing[:-1]))])
+        self.previous_missing = bool(missing[-1])
+
+        rows = rows[~missing]
+        if len(rows) == 0:
+            return self
+        bucket = np.clip(((rows[:, 0] - self.from_timestamp) / self.span
+                          * self.num_buckets).astype(np.int64), 0, self.num_buckets - 1)
+        buckets, starts = np.unique(bucket, return_index=True)
+        position = np.repeat(np.arange(len(buckets)), np.diff(np.append(starts, len(rows))))
+        for reduce, better, extremes in ((np.minimum, np.less, self.extremes[0]),
+                                         (np.maximum, np.greater, self.extremes[1])):
+            hits = np.flatnonzero(rows[:, 1] == reduce.reduceat(rows[:, 1], starts)[position])
+            first = np.concatenate(([True], position[hits][1:] != position[hits][:-1]))
+            candidates = rows[hits[first]]
+            current = extremes[buckets, 1]
+            replace = np.isnan(current) | better(candidates[:, 1], current)
+            extremes[buckets[replace]] = candidates[replace]
+        return self
+
+    def result(self):
+        """Samples kept so far
+
+        Returns:
+            (numpy.array): (num_kept, 2 + width) rows of timestamp, value and extra columns,
+                sorted by timestamp
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        rows = list(self.kept) + [extremes[~np.isnan(extremes[:, 1])]
+                                  for extremes in self.extremes]
+        rows += [row[np.newaxis] for row in (self.first, self.last) if row is not None]
+        rows = np.concatenate(rows) if len(rows) > 0 else np.empty((0, self.extremes[0].shape[1]))
+        _, unique = np.unique(rows[:, 0], return_index=True)
+        return rows[unique]
@@ -0,0 +1,242 @@
+"""Prometheus pod discovery and the on-disk discovery cache.
+
+Raises:
+    exceptions.OpenshiftConnectionFailure: failure to query the OpenShift cluster
+"""
+# standard imports
+import json
+import os
+import threading
+import time
+
+# custom imports
+from f3tch import exceptions, profiling
+
+DEFAULT_PROMETHEUS_FQNAME = "openshift-monitoring:pod/prometheus-k8s-0"
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "f3tch", "discovery.json")
+DEFAULT_CACHE_TTL = 3600
+
+
+def parse_fqname(fqname):
+    """Split a fully qualified object name into its namespace and qualified name
+        Example: 'openshift-monitoring:pod/prometheus-k8s-0' ->
+        ('openshift-monitoring', 'pod/prometheus-k8s-0')
+
+    Args:
+        fqname (str): fully qualified object name (namespace:kind/name)
+
+    Returns:
+        (tuple): (namespace, qualified name)
+    """
+    namespace, _, qname = fqname.rpartition(":")
+    return (namespace or None), qname
+
+
+def parse_label_selector(label_selector):
+    """Convert a label selector string into a dictionary
+        Example: 'app.kubernetes.io/name=prometheus,prometheus=k8s' ->
+        {'app.kubernetes.io/name': 'prometheus', 'prometheus': 'k8s'}
+
+    Args:
+        label_selector (str): comma separated list of key=value label requirements
+
+    Returns:
+        (dict): label requirements
+    """
+    labels = {}
+    for requirement in label_selector.split(","):
+        if requirement.strip() == "":
+            continue
+        key, _, value = requirement.partition("=")
+        labels[key.strip()] = value.strip()
+    return labels
+
+
+@profiling.profiled("discovery.get_pod")
+def get_pod(fqname):
+    """Retrieve a pod by its fully qualified name with a single `oc get`
+
+    Args:
+        fqname (str): fully qualified pod name (namespace:pod/name)
+
+    Raises:
+        exceptions.OpenshiftConnectionFailure: failure to query the OpenShift cluster
+
+    Returns:
+        openshift.APIObject: pod object, or None if the pod does not exist
+    """
+    import openshift  # pylint: disable=import-outside-toplevel
+    namespace, qname = parse_fqname(fqname)
+    try:
+        with openshift.client_host(), openshift.project(namespace):
+            return openshift.selector(qname).object(ignore_not_found=True)
+    except openshift.model.OpenShiftPythonException as exc:
+        raise exceptions.OpenshiftConnectionFailure from exc
+
+
+@profiling.profiled("discovery.find_pod")
+def find_pod(namespace, label_selector):
+    """Retrieve the first running pod matching a label selector in a namespace with a
+    single `oc get`
+
+    Args:
+        namespace (str): namespace to search
+        label_selector (str): label selector, e.g. 'app.kubernetes.io/name=prometheus'
+
+    Raises:
+        exceptions.OpenshiftConnectionFailure: failure to query the OpenShift cluster
+
+    Returns:
+        openshift.APIObject: pod object, or None if no running pod matches
+    """
+    import openshift  # pylint: disable=import-outside-toplevel
+    try:
+        with openshift.client_host(), openshift.project(namespace):
+            pods = openshift.selector("pods", labels=parse_label_selector(label_selector),
+                                      field_selectors={"status.phase": "Running"}).objects()
+    except openshift.model.OpenShiftPythonException as exc:
+        raise exceptions.OpenshiftConnectionFailure from exc
+
+    pods = sorted(pods, key=lambda pod: pod.name())
+    return pods[0] if len(pods) > 0 else None
+
+
+def _load_kubeconfig(kubeconfig):
+    """Load a kubeconfig file, returning an empty configuration if it cannot be read"""
+    import yaml  # pylint: disable=import-outside-toplevel
+    try:
+        with open(kubeconfig, "r", encoding="utf8") as file:
+            return yaml.safe_load(file) or {}
+    except (OSError, yaml.YAMLError):
+        return {}
+
+
+def get_kubeconfig_context(kubeconfig):
+    """Retrieve the current-context of a kubeconfig file
+
+    Args:
+        kubeconfig (str): path to kube-config file
+
+    Returns:
+        (str): current-context name, or None if it cannot be determined
+    """
+    return _load_kubeconfig(kubeconfig).get("current-context")
+
+
+def get_kubeconfig_cluster(kubeconfig, origin=None):
+    """Identify the cluster targeted by the current-context of a kubeconfig file
+
+    Args:
+        kubeconfig (str): path to kube-config file
+        origin (str, optional): path to the kube-config file kubeconfig is a temporary copy
+            of. Defaults to None, i.e. kubeconfig is not a copy.
+
+    Returns:
+        (str): API server URL of the cluster, or the kubeconfig path and context if the
+            server cannot be determined
+    """
+    config = _load_kubeconfig(kubeconfig)
+    context = config.get("current-context")
+    cluster_name = None
+    for _context in config.get("contexts") or []:
+        if _context.get("name") == context:
+            cluster_name = (_context.get("context") or {}).get("cluster")
+            break
+
+    for _cluster in config.get("clusters") or []:
+        if _cluster.get("name") == cluster_name:
+            server = (_cluster.get("cluster") or {}).get("server")
+            if server is not None:
+                return server
+    return f"{os.path.abspath(origin or kubeconfig)}|{context}"
+
+
+class DiscoveryCache:
+    """On-disk cache of the resolved Prometheus pod (and server version) per
+    kubeconfig/context
+    """
+
+    def __init__(self, filename=DEFAULT_CACHE_FILE, ttl=DEFAULT_CACHE_TTL):
+        """Initialization function
+
+        Args:
+            filename (str, optional): path to the JSON cache file.
+                Defaults to DEFAULT_CACHE_FILE.
+            ttl (int, optional): number of seconds a cache entry stays valid.
+                Defaults to DEFAULT_CACHE_TTL.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(kubeconfig, lookup, origin=None):
+        """Build the cache key of a kubeconfig/context and discovery lookup
+
+        Args:
+            kubeconfig (str): path to kube-config file
+            lookup (str): description of how the pod is looked up (fqname or
+                namespace and label selector)
+            origin (str, optional): path to the kube-config file kubeconfig is a temporary
+                copy of. Defaults to None, i.e. kubeconfig is not a copy.
+
+        Returns:
+            (str): cache key
+        """
+        return f"{os.path.abspath(origin or kubeconfig)}|" \
+            f"{get_kubeconfig_context(kubeconfig)}|{lookup}"
+
+    def __load(self):
+        try:
+            with open(self.filename, "r", encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        """Retrieve a cache entry that has not expired
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            (dict): {'fqname': ..., 'server_version': ...}, or None if there is no valid entry
+        """
+        with self.lock:
+            entry = self.__load().get(key)
+        if entry is None or time.time() - entry.get("timestamp", 0) > self.ttl:
+            return None
+        return entry
+
+    def put(self, key, fqname, server_version):
+        """Store a cache entry
+
+        Args:
+            key (str): cache key
+            fqname (str): fully qualified name of the resolved Prometheus pod
+            server_version (object): OpenShift server version
+        """
+        with self.lock:
+            now = time.time()
+            # expired entries are dropped, so that the file does not grow without bound
+            entries = {_key: entry for _key, entry in self.__load().items()
+                       if now - entry.get("timestamp", 0) <= self.ttl}
+            entries[key] = {"fqname": fqname, "server_version": server_version,
+                            "timestamp": now}
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            tmp_filename = f"{self.filename}.{os.getpid()}.tmp"
+            with open(tmp_filename, "w", encoding="utf8") as file:
+                json.dump(entries, file)
+            os.replace(tmp_filename, self.filename)
+
+    def invalidate(self, key):
+        """Remove a cache entry
+
+        Args:
+            key (str): cache key
+        """
+        with self.lock:
+            entries = self.__load()
+            if entries.pop(key, None) is not None:
+                with open(self.filename, "w", encoding="utf8") as file:
+                    json.dump(entries, file)
@@ -12,11 +12,32 @@ class PrometheusPodNotFound(Exception):
     OpenShift cluster"""
 
 
+class PortForwardFailure(Exception):
+    """Raised when a port-forward to the Prometheus pod cannot be established"""
+
+
+class ClusterFetchFailure(Exception):
+    """Raised when the time-series data of a metric cannot be retrieved from some of the
+    queried clusters"""
+
+
+class PrometheusQueryFailure(Exception):
+    """Raised when a request cannot be sent to the Prometheus HTTP API"""
+
+
 class TimeseriesConversionFailure(Exception):
     """Raised when a time-series array cannot be converted to a
     pandas DataFrame time-series object"""
 
 
+class UnsupportedDecimation(Exception):
+    """Raised when plotted lines are to be downsampled with an unknown decimation method"""
+
+
+class UnsupportedOutputFormat(Exception):
+    """Raised when fetched data cannot be saved or reloaded in the requested output format"""
+
+
 class InvalidQueryFileFormat(Exception):
     """Raised when the given query object JSON file does not conform to the
     expected format"""
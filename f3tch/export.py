@@ -0,0 +1,271 @@
+"""Saving and reloading fetched time-series data.
+
+Raises:
+    exceptions.UnsupportedOutputFormat: unknown output format or compression codec
+"""
+# standard imports
+import glob
+import os
+import urllib.parse
+
+# custom imports
+from f3tch import exceptions
+
+# Compression codecs supported by each output format; the first one is the default
+FORMATS = {
+    "csv": [None, "gzip", "bz2", "xz", "zstd"],
+    "parquet": ["snappy", "zstd", "gzip", "brotli", "lz4", None],
+    "feather": ["lz4", "zstd", None],
+    "npz": ["deflate", None],
+}
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "npz": ".npz"}
+CSV_EXTENSIONS = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}
+
+
+def check_format(output_format, compression=None):
+    """Validate an output format and compression codec
+
+    Args:
+        output_format (str): one of FORMATS
+        compression (str, optional): compression codec supported by output_format, "none" for
+            no compression. Defaults to None, i.e. the default codec of output_format.
+
+    Raises:
+        exceptions.UnsupportedOutputFormat: unknown output format or compression codec
+
+    Returns:
+        (str): compression codec, None for no compression
+    """
+    if output_format not in FORMATS:
+        raise exceptions.UnsupportedOutputFormat(
+            f"Unknown output format {output_format}, expected one of {list(FORMATS)}")
+    if compression is None:
+        return FORMATS[output_format][0]
+    if compression == "none":
+        return None
+    if compression not in FORMATS[output_format]:
+        raise exceptions.UnsupportedOutputFormat(
+            f"{output_format} does not support {compression} compression, expected one of "
+            f"{[codec or 'none' for codec in FORMATS[output_format]]}")
+    return compression
+
+
+def extension(output_format, compression):
+    """File extension of an output format
+
+    Args:
+        output_format (str): one of FORMATS
+        compression (str): compression codec, None for no compression
+
+    Returns:
+        (str): file extension
+    """
+    if output_format == "csv" and compression is not None:
+        return f".csv{CSV_EXTENSIONS[compression]}"
+    return EXTENSIONS[output_format]
+
+
+def save(time_series_df, basename, output_format="csv", compression=None):
+    """Save a time-series DataFrame
+
+    Args:
+        time_series_df (Pandas.DataFrame): time-series DataFrame indexed by timestamp
+        basename (str): file name without extension
+        output_format (str, optional): one of FORMATS. Defaults to "csv".
+        compression (str, optional): compression codec. Defaults to None, i.e. the default
+            codec of output_format.
+
+    Raises:
+        exceptions.UnsupportedOutputFormat: unknown output format or compression codec
+
+    Returns:
+        (str): name of the file written
+    """
+    compression = check_format(output_format, compression)
+    filename = f"{basename}{extension(output_format, compression)}"
+
+    if output_format == "csv":
+        time_series_df.to_csv(filename, sep=",", header=True, compression=compression)
+    elif output_format == "parquet":
+        time_series_df.to_parquet(filename, compression=compression)
+    elif output_format == "feather":
+        time_series_df.reset_index().to_feather(filename,
+                                                compression=compression or "uncompressed")
+    else:
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        arrays = {"timestamp": time_series_df.index.to_numpy().astype("datetime64[ns]"),
+                  "columns": np.asarray(time_series_df.columns, dtype=str),
+                  "values": time_series_df.to_numpy()}
+        if compression is None:
+            np.savez(filename, **arrays)
+        else:
+            np.savez_compressed(filename, **arrays)
+    return filename
+
+
+def load(filename):
+    """Reload a time-series DataFrame written by save
+
+    Args:
+        filename (str): file name
+
+    Raises:
+        exceptions.UnsupportedOutputFormat: unknown file extension
+
+    Returns:
+        (Pandas.DataFrame): time-series DataFrame indexed by timestamp
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    if ".csv" in os.path.basename(filename):
+        return pd.read_csv(filename, sep=",", index_col="timestamp", parse_dates=["timestamp"])
+    if filename.endswith(".parquet"):
+        return pd.read_parquet(filename)
+    if filename.endswith(".feather"):
+        return pd.read_feather(filename).set_index("timestamp")
+    if filename.endswith(".npz"):
+        with np.load(filename) as data:
+            index = pd.DatetimeIndex(data["timestamp"], name="timestamp")
+            return pd.DataFrame(data["values"], index=index, columns=list(data["columns"]))
+    raise exceptions.UnsupportedOutputFormat(f"Unknown file extension: {filename}")
+
+
+class AppendWriter:
+    """Save a time-series DataFrame chunk by chunk, appending every chunk to the same file,
+    which reloads like a file written by save. npz archives cannot be appended to.
+    """
+
+    def __init__(self, basename, output_format="csv", compression=None):
+        """Initialization function
+
+        Args:
+            basename (str): file name without extension
+            output_format (str, optional): one of FORMATS but npz. Defaults to "csv".
+            compression (str, optional): compression codec. Defaults to None, i.e. the
+                default codec of output_format.
+
+        Raises:
+            exceptions.UnsupportedOutputFormat: unknown output format or compression codec,
+                or npz
+        """
+        self.compression = check_format(output_format, compression)
+        if output_format == "npz":
+            raise exceptions.UnsupportedOutputFormat("npz archives cannot be appended to")
+        self.output_format = output_format
+        self.filename = f"{basename}{extension(output_format, self.compression)}"
+        self.writer = None
+        self.rows = 0
+
+    def append(self, time_series_df):
+        """Append a chunk to the file
+
+        Args:
+            time_series_df (Pandas.DataFrame): time-series DataFrame indexed by timestamp,
+                with the columns of the previous chunks
+        """
+        if self.output_format == "csv":
+            time_series_df.to_csv(self.filename, sep=",", header=self.rows == 0,
+                                  mode="w" if self.rows == 0 else "a",
+                                  compression=self.compression)
+        else:
+            import pyarrow as pa  # pylint: disable=import-outside-toplevel
+            if self.output_format == "parquet":
+                import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+                table = pa.Table.from_pandas(time_series_df)
+                if self.writer is None:
+                    self.writer = pq.ParquetWriter(self.filename, table.schema,
+                                                   compression=self.compression or "none")
+            else:
+                import pyarrow.ipc as ipc  # pylint: disable=import-outside-toplevel
+                table = pa.Table.from_pandas(time_series_df.reset_index(), preserve_index=False)
+                if self.writer is None:
+                    self.writer = ipc.new_file(self.filename, table.schema,
+                                               options=ipc.IpcWriteOptions(
+                                                   compression=self.compression))
+            self.writer.write_table(table)
+        self.rows += len(time_series_df)
+
+    def close(self):
+        """Finish the file
+
+        Returns:
+            (str): name of the file written, or None if no chunk was appended
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        return self.filename if self.rows > 0 else None
+
+
+def check_dataset(metric_names):
+    """Check that metrics can be saved into one dataset, whose partitions are keyed by metric
+    name only
+
+    Args:
+        metric_names (list(str)): PromQL expression of each metric
+
+    Raises:
+        exceptions.UnsupportedOutputFormat: metric listed several times, whose partitions
+            would collide
+    """
+    repeated = sorted({name for name in metric_names if metric_names.count(name) > 1})
+    if len(repeated) > 0:
+        raise exceptions.UnsupportedOutputFormat(
+            f"Metrics listed several times cannot be saved into one dataset: {repeated}")
+
+
+def save_dataset(frames, directory, output_format="parquet", compression=None):
+    """Save the time-series DataFrames of all metrics of a run into one dataset partitioned
+    by metric, laid out as <directory>/metric=<quoted metric name>/part-0.<extension>
+
+    Args:
+        frames (list(tuple)): (metric_name, time-series DataFrame) for each metric
+        directory (str): dataset directory
+        output_format (str, optional): one of FORMATS. Defaults to "parquet".
+        compression (str, optional): compression codec. Defaults to None, i.e. the default
+            codec of output_format.
+
+    Raises:
+        exceptions.UnsupportedOutputFormat: unknown output format or compression codec, or
+            metric listed several times
+
+    Returns:
+        (list(str)): names of the files written
+    """
+    compression = check_format(output_format, compression)
+    check_dataset([metric_name for metric_name, _ in frames])
+    filenames = []
+    for i, (metric_name, time_series_df) in enumerate(frames):
+        partition = os.path.join(directory,
+                                 f"metric={urllib.parse.quote(metric_name, safe='')}")
+        os.makedirs(partition, exist_ok=True)
+        filenames.append(save(time_series_df, os.path.join(partition, f"part-{i}"),
+                              output_format=output_format,
+                              compression=compression or "none"))
+    return filenames
+
+
+def load_run(path):
+    """Reload the time-series data saved by a run, either a dataset directory written by
+    save_dataset or a glob pattern of files written by save
+
+    Args:
+        path (str): dataset directory or glob pattern
+
+    Returns:
+        (dict): time-series DataFrame of each metric name (or file name)
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    frames = {}
+    if os.path.isdir(path):
+        for partition in sorted(glob.glob(os.path.join(path, "metric=*"))):
+            metric_name = urllib.parse.unquote(os.path.basename(partition)[len("metric="):])
+            parts = [load(filename)
+                     for filename in sorted(glob.glob(os.path.join(partition, "part-*")))]
+            if len(parts) > 0:
+                frames[metric_name] = pd.concat(parts)
+        return frames
+
+    for filename in sorted(glob.glob(path)):
+        frames[os.path.basename(filename)] = load(filename)
+    return frames
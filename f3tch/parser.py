@@ -0,0 +1,204 @@
+"""Streaming parser of Prometheus query_range responses.
+
+The response is read in chunks and the samples are written straight into a growable
+numeric buffer, so the JSON document is never materialized as a whole: peak memory stays
+around twice the size of the final sample arrays.
+"""
+# standard imports
+import codecs
+import json
+import re
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Keys of interest outside of the sample arrays
+_KEY_RE = re.compile(r'"(metric|values|status|error)"\s*:\s*')
+# A single [timestamp, "value"] sample
+_SAMPLE_RE = re.compile(r'\[\s*([^,\s\]]+)\s*,\s*"([^"]*)"\s*\]')
+# The end of a values array: the closing bracket of its last sample and its own
+_VALUES_END_RE = re.compile(r'\]\s*\]')
+_EMPTY_VALUES_RE = re.compile(r'\s*\]')
+_NON_SPACE_RE = re.compile(r'\S')
+
+
+class GrowableBuffer:
+    """Preallocated (capacity, width) float64 sample buffer that doubles its capacity when full.
+    Samples discarded from the start of the buffer leave room that is reclaimed by moving the
+    remaining samples back when the buffer is full, so that a trailing window of samples is
+    kept in amortized constant time per sample.
+    """
+
+    def __init__(self, capacity=0, width=2):
+        """Initialization function
+
+        Args:
+            capacity (int, optional): initial number of samples. Defaults to 0.
+            width (int, optional): number of columns, e.g. timestamp and value.
+                Defaults to 2.
+        """
+        self.data = np.empty((max(int(capacity), 1024), width), dtype=np.float64)
+        self.start = 0
+        self.size = 0
+
+    def append(self, samples):
+        """Append samples at the end of the buffer
+
+        Args:
+            samples (numpy.array): (num_samples, width) array, e.g. a 2-dimensional
+                time-series array [[t1,value1], ...]
+        """
+        required = self.size + len(samples)
+        if self.start + required > len(self.data):
+            live = self.data[self.start:self.start + self.size]
+            if 2 * required <= len(self.data):
+                # at least half of the buffer was discarded: reclaim it in place
+                self.data[:self.size] = live
+            else:
+                data = np.empty((max(required, 2 * len(self.data)), self.data.shape[1]),
+                                dtype=np.float64)
+                data[:self.size] = live
+                self.data = data
+            self.start = 0
+        self.data[self.start + self.size:self.start + required] = samples
+        self.size = required
+
+    def discard(self, count):
+        """Discard the first samples of the buffer
+
+        Args:
+            count (int): number of samples to discard
+        """
+        count = min(int(count), self.size)
+        self.start += count
+        self.size -= count
+
+    def view(self, start, stop):
+        """Samples in [start, stop) as a view into the buffer
+
+        Args:
+            start (int): first sample
+            stop (int): sample after the last one
+
+        Returns:
+            (numpy.array): (stop - start, width) array
+        """
+        return self.data[self.start + start:self.start + stop]
+
+
+class _Incomplete(Exception):
+    """Raised internally when the buffered text ends in the middle of a token"""
+
+
+def _samples_to_array(pairs):
+    """Convert (timestamp, value) string pairs to a 2-dimensional float64 array"""
+    if len(pairs) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.array(pairs, dtype=np.float64)
+
+
+def parse_query_range(stream, capacity=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Parse a query_range response incrementally
+
+    Args:
+        stream (file-like): binary stream of the response body
+        capacity (int, optional): expected number of samples, used to preallocate the sample
+            buffer. Defaults to 0.
+        chunk_size (int, optional): number of bytes read at a time.
+            Defaults to DEFAULT_CHUNK_SIZE.
+
+    Raises:
+        ValueError: the response is not a valid query_range response
+
+    Returns:
+        (tuple): (status, error, series) where series is a list of (labels, values) for each
+            series, values being a 2-dimensional time-series array view into a shared buffer
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    json_decoder = json.JSONDecoder(strict=False)
+    buffer = GrowableBuffer(capacity)
+    spans = []
+    status = error = None
+    labels = {}
+    in_values = False
+    series_start = 0
+
+    text = ""
+    pos = 0
+    eof = False
+    while True:
+        if not eof:
+            chunk = stream.read(chunk_size)
+            eof = len(chunk) == 0
+            text = text[pos:] + decoder.decode(chunk, final=eof)
+            pos = 0
+
+        while True:
+            if in_values:
+                if buffer.size == series_start:
+                    empty = _EMPTY_VALUES_RE.match(text, pos)
+                    if empty is not None:
+                        spans.append((labels, series_start, buffer.size))
+                        in_values = False
+                        pos = empty.end()
+                        continue
+                    if _NON_SPACE_RE.search(text, pos) is None:
+                        break
+
+                match = _VALUES_END_RE.search(text, pos)
+                if match is None:
+                    # parse up to the last complete sample, keeping its closing bracket in
+                    # case the closing bracket of the array starts the next chunk
+                    end = text.rfind("]") + 1
+                    if end > pos:
+                        buffer.append(_samples_to_array(_SAMPLE_RE.findall(text, pos, end)))
+                        pos = end - 1
+                    break
+
+                buffer.append(_samples_to_array(
+                    _SAMPLE_RE.findall(text, pos, match.start() + 1)))
+                spans.append((labels, series_start, buffer.size))
+                in_values = False
+                pos = match.end()
+                continue
+
+            match = _KEY_RE.search(text, pos)
+            if match is None:
+                # keep enough text to recognize a key split across two chunks
+                pos = max(pos, len(text) - 16)
+                break
+            try:
+                key = match.group(1)
+                if key == "values":
+                    if match.end() >= len(text):
+                        raise _Incomplete
+                    if text[match.end()] != "[":
+                        raise ValueError(f"Unexpected values at offset {match.end()}")
+                    in_values = True
+                    series_start = buffer.size
+                    pos = match.end() + 1
+                    continue
+                try:
+                    value, end = json_decoder.raw_decode(text, match.end())
+                except json.JSONDecodeError as exc:
+                    if eof:
+                        raise ValueError(str(exc)) from exc
+                    raise _Incomplete from exc
+            except _Incomplete:
+                pos = match.start()
+                break
+            if key == "metric":
+                labels = value
+            elif key == "status":
+                status = value
+            else:
+                error = value
+            pos = end
+
+        if eof:
+            break
+
+    if in_values:
+        raise ValueError("Truncated query_range response")
+    series = [(labels, buffer.view(start, stop)) for labels, start, stop in spans]
+    return status, error, series
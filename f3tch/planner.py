@@ -0,0 +1,124 @@
+"""Fetch planning: spec entries querying the same expression on the same step grid share
+a single fetch covering their merged time ranges.
+"""
+# custom imports
+from f3tch import exceptions, ranges, utils
+
+
+def plan(metrics):
+    """Group spec entries by (PromQL expression, step grid) and merge their overlapping or
+    adjacent time ranges into fetches
+
+    Args:
+        metrics (list(dictionary)): list of metric information to query prometheus
+
+    Returns:
+        list(dictionary): fetches in order of their first spec entry, each with the
+            metric_name, from_timestamp, to_timestamp and step_size to query prometheus with
+            and the indices of the spec entries it serves
+    """
+    groups = {}
+    for i, metric in enumerate(metrics):
+        step_size = metric["step_size"]
+        key = (metric["metric_name"], step_size, metric["from_timestamp"] % step_size)
+        groups.setdefault(key, []).append(i)
+
+    fetches = []
+    for (metric_name, step_size, _), entries in groups.items():
+        merged = ranges.merge_ranges([(metrics[i]["from_timestamp"], metrics[i]["to_timestamp"])
+                                      for i in entries], step_size)
+        for from_timestamp, to_timestamp in merged:
+            fetches.append({"metric_name": metric_name,
+                            "from_timestamp": from_timestamp,
+                            "to_timestamp": to_timestamp,
+                            "step_size": step_size,
+                            "entries": [i for i in entries
+                                        if from_timestamp <= metrics[i]["from_timestamp"]
+                                        and metrics[i]["to_timestamp"] <= to_timestamp]})
+    return sorted(fetches, key=lambda fetch: fetch["entries"][0])
+
+
+def select(series_set, metric):
+    """Select the samples of a spec entry from the result of the fetch covering it, keeping
+    the label sets of the series
+
+    Args:
+        series_set (series.SeriesSet): series retrieved by the fetch, or None
+        metric (dictionary): metric information of the spec entry
+
+    Returns:
+        (series.SeriesSet): series with samples within the time range of the spec entry, or
+            None if there is none
+    """
+    if series_set is None:
+        return None
+    return series_set.select(metric["from_timestamp"], metric["to_timestamp"])
+
+
+def serve(series_set, metric):
+    """Serve a spec entry from the result of the fetch covering it
+
+    Args:
+        series_set (series.SeriesSet): series retrieved by the fetch, or None
+        metric (dictionary): metric information of the spec entry
+
+    Raises:
+        exceptions.TimeseriesConversionFailure: failed to convert time-series array to
+            Pandas.DataFrame object
+
+    Returns:
+        (Pandas.DataFrame): time-series data of the series with samples within the time range
+            of the spec entry, or None if there is none; its values are held by a
+            series.GridSeries when the spec entry has a float32 value_dtype or a memmap_dir,
+            in which case the grid points without any sample are kept as NaN rows
+    """
+    served = select(series_set, metric)
+    if served is None:
+        return None
+    try:
+        if metric.get("value_dtype", "float64") == "float64" and \
+                metric.get("memmap_dir") is None:
+            return served.to_dataframe()
+        try:
+            grid = served.to_grid(metric["step_size"], dtype=metric.get("value_dtype", "float64"),
+                                  directory=metric.get("memmap_dir"))
+        except ValueError:
+            # samples off the step grid, e.g. of subqueries, keep their timestamps
+            return served.to_dataframe()
+        # leaving out the grid points without any sample would copy memory-mapped values
+        return grid.to_dataframe(keep_gaps=metric.get("memmap_dir") is not None)
+    except Exception as exc:
+        raise exceptions.TimeseriesConversionFailure from exc
+
+
+def explain(fetches, metrics, max_points_per_request=ranges.MAX_POINTS_PER_REQUEST):
+    """Describe a fetch plan
+
+    Args:
+        fetches (list(dictionary)): fetches returned by plan
+        metrics (list(dictionary)): list of metric information the plan was made for
+        max_points_per_request (int, optional): maximum number of points per series requested
+            by a single query_range request. Defaults to MAX_POINTS_PER_REQUEST.
+
+    Returns:
+        (str): plan description, with the number of query_range requests and the estimated
+            number of samples per series of each fetch
+    """
+    planned_samples = sum(ranges.num_points(metric["from_timestamp"], metric["to_timestamp"],
+                                            metric["step_size"]) for metric in metrics)
+    lines = [f"{len(metrics)} spec entries -> {len(fetches)} fetches"]
+    total_samples = 0
+    for i, fetch in enumerate(fetches):
+        samples = ranges.num_points(fetch["from_timestamp"], fetch["to_timestamp"],
+                                    fetch["step_size"])
+        requests = len(ranges.split_range(fetch["from_timestamp"], fetch["to_timestamp"],
+                                          fetch["step_size"], max_points_per_request))
+        total_samples += samples
+        lines.append(f"[{i}] {fetch['metric_name']}\n"
+                     f"    {utils.convert_time(fetch['from_timestamp'])} -> "
+                     f"{utils.convert_time(fetch['to_timestamp'])} step {fetch['step_size']}s, "
+                     f"{requests} request(s), ~{samples} samples per series, "
+                     f"serves spec entries {fetch['entries']}")
+    lines.append(f"Estimated samples per series: {total_samples} "
+                 f"(vs {planned_samples} without planning)")
+    return "\n".join(lines)
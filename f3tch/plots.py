@@ -3,19 +3,102 @@
 
 # standard imports
 import math
-from matplotlib import pyplot
+from matplotlib import pyplot, style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
+import pandas as pd
 
 # custom imports
-from f3tch import utils
+from f3tch import decimate, profiling, utils
+from f3tch.rolling import RollingStats
+from f3tch.slices import TimeSliceIndex
 
 # pylint: disable=too-many-arguments
 # pylint: disable-msg=too-many-locals
 
+# The seaborn style was renamed in matplotlib 3.6
+PLOT_STYLE = "seaborn" if "seaborn" in style.available else "seaborn-v0_8"
+PLOT_DPI = 300
 
+
+def new_figure(headless=False):
+    """Create a new figure and its axis
+
+    Args:
+        headless (bool, optional): Set to True to create a standalone Agg figure that is not
+            managed by pyplot, e.g. when rendering without a display or in worker processes.
+            Defaults to False.
+
+    Returns:
+        (tuple): (matplotlib.figure.Figure, matplotlib.axes.Axes)
+    """
+    if headless:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+    else:
+        fig = pyplot.figure()
+    return fig, fig.add_subplot()
+
+
+def point_budget(fig, max_points=None):
+    """Number of points each line of a figure is downsampled to
+
+    Args:
+        fig (matplotlib.figure.Figure): figure
+        max_points (int, optional): explicit point budget, 0 to keep every sample.
+            Defaults to None, i.e. two points (a minimum and a maximum) per pixel column of
+            the saved figure.
+
+    Returns:
+        (int): point budget, 0 to keep every sample
+    """
+    if max_points is not None:
+        return max_points
+    return 2 * int(fig.get_figwidth() * PLOT_DPI)
+
+
+def decimate_series(vals, max_points, method=decimate.DEFAULT_METHOD):
+    """Downsample a time-series to a point budget
+
+    Args:
+        vals (Pandas.Series): time-series indexed by timestamp
+        max_points (int): point budget, 0 to keep every sample
+        method (str, optional): one of decimate.METHODS. Defaults to decimate.DEFAULT_METHOD.
+
+    Returns:
+        (Pandas.Series): downsampled time-series
+    """
+    if not max_points or len(vals) <= max_points:
+        return vals
+    positions = np.asarray(vals.index, dtype="datetime64[ns]").view(np.int64)
+    return vals.iloc[decimate.decimate_indices(positions, vals.to_numpy(), max_points, method)]
+
+
+def finish_figure(fig, plot_filename="", headless=False):
+    """Save a figure and either schedule it for display or release it
+
+    Args:
+        fig (matplotlib.figure.Figure): figure
+        plot_filename (str, optional): file name the figure is saved to; not saved if empty.
+            Defaults to "".
+        headless (bool, optional): Set to True if the figure was created headless.
+            Defaults to False.
+    """
+    if plot_filename != "":
+        fig.savefig(plot_filename, bbox_inches='tight', dpi=PLOT_DPI)
+    if headless:
+        fig.clear()
+    else:
+        fig.canvas.draw_idle()
+
+
+@profiling.profiled("plots.plot_timeseries")
 def plot_timeseries(time_series, metric_name, moving_avg_window_size=0, time_slices=None,
                     plot_title="Time Series Plot", plot_minmax=False, plot_filename="",
-                    plot_color="blue", verbose=False):
+                    plot_color="blue", verbose=False, headless=False,
+                    decimation=decimate.DEFAULT_METHOD, max_points=None, slice_index=None,
+                    rolling_stats=None):
     """Function to plot the time-series data using matplotlib.pyplot library
 
     Args:
@@ -28,6 +111,16 @@ def plot_timeseries(time_series, metric_name, moving_avg_window_size=0, time_sli
         plot_filename (str, optional): _description_. Defaults to "".
         plot_color (str, optional): _description_. Defaults to "blue".
         verbose (bool, optional): _description_. Defaults to False.
+        headless (bool, optional): Set to True to render with the Agg backend without pyplot.
+            Defaults to False.
+        decimation (str, optional): method each plotted line is downsampled with, one of
+            decimate.METHODS. Defaults to decimate.DEFAULT_METHOD.
+        max_points (int, optional): number of points each plotted line is downsampled to, 0
+            to keep every sample. Defaults to None, i.e. two points per pixel column.
+        slice_index (TimeSliceIndex, optional): positions of time_slices in the index of
+            time_series. Defaults to None, i.e. resolved from time_slices.
+        rolling_stats (RollingStats, optional): rolling statistics of the metric_name column
+            over moving_avg_window_size samples. Defaults to None, i.e. computed here.
     """
     if time_series is None:
         return
@@ -37,14 +130,16 @@ def plot_timeseries(time_series, metric_name, moving_avg_window_size=0, time_sli
 
     metric_name_lbl = utils.shorten_metric_name(metric_name)
     vals = time_series[metric_name]
+    vals_avg = vals_stdev = vals_min = vals_max = None
     # Compute the moving average
     if moving_avg_window_size > 0:
-        aux = vals.rolling(window=moving_avg_window_size)
-        vals_avg = aux.mean()
-        vals_stdev = aux.std()
+        if rolling_stats is None:
+            rolling_stats = RollingStats(moving_avg_window_size).append(vals.to_numpy())
+        vals_avg = pd.Series(rolling_stats.mean, index=vals.index, copy=False)
+        vals_stdev = pd.Series(rolling_stats.std, index=vals.index, copy=False)
         if plot_minmax:
-            vals_min = aux.min()
-            vals_max = aux.max()
+            vals_min = pd.Series(rolling_stats.min, index=vals.index, copy=False)
+            vals_max = pd.Series(rolling_stats.max, index=vals.index, copy=False)
         if verbose:
             print(f"The average {metric_name} value = {np.mean(vals)}")
             print(f"The std dev {metric_name} value = {np.std(vals)}")
@@ -52,57 +147,54 @@ def plot_timeseries(time_series, metric_name, moving_avg_window_size=0, time_sli
             print(f"The average moving_stdev value = {np.mean(vals_stdev)}")
 
     # Using a in-built style to change the look and feel of the plot
-    pyplot.style.use("seaborn")
-    pyplot.figure()
-    axis = pyplot.gca()
-    # Labelling the axes and setting a title
-    pyplot.xlabel("Date/Time")
-    pyplot.ylabel(metric_name_lbl)
-    pyplot.title(plot_title)
-
+    with style.context(PLOT_STYLE):
+        fig, axis = new_figure(headless)
+        # Labelling the axes and setting a title
+        axis.set_xlabel("Date/Time")
+        axis.set_ylabel(metric_name_lbl)
+        axis.set_title(plot_title)
+        if slice_index is None and time_slices is not None:
+            slice_index = TimeSliceIndex(time_series.index, time_slices)
+        lines = _timeseries_lines(vals, metric_name_lbl, moving_avg_window_size, slice_index,
+                                  plot_minmax, plot_color, vals_avg, vals_stdev, vals_min,
+                                  vals_max)
+        max_points = point_budget(fig, max_points)
+        for line, fmt, kwargs in lines:
+            axis.plot(decimate_series(line, max_points, decimation), fmt, **kwargs)
+        axis.legend()
+        finish_figure(fig, plot_filename, headless)
+
+
+def _timeseries_lines(vals, metric_name_lbl, moving_avg_window_size, slice_index, plot_minmax,
+                      plot_color, vals_avg, vals_stdev, vals_min, vals_max):
+    """List the lines of plot_timeseries as (time-series, format, keyword arguments)"""
     # Plot the metric column
     y_vals = vals[moving_avg_window_size:]
-    axis.plot(y_vals, label=metric_name_lbl, color=plot_color)
-
-    # Plot time_slices if specified
-    if time_slices is not None:
-        for time_slice in time_slices:
-            tmp_df = utils.date_filter(
-                time_series_df=vals, date_range=time_slice['time_range'])
-            tmp_df = tmp_df.loc[tmp_df.index >= y_vals.index.values[0]]
+    lines = [(y_vals, "-", {"label": metric_name_lbl, "color": plot_color})]
+
+    # Plot time_slices if specified, from the first sample of y_vals onwards
+    if slice_index is not None:
+        for time_slice, start, stop in slice_index:
+            start = max(start, moving_avg_window_size)
+            tmp_df = vals.iloc[start:max(start, stop)]
             lbl = time_slice["label"]
-            axis.plot(tmp_df, label=f"{lbl}_{metric_name_lbl}",
-                      color=time_slice['color'])
+            lines.append((tmp_df, "-", {"label": f"{lbl}_{metric_name_lbl}",
+                                        "color": time_slice['color']}))
 
     # Plot moving average
     if moving_avg_window_size > 0:
-        axis.plot(
-            vals_avg, label=f"moving_avg_{metric_name_lbl}", color='orchid')
-        axis.plot(vals_avg+vals_stdev, ':', label=f"moving_stdev_{metric_name_lbl}",
-                  color='crimson')
-        axis.plot(vals_avg-vals_stdev, ':', color='crimson')
+        lines.append((vals_avg, "-", {"label": f"moving_avg_{metric_name_lbl}",
+                                      "color": 'orchid'}))
+        lines.append((vals_avg+vals_stdev, ":", {"label": f"moving_stdev_{metric_name_lbl}",
+                                                 "color": 'crimson'}))
+        lines.append((vals_avg-vals_stdev, ":", {"color": 'crimson'}))
 
         if plot_minmax:
-            axis.plot(vals_min, label=f"moving_min_{metric_name_lbl}", color='darkturquoise',
-                      alpha=0.4)
-            axis.plot(vals_max, label=f"moving_max_{metric_name_lbl}", color='orangered',
-                      alpha=0.4)
-    pyplot.legend()
-    if plot_filename != "":
-        pyplot.savefig(plot_filename, bbox_inches='tight', dpi=300)
-    pyplot.draw()
-
-
-def sort_time_slices(time_slices):
-    """Sort time-slices array in ascending time-slice order
-
-    Args:
-        time_slices (list[map]): list of time-slices
-
-    Returns:
-        list[map]: sorted time-slice array
-    """
-    return sorted(time_slices, key=lambda x: x.get('time_range')[0], reverse=False)
+            lines.append((vals_min, "-", {"label": f"moving_min_{metric_name_lbl}",
+                                          "color": 'darkturquoise', "alpha": 0.4}))
+            lines.append((vals_max, "-", {"label": f"moving_max_{metric_name_lbl}",
+                                          "color": 'orangered', "alpha": 0.4}))
+    return lines
 
 
 def get_sample_idx(num_indices, num_samples):
@@ -122,7 +214,8 @@ def get_sample_idx(num_indices, num_samples):
     return sample_idx
 
 
-def process_time_slice_data(time_series, metric_name, time_slices, moving_avg_window_size, verbose):
+def process_time_slice_data(time_series, metric_name, time_slices, moving_avg_window_size, verbose,
+                            slice_index=None):
     """Process time-slices
 
     Args:
@@ -131,6 +224,8 @@ def process_time_slice_data(time_series, metric_name, time_slices, moving_avg_wi
         time_slices (_type_): _description_
         moving_avg_window_size (_type_): _description_
         verbose (_type_): _description_
+        slice_index (TimeSliceIndex, optional): positions of time_slices in the index of
+            time_series. Defaults to None, i.e. resolved from time_slices.
 
     Returns:
         list(map): list of processed time-slices
@@ -138,28 +233,18 @@ def process_time_slice_data(time_series, metric_name, time_slices, moving_avg_wi
 
     assert (metric_name in time_series.columns), \
         f"{metric_name} does not match given time-series!"
-    assert len(time_slices) >= 1, "At least 1 time-slice object is required."
+    if slice_index is None:
+        slice_index = TimeSliceIndex(time_series.index, time_slices)
+    assert len(slice_index) >= 1, "At least 1 time-slice object is required."
 
     metric_name_lbl = utils.shorten_metric_name(metric_name)
 
-    # sort time-slices
-    time_slices = sort_time_slices(time_slices=time_slices)
     vals = time_series[metric_name]
 
-    # Compute the moving average
-    if moving_avg_window_size > 0:
-        aux = vals.rolling(window=moving_avg_window_size)
-        vals_avg = aux.mean()
-        vals_stdev = aux.std()
-
-        if verbose:
-            print(f"vals_avg.shape = {len(vals_avg)}")
-            print(f"vals_stdev.shape = {len(vals_stdev)}")
-
     data = []
-    for time_slice in time_slices:
-        tmp_df = utils.date_filter(
-            time_series_df=vals, date_range=time_slice['time_range'])
+    # time-slices in ascending time order
+    for time_slice, start, stop in slice_index.sorted():
+        tmp_df = vals.iloc[start:stop]
         lbl = time_slice["label"]
 
         data.append({"x": np.asarray(tmp_df.index, dtype='datetime64[m]'),
@@ -169,8 +254,11 @@ def process_time_slice_data(time_series, metric_name, time_slices, moving_avg_wi
     return data
 
 
+@profiling.profiled("plots.plot_time_slices_overlaid")
 def plot_time_slices_overlaid(time_series, metric_name, time_slices, moving_avg_window_size=0,
-                              plot_title="Time Series Plot", plot_filename="", verbose=False):
+                              plot_title="Time Series Plot", plot_filename="", verbose=False,
+                              headless=False, decimation=decimate.DEFAULT_METHOD,
+                              max_points=None, slice_index=None):
     """Function to plot the time-slices data in unified time-space only using matplotlib.pyplot
     library
 
@@ -182,6 +270,14 @@ def plot_time_slices_overlaid(time_series, metric_name, time_slices, moving_avg_
         plot_title (str, optional): _description_. Defaults to "Time Series Plot".
         plot_filename (str, optional): _description_. Defaults to "".
         verbose (bool, optional): _description_. Defaults to False.
+        headless (bool, optional): Set to True to render with the Agg backend without pyplot.
+            Defaults to False.
+        decimation (str, optional): method each plotted line is downsampled with, one of
+            decimate.METHODS. Defaults to decimate.DEFAULT_METHOD.
+        max_points (int, optional): number of points each plotted line is downsampled to, 0
+            to keep every sample. Defaults to None, i.e. two points per pixel column.
+        slice_index (TimeSliceIndex, optional): positions of time_slices in the index of
+            time_series. Defaults to None, i.e. resolved from time_slices.
     """
 
     if time_series is None:
@@ -189,31 +285,33 @@ def plot_time_slices_overlaid(time_series, metric_name, time_slices, moving_avg_
 
     metric_name_lbl = utils.shorten_metric_name(metric_name)
 
-    # Using a in-built style to change the look and feel of the plot
-    pyplot.style.use("seaborn")
-    pyplot.figure()
-    axis = pyplot.gca()
-    # Labelling the axes and setting a title
-    # pyplot.xlabel("Date/Time")
-    pyplot.ylabel(metric_name_lbl)
-    pyplot.title(plot_title)
-
     data = process_time_slice_data(
-        time_series, metric_name, time_slices, moving_avg_window_size, verbose)
-    for _data in data:
-        axis.plot(_data["y"], label=_data["lbl"], color=_data["color"])
+        time_series, metric_name, time_slices, moving_avg_window_size, verbose, slice_index)
+
+    # Using a in-built style to change the look and feel of the plot
+    with style.context(PLOT_STYLE):
+        fig, axis = new_figure(headless)
+        # Labelling the axes and setting a title
+        axis.set_ylabel(metric_name_lbl)
+        axis.set_title(plot_title)
 
-    pyplot.legend()
-    pyplot.xticks([])
+        max_points = point_budget(fig, max_points)
+        for _data in data:
+            positions = np.arange(len(_data["y"]))
+            idx = decimate.decimate_indices(positions, _data["y"], max_points, decimation)
+            axis.plot(positions[idx], _data["y"][idx], label=_data["lbl"], color=_data["color"])
 
-    if plot_filename != "":
-        pyplot.savefig(plot_filename, bbox_inches='tight', dpi=300)
-    pyplot.draw()
+        axis.legend()
+        axis.set_xticks([])
+        finish_figure(fig, plot_filename, headless)
 
 
+@profiling.profiled("plots.plot_time_slices_discontiguous")
 def plot_time_slices_discontiguous(time_series, metric_name, time_slices, moving_avg_window_size=0,
                                    plot_title="Time Series Plot", plot_filename="", x_spacing=20,
-                                   x_tick_rotation=70, verbose=False):
+                                   x_tick_rotation=70, verbose=False, headless=False,
+                                   decimation=decimate.DEFAULT_METHOD, max_points=None,
+                                   slice_index=None):
     """Function to plot the time-slices data in discreet time-space only using matplotlib.pyplot
     library
 
@@ -225,6 +323,14 @@ def plot_time_slices_discontiguous(time_series, metric_name, time_slices, moving
         plot_title (str, optional): _description_. Defaults to "Time Series Plot".
         plot_filename (str, optional): _description_. Defaults to "".
         verbose (bool, optional): _description_. Defaults to False.
+        headless (bool, optional): Set to True to render with the Agg backend without pyplot.
+            Defaults to False.
+        decimation (str, optional): method each plotted line is downsampled with, one of
+            decimate.METHODS. Defaults to decimate.DEFAULT_METHOD.
+        max_points (int, optional): number of points each plotted line is downsampled to, 0
+            to keep every sample. Defaults to None, i.e. two points per pixel column.
+        slice_index (TimeSliceIndex, optional): positions of time_slices in the index of
+            time_series. Defaults to None, i.e. resolved from time_slices.
     """
 
     if time_series is None:
@@ -232,17 +338,23 @@ def plot_time_slices_discontiguous(time_series, metric_name, time_slices, moving
 
     metric_name_lbl = utils.shorten_metric_name(metric_name)
 
-    # Using a in-built style to change the look and feel of the plot
-    pyplot.style.use("seaborn")
-    pyplot.figure()
-    axis = pyplot.gca()
-    # Labelling the axes and setting a title
-    pyplot.ylabel(metric_name_lbl)
-    pyplot.title(plot_title)
-
     data = process_time_slice_data(
-        time_series, metric_name, time_slices, moving_avg_window_size, verbose)
+        time_series, metric_name, time_slices, moving_avg_window_size, verbose, slice_index)
 
+    # Using a in-built style to change the look and feel of the plot
+    with style.context(PLOT_STYLE):
+        fig, axis = new_figure(headless)
+        # Labelling the axes and setting a title
+        axis.set_ylabel(metric_name_lbl)
+        axis.set_title(plot_title)
+        _plot_discontiguous_lines(axis, data, x_spacing, x_tick_rotation,
+                                  point_budget(fig, max_points), decimation)
+        axis.legend()
+        finish_figure(fig, plot_filename, headless)
+
+
+def _plot_discontiguous_lines(axis, data, x_spacing, x_tick_rotation, max_points, decimation):
+    """Draw the time-slices of plot_time_slices_discontiguous on the given axis"""
     start = end = 0
     _xticks = []
     for _data in data:
@@ -255,7 +367,9 @@ def plot_time_slices_discontiguous(time_series, metric_name, time_slices, moving
         for k, _ in enumerate(range(start, end)):
             _xticks.append(_data["x"][k])
 
-        axis.plot(range(start, end), _data["y"],
+        positions = np.arange(start, end)
+        idx = decimate.decimate_indices(positions, _data["y"], max_points, decimation)
+        axis.plot(positions[idx], _data["y"][idx],
                   label=_data["lbl"], color=_data["color"])
 
     ticks = range(0, len(_xticks))
@@ -265,9 +379,43 @@ def plot_time_slices_discontiguous(time_series, metric_name, time_slices, moving
 
     axis.set_xticks([ticks[idx] for idx in sample_idx])
     axis.set_xticklabels([_xticks[idx] for idx in sample_idx])
-    pyplot.xticks(rotation=x_tick_rotation)
-    pyplot.legend()
+    axis.tick_params(axis="x", labelrotation=x_tick_rotation)
 
-    if plot_filename != "":
-        pyplot.savefig(plot_filename, bbox_inches='tight', dpi=300)
-    pyplot.draw()
+
+@profiling.profiled("plots.plot_clusters_overlaid")
+def plot_clusters_overlaid(time_series, metric_name, plot_title="Time Series Plot",
+                           plot_filename="", headless=False, decimation=decimate.DEFAULT_METHOD,
+                           max_points=None):
+    """Function to plot every series of a metric fetched from several clusters on the same
+    axes, to compare the clusters
+
+    Args:
+        time_series (Pandas.DataFrame): time-series data with one column per series, named
+            after the metric and the labels of the series, including its cluster
+        metric_name (str): PromQL expression that returned the series
+        plot_title (str, optional): plot title. Defaults to "Time Series Plot".
+        plot_filename (str, optional): file name the plot is saved to. Defaults to "".
+        headless (bool, optional): Set to True to render with the Agg backend without pyplot.
+            Defaults to False.
+        decimation (str, optional): method each plotted line is downsampled with, one of
+            decimate.METHODS. Defaults to decimate.DEFAULT_METHOD.
+        max_points (int, optional): number of points each plotted line is downsampled to, 0
+            to keep every sample. Defaults to None, i.e. two points per pixel column.
+    """
+    if time_series is None:
+        return
+
+    with style.context(PLOT_STYLE):
+        fig, axis = new_figure(headless)
+        axis.set_xlabel("Date/Time")
+        axis.set_ylabel(utils.shorten_metric_name(metric_name))
+        axis.set_title(plot_title)
+
+        max_points = point_budget(fig, max_points)
+        for series_name in time_series.columns:
+            # series of a cluster are missing from the timestamps only the others sampled
+            vals = time_series[series_name].dropna()
+            axis.plot(decimate_series(vals, max_points, decimation), "-",
+                      label=series_name[len(metric_name):] or series_name)
+        axis.legend()
+        finish_figure(fig, plot_filename, headless)
@@ -0,0 +1,240 @@
+"""Per-stage timing spans, reported as a trace, a summary table or Prometheus metrics.
+
+Spans are only recorded while a Profiler is enabled; otherwise span() costs a function
+call and profiled() leaves the decorated function unchanged apart from that call.
+"""
+# standard imports
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+_profiler = None
+
+
+class Profiler:
+    """Thread-safe recorder of timing spans and their sample and byte counters
+    """
+
+    def __init__(self, origin=None):
+        """Initialization function
+
+        Args:
+            origin (float, optional): time.perf_counter() the span timestamps are relative to,
+                shared by the profilers of worker processes. Defaults to None, i.e. now.
+        """
+        self.origin = time.perf_counter() if origin is None else origin
+        self.events = []
+        self.lock = threading.Lock()
+
+    def record(self, name, start, duration, counters=None):
+        """Record a span
+
+        Args:
+            name (str): stage name
+            start (float): time.perf_counter() at the start of the span
+            duration (float): duration in seconds
+            counters (dict, optional): e.g. number of samples or bytes processed.
+                Defaults to None.
+        """
+        event = {"name": name, "ts": (start - self.origin) * 1e6, "dur": duration * 1e6,
+                 "pid": os.getpid(), "tid": threading.get_ident(),
+                 "args": dict(counters or {})}
+        with self.lock:
+            self.events.append(event)
+
+    def extend(self, events):
+        """Add spans recorded by another profiler, e.g. in a worker process
+
+        Args:
+            events (list(dict)): trace events
+        """
+        with self.lock:
+            self.events.extend(events)
+
+    def to_trace(self):
+        """Trace in the Trace Event Format, loadable in chrome://tracing, Perfetto or
+        speedscope as a flame graph
+
+        Returns:
+            (dict): trace
+        """
+        with self.lock:
+            events = [dict(event, ph="X", cat="f3tch") for event in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, filename):
+        """Write the trace to a JSON file
+
+        Args:
+            filename (str): trace file name
+        """
+        with open(filename, "w", encoding="utf8") as file:
+            json.dump(self.to_trace(), file)
+
+    def stages(self):
+        """Aggregate the spans by stage
+
+        Returns:
+            (dict): calls, seconds, max_seconds, samples and bytes of each stage name, in
+                order of first occurrence
+        """
+        stages = {}
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        for event in events:
+            stage = stages.setdefault(event["name"], {"calls": 0, "seconds": 0.0,
+                                                      "max_seconds": 0.0, "samples": 0,
+                                                      "bytes": 0})
+            stage["calls"] += 1
+            stage["seconds"] += event["dur"] / 1e6
+            stage["max_seconds"] = max(stage["max_seconds"], event["dur"] / 1e6)
+            stage["samples"] += event["args"].get("samples", 0)
+            stage["bytes"] += event["args"].get("bytes", 0)
+        return stages
+
+    def summary(self):
+        """Summary table of the time spent in each stage; the time of nested stages is also
+        counted in their enclosing stage
+
+        Returns:
+            (str): summary table
+        """
+        lines = [f"{'stage':<40} {'calls':>6} {'total (s)':>10} {'mean (ms)':>10} "
+                 f"{'max (ms)':>10} {'samples':>12} {'bytes':>14}"]
+        for name, stage in self.stages().items():
+            lines.append(f"{name:<40} {stage['calls']:>6} {stage['seconds']:>10.3f} "
+                         f"{1e3 * stage['seconds'] / stage['calls']:>10.2f} "
+                         f"{1e3 * stage['max_seconds']:>10.2f} {stage['samples']:>12} "
+                         f"{stage['bytes']:>14}")
+        return "\n".join(lines)
+
+    def to_prometheus_text(self):
+        """Stage counters in the Prometheus text exposition format, e.g. for the node_exporter
+        textfile collector or a Pushgateway
+
+        Returns:
+            (str): Prometheus metrics
+        """
+        metrics = [("f3tch_stage_calls_total", "Number of times each stage ran.", "calls"),
+                   ("f3tch_stage_seconds_total", "Time spent in each stage.", "seconds"),
+                   ("f3tch_stage_samples_total", "Samples processed by each stage.", "samples"),
+                   ("f3tch_stage_bytes_total", "Bytes processed by each stage.", "bytes")]
+        stages = self.stages()
+        lines = []
+        for metric, description, field in metrics:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, stage in stages.items():
+                lines.append(f'{metric}{{stage="{name}"}} {stage[field]}')
+        return "\n".join(lines) + "\n"
+
+
+def enable(origin=None):
+    """Start recording spans
+
+    Args:
+        origin (float, optional): time.perf_counter() the span timestamps are relative to.
+            Defaults to None, i.e. now.
+
+    Returns:
+        (Profiler): profiler recording the spans
+    """
+    global _profiler  # pylint: disable=global-statement
+    _profiler = Profiler(origin)
+    return _profiler
+
+
+def disable():
+    """Stop recording spans
+
+    Returns:
+        (Profiler): profiler that was recording the spans, or None
+    """
+    global _profiler  # pylint: disable=global-statement
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def get_profiler():
+    """Profiler recording the spans
+
+    Returns:
+        (Profiler): profiler, or None if profiling is disabled
+    """
+    return _profiler
+
+
+@contextmanager
+def span(name, **counters):
+    """Time a stage
+
+        Example:
+            with profiling.span("core.save") as counters:
+                counters["bytes"] = os.path.getsize(filename)
+
+    Args:
+        name (str): stage name
+        **counters: initial counters of the span, e.g. samples=1000
+
+    Returns:
+        (contextmanager): context manager yielding the counters of the span
+    """
+    profiler = _profiler
+    if profiler is None:
+        yield dict(counters)
+        return
+    start = time.perf_counter()
+    try:
+        yield counters
+    finally:
+        profiler.record(name, start, time.perf_counter() - start, counters)
+
+
+def profiled(name):
+    """Decorator timing every call of a function as a stage
+
+    Args:
+        name (str): stage name
+
+    Returns:
+        (function): decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CountingReader:
+    """Binary stream wrapper counting the bytes read through it
+    """
+
+    def __init__(self, stream):
+        """Initialization function
+
+        Args:
+            stream (file-like): binary stream
+        """
+        self.stream = stream
+        self.bytes = 0
+
+    def read(self, size=-1):
+        """Read from the wrapped stream
+
+        Args:
+            size (int, optional): maximum number of bytes. Defaults to -1, i.e. all.
+
+        Returns:
+            (bytes): data read
+        """
+        data = self.stream.read(size)
+        self.bytes += len(data)
+        return data
@@ -4,24 +4,32 @@ Raises:
     exceptions.OpenshiftConnectionFailure: failure to connect to OpenShift cluster in the
     given kubeconfig file
     exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+    exceptions.PortForwardFailure: the port-forward to the Prometheus pod could not be
+    established
     exceptions.TimeseriesConversionFailure: failed to convert time-series array to data frame
 """
 # standard imports
-import json
-import urllib
+from concurrent.futures import ThreadPoolExecutor
 import openshift
-import numpy as np
 
 # custom imports
-from f3tch import exceptions, timeseries
+from f3tch import discovery, exceptions, parser, profiling, ranges, transport, tunnel
+from f3tch.series import SeriesSet
 
 
 class Prometheus:
     """Prometheus class defintion
     """
 
+    @profiling.profiled("Prometheus.__init__")
     def __init__(self, kubeconfig,
-                 prometheus_fqname="openshift-monitoring:pod/prometheus-k8s-0", verbose=False):
+                 prometheus_fqname=discovery.DEFAULT_PROMETHEUS_FQNAME, verbose=False,
+                 prometheus_url=None, verify_tls=True, prometheus_namespace=None,
+                 prometheus_selector=None, discovery_cache=None,
+                 max_points_per_request=ranges.MAX_POINTS_PER_REQUEST, chunk_concurrency=4,
+                 series_cache=None, exec_compression=False, port_forward=False,
+                 port_forward_port=tunnel.DEFAULT_REMOTE_PORT, pool_size=10, strict=False,
+                 kubeconfig_origin=None):
         """Intialization function
 
         Args:
@@ -30,29 +38,121 @@ class Prometheus:
                 Defaults to "openshift-monitoring:pod/prometheus-k8s-0".
             verbose (bool, optional): Set to True to show detailed processing information.
                 Defaults to False.
+            prometheus_url (str, optional): Prometheus route URL, service URL or local
+                port-forward URL to query directly over HTTP. Defaults to None, in which case
+                queries are run inside the Prometheus pod through `oc exec`.
+            verify_tls (bool or str, optional): verify the Prometheus TLS certificate, or path
+                to a CA bundle, when prometheus_url is set. Defaults to True.
+            prometheus_namespace (str, optional): namespace searched for the Prometheus pod
+                with prometheus_selector. Defaults to None, i.e. the namespace of
+                prometheus_fqname.
+            prometheus_selector (str, optional): label selector of the Prometheus pod, used
+                instead of prometheus_fqname. Defaults to None.
+            discovery_cache (discovery.DiscoveryCache, optional): on-disk cache of the resolved
+                Prometheus pod. Defaults to None.
+            max_points_per_request (int, optional): maximum number of points per series
+                requested by a single query_range request. Defaults to 11000.
+            chunk_concurrency (int, optional): maximum number of sub-range requests of a single
+                metric in flight at any time. Defaults to 4.
+            series_cache (cache.SeriesCache, optional): on-disk cache of fetched time-series
+                data. Defaults to None.
+            exec_compression (bool, optional): Set to True to transfer gzip compressed
+                responses through `oc exec` when prometheus_url is not set. Defaults to False.
+            port_forward (bool, optional): Set to True to query the Prometheus pod through a
+                single `oc port-forward` kept open for the session instead of one `oc exec`
+                per request, when prometheus_url is not set. Defaults to False.
+            port_forward_port (int, optional): Prometheus pod port forwarded to.
+                Defaults to 9090.
+            pool_size (int, optional): maximum number of keep-alive HTTP connections kept
+                open to Prometheus. Defaults to 10.
+            strict (bool, optional): Set to True to raise the errors of failed queries
+                instead of printing them and skipping their samples. Defaults to False.
+            kubeconfig_origin (str, optional): path to the kube-config file kubeconfig is a
+                temporary copy of, which identifies the cluster in the on-disk caches.
+                Defaults to None, i.e. kubeconfig is not a copy.
 
         Raises:
             exceptions.OpenshiftConnectionFailure: failure to connect to OpenShift cluster in the
                 given kubeconfig file
             exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+            exceptions.PortForwardFailure: the port-forward to the Prometheus pod could not
+                be established
         """
         self.verbose = verbose
+        self.kubeconfig = kubeconfig
+        self.max_points_per_request = max_points_per_request
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self.series_cache = series_cache
+        self.strict = strict
+        self.cluster = prometheus_url if prometheus_url is not None \
+            else discovery.get_kubeconfig_cluster(kubeconfig, kubeconfig_origin)
+        self.prometheus_pod = None
+        self.server_version = None
 
         openshift.set_default_kubeconfig_path(kubeconfig)
-        try:
-            self.server_version = openshift.get_server_version()
-        except openshift.model.OpenShiftPythonException as exc:
-            raise exceptions.OpenshiftConnectionFailure from exc
+
+        use_selector = prometheus_selector is not None
+        if use_selector and prometheus_namespace is None:
+            # the selector searches the namespace of the Prometheus pod name
+            prometheus_namespace = discovery.parse_fqname(prometheus_fqname)[0] or \
+                discovery.parse_fqname(discovery.DEFAULT_PROMETHEUS_FQNAME)[0]
+        lookup = f"{prometheus_namespace}:{prometheus_selector}" if use_selector \
+            else prometheus_fqname
+        cache_key = None
+        if prometheus_url is None and discovery_cache is not None:
+            cache_key = discovery_cache.key(kubeconfig, lookup, kubeconfig_origin)
+            self.__load_cached_pod(discovery_cache, cache_key)
+
+        if self.server_version is None:
+            try:
+                with profiling.span("Prometheus.get_server_version"):
+                    self.server_version = openshift.get_server_version()
+            except openshift.model.OpenShiftPythonException as exc:
+                raise exceptions.OpenshiftConnectionFailure from exc
 
         self.__print(f"Successfully connected to OpenShift cluster running version \
             {self.server_version}!")
-        # Identify the Prometheus pod
-        self.__print("Detecting prometheus pod...")
-        self.prometheus_pod = self.__get_prometheus_pod(prometheus_fqname)
+
+        if prometheus_url is not None:
+            self.__print(f"Querying Prometheus directly at {prometheus_url}")
+            self.transport = transport.HttpTransport(
+                base_url=prometheus_url,
+                token=transport.get_kubeconfig_token(kubeconfig),
+                verify=verify_tls, pool_size=pool_size)
+            return
+
         if self.prometheus_pod is None:
-            raise exceptions.PrometheusPodNotFound
+            # Identify the Prometheus pod
+            self.__print("Detecting prometheus pod...")
+            if use_selector:
+                self.prometheus_pod = discovery.find_pod(namespace=prometheus_namespace,
+                                                         label_selector=prometheus_selector)
+            else:
+                self.prometheus_pod = discovery.get_pod(fqname=prometheus_fqname)
+            if self.prometheus_pod is None:
+                raise exceptions.PrometheusPodNotFound
+            if cache_key is not None:
+                discovery_cache.put(cache_key, fqname=self.prometheus_pod.fqname(),
+                                    server_version=self.server_version)
 
         self.__print(f"Prometheus pod found: {self.prometheus_pod}")
+        if port_forward:
+            with profiling.span("Prometheus.port_forward"):
+                port_forward_tunnel = tunnel.PortForward(
+                    namespace=self.prometheus_pod.namespace(),
+                    pod_name=self.prometheus_pod.name(), kubeconfig=kubeconfig,
+                    remote_port=port_forward_port).start()
+            self.__print("Querying Prometheus through a port-forward at "
+                         f"{port_forward_tunnel.url}")
+            self.transport = transport.TunnelTransport(port_forward_tunnel, pool_size=pool_size)
+            return
+        self.transport = transport.ExecTransport(prometheus_pod=self.prometheus_pod,
+                                                 kubeconfig=kubeconfig,
+                                                 compressed=exec_compression)
+
+    def close(self):
+        """Release the connections held to Prometheus"""
+        self.transport.close()
 
     def __print(self, msg):
         """Private method to display verbose information.
@@ -63,31 +163,189 @@ class Prometheus:
         if self.verbose:
             print(msg)
 
-    def __get_prometheus_pod(self, prometheus_fqname):
-        """The following function retrieves a prometheus pod for a given context
+    def __load_cached_pod(self, discovery_cache, cache_key):
+        """Private method to restore the Prometheus pod and server version from the discovery
+        cache, revalidating the cached pod with a single existence check
+
+        Args:
+            discovery_cache (discovery.DiscoveryCache): on-disk discovery cache
+            cache_key (str): cache key of the kubeconfig/context and pod lookup
+
+        Raises:
+            exceptions.OpenshiftConnectionFailure: failure to query the OpenShift cluster
+        """
+        entry = discovery_cache.get(cache_key)
+        if entry is None:
+            return
+
+        self.__print(f"Revalidating cached prometheus pod {entry['fqname']}...")
+        prometheus_pod = discovery.get_pod(fqname=entry["fqname"])
+        if prometheus_pod is None:
+            discovery_cache.invalidate(cache_key)
+            return
+
+        self.prometheus_pod = prometheus_pod
+        self.server_version = entry["server_version"]
+
+    def __fetch_range(self, metric_name, from_timestamp, to_timestamp, step_size):
+        """Private method to run a single query_range request
+
+        Args:
+            metric_name (str): metric qualifier to be retrieved from Prometheus
+            from_timestamp (int): Starting Unix timestamp
+            to_timestamp (int): Ending Unix timestamp
+            step_size (int): Step size specified in seconds
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the query failed
+
+        Returns:
+            list(tuple): (labels, values) for each series returned, where values is a
+                2-dimensional time-series array
+        """
+        time_step = f"{step_size}s"
+
+        try:
+            with profiling.span("Prometheus.query_range") as counters, \
+                    self.transport.stream("/api/v1/query_range",
+                                          params={"query": metric_name, "start": from_timestamp,
+                                                  "end": to_timestamp, "step": time_step}) as body:
+                body = profiling.CountingReader(body)
+                status, error, _results = parser.parse_query_range(
+                    body, capacity=ranges.num_points(from_timestamp, to_timestamp, step_size))
+                counters["bytes"] = body.bytes
+                counters["samples"] = sum(len(values) for _, values in _results)
+        except (exceptions.PrometheusQueryFailure, ValueError) as exc:
+            raise exceptions.PrometheusQueryFailure(
+                f"Failed to retrieve {metric_name} between {from_timestamp} and "
+                f"{to_timestamp}: {exc}") from exc
+        if status != "success":
+            raise exceptions.PrometheusQueryFailure(
+                f"Failed to retrieve {metric_name} between {from_timestamp} and "
+                f"{to_timestamp}: {error or f'status {status}'}")
+
+        series = []
+        if len(_results) > 0:
+            for _labels, _values in _results:
+                self.__print(f"{_values.shape} results were returned for {metric_name} \
+                    between {from_timestamp} and {to_timestamp}.")
+                series.append((_labels, _values))
+        else:
+            self.__print(f"No results were returned for {metric_name} between \
+                {from_timestamp} and {to_timestamp}.")
+        return series
+
+    def __fetch_ranges(self, metric_name, sub_ranges, step_size):
+        """Private method to run the query_range requests of several sub-ranges, keeping at
+        most chunk_concurrency requests in flight
+
+        Args:
+            metric_name (str): metric qualifier to be retrieved from Prometheus
+            sub_ranges (list(tuple)): [(from_timestamp, to_timestamp), ...] sub-ranges
+            step_size (int): Step size specified in seconds
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the query of a sub-range failed, in strict mode
+
+        Returns:
+            list: result of __fetch_range for each sub-range, or the PrometheusQueryFailure
+                of its query when it failed
+        """
+        def fetch_range(sub_range):
+            try:
+                return self.__fetch_range(metric_name, sub_range[0], sub_range[1], step_size)
+            except exceptions.PrometheusQueryFailure as exc:
+                if self.strict:
+                    raise
+                return exc
+
+        if len(sub_ranges) <= 1:
+            return [fetch_range(sub_range) for sub_range in sub_ranges]
+
+        self.__print(f"Splitting {metric_name} into {len(sub_ranges)} sub-range queries.")
+        with ThreadPoolExecutor(max_workers=self.chunk_concurrency) as executor:
+            return list(executor.map(fetch_range, sub_ranges))
+
+    @profiling.profiled("Prometheus.get_series_set")
+    def get_series_set(self, metric_name, from_timestamp, to_timestamp, step_size):
+        """This function queries the given prometheus pod and retrieves every series returned
+            by metric_name for the specified interval (from_timestamp, to_timestamp), keeping
+            the label set of each series
+
+        Windows of more than max_points_per_request points are split into step-aligned
+        sub-ranges that are fetched concurrently and stitched back together. When a series
+        cache is set, only the parts of the window that are not cached yet are fetched.
 
         Args:
-            prometheus_fqname (str): Fully qualified name of Prometheus pod
+            metric_name (str): metric qualifier to be retrieved from Prometheus
+            from_timestamp (int): Starting Unix timestamp
+            to_timestamp (int): Ending Unix timestamp
+            step_size (int): Step size specified in seconds
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the query of a sub-range failed, so the series
+                would have a hole; the sub-ranges fetched are still cached
 
         Returns:
-            openshift.pod object: Prometheus pod object for the given OpenShift cluster
+            (series.SeriesSet): series retrieved for the specified metric_name, or None if no
+                samples were retrieved
         """
-        prometheus_pod = None
-
-        with openshift.client_host():
-            for node_name in openshift.selector('nodes').qnames():
-                self.__print(
-                    f"Searching node {node_name} for prometheus pod...")
-                for pod_obj in openshift.get_pods_by_node(node_name):
-                    if pod_obj.fqname() == prometheus_fqname:
-                        prometheus_pod = pod_obj
-                        break
-        return prometheus_pod
+        cache_key = None
+        held, cached_series = [], []
+        if self.series_cache is not None:
+            cache_key = self.series_cache.key(self.cluster, metric_name, step_size,
+                                              from_timestamp)
+            held, cached_series = self.series_cache.load(cache_key)
+
+        gaps = ranges.subtract_ranges(from_timestamp, to_timestamp, held, step_size)
+        if len(held) > 0:
+            self.__print(f"{len(gaps)} uncached gaps to fetch for {metric_name}.")
+        sub_ranges = [sub_range for gap in gaps
+                      for sub_range in ranges.split_range(gap[0], gap[1], step_size,
+                                                          max_points=self.max_points_per_request)]
+        chunks = self.__fetch_ranges(metric_name, sub_ranges, step_size)
+
+        # Stitch the sub-ranges of each series back together, keeping the series in order of
+        # first appearance
+        series = {}
+        for labels, values in cached_series:
+            series.setdefault(tuple(sorted(labels.items())), []).append(values)
+        failures = [chunk for chunk in chunks if isinstance(chunk, Exception)]
+        for chunk in chunks:
+            if isinstance(chunk, Exception):
+                continue
+            for labels, values in chunk:
+                series.setdefault(tuple(sorted(labels.items())), []).append(values)
+        series = {labels: ranges.stitch(parts) for labels, parts in series.items()}
+
+        if cache_key is not None:
+            fetched = [sub_range for sub_range, chunk in zip(sub_ranges, chunks)
+                       if not isinstance(chunk, Exception)]
+            if len(fetched) > 0:
+                self.series_cache.store(cache_key, held=held + fetched,
+                                        series=[(dict(labels), values)
+                                                for labels, values in series.items()],
+                                        step_size=step_size)
+            series = {labels: values[(values[:, 0] >= from_timestamp) &
+                                     (values[:, 0] <= to_timestamp)]
+                      for labels, values in series.items()}
+
+        if len(failures) > 0:
+            # reported once, by the caller
+            raise exceptions.PrometheusQueryFailure("\n".join(str(exc) for exc in failures))
+
+        series = [(dict(labels), values) for labels, values in series.items() if len(values) > 0]
+        if len(series) == 0:
+            return None
+        return SeriesSet.from_series(metric_name, series)
 
     def get_time_series(self, metric_name, from_timestamp, to_timestamp, step_size):
         """This function queries the given prometheus pod and retrieves the specified 
             metric_name for the specified interval (from_timestamp, to_timestamp)
 
+        When metric_name returns several series, the DataFrame holds one column per series,
+        named after the metric name and the labels that tell the series apart.
+
         Args:
             metric_name (str): metric qualifier to be retrieved from Prometheus
             from_timestamp (int): Starting Unix timestamp
@@ -95,7 +353,7 @@ class Prometheus:
             step_size (int): Step size specified in seconds
 
         Raises:
-            exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+            exceptions.PrometheusQueryFailure: the query of a sub-range failed
             exceptions.TimeseriesConversionFailure: failed to convert time-series array to 
                 Pandas.DataFrame object
 
@@ -103,52 +361,14 @@ class Prometheus:
             time-series data (Pandas.DataFrame): Time-series data retrieved for the specified 
                 metric_name
         """
-        if self.prometheus_pod is None:
-            raise exceptions.PrometheusPodNotFound
-
-        time_series = None
-        time_step = f"{step_size}s"
-
-        query_str = "http://localhost:9090/api/v1/query_range?query={}&start={}&end={}&step={}"
-        query = query_str.format(urllib.parse.quote(metric_name), from_timestamp, to_timestamp,
-                                 time_step)
-
-        res = self.prometheus_pod.execute(  # pylint: disable=E1101
-            cmd_to_exec=['curl', query], auto_raise=True)
-
-        if res.status() == 0:
-            if isinstance(res.out(), str):
-                output = json.loads(res.out(), strict=False)
-            else:
-                output = res.out()
-
-            status = output.get("status", None)
-            data = output.get("data", None)
-            if status is not None:
-                if (status == "success") and (data is not None):
-                    _results = data.get("result", [])
-                    if len(_results) > 0:
-                        time_series = []
-                        for _result in _results:
-                            _values = np.asarray(
-                                _result.get("values", []), float)
-                            self.__print(f"{_values.shape} results were returned for {metric_name} \
-                                between {from_timestamp} and {to_timestamp}.")
-                            time_series.extend(_values)
-                    else:
-                        self.__print(f"No results were returned for {metric_name} between \
-                            {from_timestamp} and {to_timestamp}.")
-                elif status == "error":
-                    error = output.get("error", "")
-                    print(f"Error: Time series data could not be retrieved! The following error \
-                        was incurred: {error}")
-        else:
-            print(f"Failed to retrieve the timeseries data for {metric_name} \
-                between {from_timestamp} and {to_timestamp}.")
-        if (time_series is not None) and (len(time_series) > 0):
+        with profiling.span("Prometheus.get_time_series") as counters:
+            series_set = self.get_series_set(metric_name=metric_name,
+                                             from_timestamp=from_timestamp,
+                                             to_timestamp=to_timestamp, step_size=step_size)
+            if series_set is None:
+                return None
+            counters["samples"] = series_set.num_samples()
             try:
-                time_series = timeseries.array_to_dataframe(arr_time_series=time_series,
-                                                            metric_name=metric_name)
+                return series_set.to_dataframe()
             except Exception as exc:
                 raise exceptions.TimeseriesConversionFailure from exc
-        return time_series
@@ -0,0 +1,155 @@
+"""Aggregation directives of the data specification pushed down to Prometheus.
+
+A metric with an aggregation directive is rewritten into a PromQL query returning the
+already reduced series, e.g. with {"over_time": "avg", "window": 7200, "by": ["namespace"]}:
+
+    avg_over_time((sum by (namespace) (<metric>))[7200s:60s])
+
+evaluated every window seconds instead of fetching every raw sample and smoothing it
+client-side.
+
+Raises:
+    exceptions.InvalidQueryFileFormat: invalid aggregation directive
+"""
+# standard imports
+import re
+
+# custom imports
+from f3tch import exceptions
+
+OVER_TIME_FUNCTIONS = ["avg", "min", "max", "sum", "count", "stddev", "stdvar", "last",
+                       "quantile"]
+AGGREGATION_OPERATORS = ["sum", "avg", "min", "max", "count"]
+
+
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800,
+                  "y": 31536000}
+_DURATION_PATTERN = re.compile(r"(\d+)(ms|s|m|h|d|w|y)")
+
+
+def _ceil(value, multiple):
+    """Round value up to a multiple"""
+    return -(-value // multiple) * multiple
+
+
+def _seconds(value, name):
+    """Whole number of seconds of a number of seconds or of a PromQL duration, e.g. "1h30m"
+
+    Raises:
+        exceptions.InvalidQueryFileFormat: neither a number nor a PromQL duration
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        if value.strip().isdigit():
+            return int(value)
+        parts = _DURATION_PATTERN.findall(value)
+        if len(parts) > 0 and "".join(count + unit for count, unit in parts) == value:
+            return int(sum(int(count) * DURATION_UNITS[unit] for count, unit in parts))
+    raise exceptions.InvalidQueryFileFormat(
+        f"The aggregation {name} should be a number of seconds or a duration such as 5m, "
+        f"got {value!r}")
+
+
+def to_promql(metric_name, aggregation, resolution):
+    """Rewrite a PromQL expression according to an aggregation directive
+
+    Args:
+        metric_name (str): PromQL expression
+        aggregation (dict): aggregation directive with the optional fields:
+            aggregate: aggregation operator applied across series, one of
+                AGGREGATION_OPERATORS (sum if only by is given)
+            by: label names the aggregation operator keeps series apart by
+            over_time: function applied over window, one of OVER_TIME_FUNCTIONS
+            quantile: quantile computed by the quantile over_time function
+            window: window of the over_time function, in seconds or as a PromQL
+                duration, e.g. "5m"
+        resolution (int): resolution in seconds at which over_time evaluates the expression
+
+    Raises:
+        exceptions.InvalidQueryFileFormat: invalid aggregation directive
+
+    Returns:
+        (str): rewritten PromQL expression
+    """
+    expr = metric_name
+    aggregate = aggregation.get("aggregate", "sum" if "by" in aggregation else None)
+    if aggregate is not None:
+        if aggregate not in AGGREGATION_OPERATORS:
+            raise exceptions.InvalidQueryFileFormat(
+                f"Unknown aggregation operator {aggregate}, expected one of "
+                f"{AGGREGATION_OPERATORS}")
+        labels = aggregation.get("by", [])
+        if isinstance(labels, str):
+            labels = [labels]
+        if not isinstance(labels, list) or not all(isinstance(label, str) for label in labels):
+            raise exceptions.InvalidQueryFileFormat(
+                f"The aggregation by should be a label name or a list of label names, "
+                f"got {labels!r}")
+        expr = f"{aggregate} by ({', '.join(labels)}) ({expr})" if len(labels) > 0 \
+            else f"{aggregate}({expr})"
+
+    function = aggregation.get("over_time")
+    if function is None:
+        return expr
+    if function not in OVER_TIME_FUNCTIONS:
+        raise exceptions.InvalidQueryFileFormat(
+            f"Unknown over_time function {function}, expected one of {OVER_TIME_FUNCTIONS}")
+    subquery = f"({expr})[{aggregation['window']}s:{resolution}s]"
+    if function == "quantile":
+        if "quantile" not in aggregation:
+            raise exceptions.InvalidQueryFileFormat(
+                "The quantile over_time function requires a quantile")
+        try:
+            quantile = float(aggregation["quantile"])
+        except (TypeError, ValueError) as exc:
+            raise exceptions.InvalidQueryFileFormat(
+                f"The quantile should be a number, got {aggregation['quantile']!r}") from exc
+        return f"quantile_over_time({quantile}, {subquery})"
+    return f"{function}_over_time({subquery})"
+
+
+def rewrite(metric, aggregation):
+    """Rewrite a metric so that Prometheus returns series reduced by an aggregation directive
+
+    The raw step_size of the metric becomes the resolution of the over_time function, whose
+    window defaults to the moving_window of the metric (in samples of step_size seconds) and
+    is rounded up to a multiple of that resolution. The rewritten metric is evaluated every
+    step seconds (defaulting to the window), over a time range aligned to that step, and no
+    longer needs a client-side moving average.
+
+    Args:
+        metric (dictionary): metric information to query prometheus
+        aggregation (dict): aggregation directive (see to_promql), which may also set the
+            step of the rewritten metric in seconds or as a PromQL duration
+
+    Raises:
+        exceptions.InvalidQueryFileFormat: invalid aggregation directive
+
+    Returns:
+        (dictionary): rewritten metric information
+    """
+    resolution = metric["step_size"]
+    aggregation = dict(aggregation)
+    step_size = _seconds(aggregation.get("step", resolution), "step")
+    if aggregation.get("over_time") is not None:
+        window = _seconds(aggregation.get("window", metric["moving_window"] * resolution),
+                          "window")
+        if window <= 0:
+            raise exceptions.InvalidQueryFileFormat(
+                "The over_time function requires a window or a moving_window")
+        aggregation["window"] = _ceil(window, resolution)
+        step_size = _seconds(aggregation.get("step", aggregation["window"]), "step")
+    if step_size <= 0:
+        raise exceptions.InvalidQueryFileFormat("The aggregation step should be positive")
+
+    rewritten = dict(metric)
+    rewritten.update({
+        "metric_name": to_promql(metric["metric_name"], aggregation, resolution),
+        "from_timestamp": metric["from_timestamp"] - metric["from_timestamp"] % step_size,
+        "to_timestamp": _ceil(metric["to_timestamp"], step_size),
+        "step_size": step_size,
+        "moving_window": 0 if aggregation.get("over_time") is not None
+        else metric["moving_window"],
+        "aggregation": aggregation})
+    return rewritten
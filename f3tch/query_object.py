@@ -2,7 +2,8 @@
 import json
 
 # custom imports
-from f3tch import exceptions, utils
+from f3tch import decimate, exceptions, pushdown, ranges, utils
+from f3tch.slices import parse_time_slices
 
 
 class Query():
@@ -111,9 +112,76 @@ class Query():
         """
         return self.__get_attribute(attribute="save_fetched_data", default_value=False)
 
+    def get_output_format(self):
+        """Get the format the fetched data is saved in
+
+        Returns:
+            str: output_format field, or "csv" if not set
+        """
+        return self.__get_attribute(attribute="output_format", default_value="csv")
+
+    def get_output_compression(self):
+        """Get the compression codec the fetched data is saved with
+
+        Returns:
+            str: output_compression field, or None (default codec of the output format)
+        """
+        return self.__get_attribute(attribute="output_compression", default_value=None)
+
+    def get_output_directory(self):
+        """Get the directory the fetched data is saved in
+
+        Returns:
+            str: output_directory field, or the current directory if not set
+        """
+        return self.__get_attribute(attribute="output_directory", default_value=".")
+
+    def is_output_dataset_enabled(self):
+        """Check if output_dataset field is set, i.e. the data of all metrics is saved into one
+        dataset partitioned by metric
+
+        Returns:
+            boolean: True if output_dataset is enabled, else False
+        """
+        return self.__get_attribute(attribute="output_dataset", default_value=False)
+
+    def get_max_concurrent_queries(self):
+        """Get the maximum number of queries to keep in flight at any time
+
+        Returns:
+            int: max_concurrent_queries field, or 1 (sequential fetching) if not set
+        """
+        return max(1, int(self.__get_attribute(attribute="max_concurrent_queries",
+                                               default_value=1) or 1))
+
+    def get_max_points_per_request(self):
+        """Get the maximum number of points per series requested by a single query_range request
+
+        Returns:
+            int: max_points_per_request field, or 11000 if not set
+        """
+        return int(self.__get_attribute(attribute="max_points_per_request",
+                                        default_value=ranges.MAX_POINTS_PER_REQUEST)
+                   or ranges.MAX_POINTS_PER_REQUEST)
+
+    def get_chunk_concurrency(self):
+        """Get the maximum number of sub-range requests of a single metric in flight at any time
+
+        Returns:
+            int: chunk_concurrency field, or 4 if not set
+        """
+        return max(1, int(self.__get_attribute(attribute="chunk_concurrency",
+                                               default_value=4) or 4))
+
     def get_metrics(self):
         """Retrieve list of metrics from self.object
 
+        Metrics with an aggregation directive are rewritten to be aggregated by Prometheus
+        (see pushdown.rewrite).
+
+        Raises:
+            exceptions.InvalidQueryFileFormat: invalid aggregation directive
+
         Returns:
             List(dictionary): list of dictionaries for each metric in the JSON data specification
             file.
@@ -126,6 +194,11 @@ class Query():
         default_step_size = self.__get_attribute("step_size")
         default_moving_window = self.__get_attribute("moving_window")
         default_plot_color = self.__get_attribute("plot_color", "blue")
+        default_decimation = self.__get_attribute("plot_decimation", decimate.DEFAULT_METHOD)
+        default_max_points = self.__get_attribute("plot_max_points", None)
+        default_moving_quantiles = self.__get_attribute("moving_quantiles", [])
+        default_save_rolling_stats = self.__get_attribute("save_rolling_stats", False)
+        default_aggregation = self.__get_attribute("aggregation", None)
 
         metric_list = self.__get_attribute(attribute="metric_list")
 
@@ -141,24 +214,36 @@ class Query():
             moving_window = int(metric.get(
                 "moving_window", default_moving_window))
             plot_color = metric.get("plot_color", default_plot_color)
-            time_slices = metric.get("time_slices", [])
+            time_slices = parse_time_slices(metric.get("time_slices", []))
             plot_title = metric.get("plot_title", "")
             plot_filename = metric.get("plot_filename", "")
             plot_time_slices_overlaid = metric.get("plot_time_slices_overlaid", False)
             plot_time_slices_discontiguous = metric.get("plot_time_slices_discontiguous", {})
+            decimation = metric.get("plot_decimation", default_decimation)
+            max_points = metric.get("plot_max_points", default_max_points)
+            moving_quantiles = metric.get("moving_quantiles", default_moving_quantiles)
+            save_rolling_stats = metric.get("save_rolling_stats", default_save_rolling_stats)
+            aggregation = metric.get("aggregation", default_aggregation)
 
             # TODO: validate time_slices # pylint: disable=W0511
 
-            metrics.append({"metric_name": metric_name,
-                            "from_timestamp": from_timestamp,
-                            "to_timestamp": to_timestamp,
-                            "step_size": step_size,
-                            "moving_window": moving_window,
-                            "plot_color": plot_color,
-                            "time_slices": time_slices,
-                            "plot_time_slices_overlaid": plot_time_slices_overlaid,
-                            "plot_time_slices_discontiguous": plot_time_slices_discontiguous,
-                            "plot_title": plot_title,
-                            "plot_filename": plot_filename})
+            _metric = {"metric_name": metric_name,
+                       "from_timestamp": from_timestamp,
+                       "to_timestamp": to_timestamp,
+                       "step_size": step_size,
+                       "moving_window": moving_window,
+                       "moving_quantiles": moving_quantiles,
+                       "save_rolling_stats": save_rolling_stats,
+                       "plot_color": plot_color,
+                       "time_slices": time_slices,
+                       "plot_time_slices_overlaid": plot_time_slices_overlaid,
+                       "plot_time_slices_discontiguous": plot_time_slices_discontiguous,
+                       "plot_title": plot_title,
+                       "plot_filename": plot_filename,
+                       "decimation": decimation,
+                       "max_points": None if max_points is None else int(max_points)}
+            if aggregation:
+                _metric = pushdown.rewrite(_metric, aggregation)
+            metrics.append(_metric)
 
         return metrics
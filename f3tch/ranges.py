@@ -0,0 +1,138 @@
+"""Time range helper functions
+"""
+
+# Prometheus rejects range queries that return more than 11,000 points per series
+MAX_POINTS_PER_REQUEST = 11000
+
+
+def num_points(from_timestamp, to_timestamp, step_size):
+    """Number of points evaluated by a range query
+
+    Args:
+        from_timestamp (int): Starting Unix timestamp
+        to_timestamp (int): Ending Unix timestamp
+        step_size (int): Step size specified in seconds
+
+    Returns:
+        (int): number of evaluation timestamps in [from_timestamp, to_timestamp]
+    """
+    if to_timestamp < from_timestamp:
+        return 0
+    return int((to_timestamp - from_timestamp) // step_size) + 1
+
+
+def split_range(from_timestamp, to_timestamp, step_size, max_points=MAX_POINTS_PER_REQUEST):
+    """Split a range query window into consecutive step-aligned sub-ranges of at most
+    max_points points each. The sub-ranges evaluate exactly the same timestamps as the
+    whole window would.
+
+    Args:
+        from_timestamp (int): Starting Unix timestamp
+        to_timestamp (int): Ending Unix timestamp
+        step_size (int): Step size specified in seconds
+        max_points (int, optional): maximum number of points per sub-range.
+            Defaults to MAX_POINTS_PER_REQUEST.
+
+    Returns:
+        list(tuple): [(from_timestamp, to_timestamp), ...] sub-ranges in ascending order
+    """
+    assert step_size > 0, "step_size should be greater than 0"
+    assert max_points > 0, "max_points should be greater than 0"
+
+    span = (max_points - 1) * step_size
+    ranges = []
+    start = from_timestamp
+    while start <= to_timestamp:
+        end = min(start + span, to_timestamp)
+        ranges.append((start, end))
+        start = end + step_size
+    return ranges
+
+
+def stitch(parts):
+    """Concatenate time-series arrays into a single array sorted by timestamp, keeping the
+    first sample of any duplicated timestamp
+
+    Args:
+        parts (list(numpy.array)): 2-dimensional time-series arrays as such:
+            [[t1,value1], [t2,value2], ..., [tn,valuen]]
+
+    Returns:
+        (numpy.array): stitched 2-dimensional time-series array
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    parts = [part for part in parts if len(part) > 0]
+    if len(parts) == 0:
+        return np.empty((0, 2), dtype=float)
+
+    arr = np.concatenate(parts)
+    arr = arr[np.argsort(arr[:, 0], kind="stable")]
+    keep = np.ones(len(arr), dtype=bool)
+    keep[1:] = arr[1:, 0] != arr[:-1, 0]
+    return arr[keep]
+
+
+def merge_ranges(ranges, step_size):
+    """Merge overlapping or adjacent (at most one step apart) ranges
+
+    Args:
+        ranges (list(tuple)): [(from_timestamp, to_timestamp), ...] ranges
+        step_size (int): Step size specified in seconds
+
+    Returns:
+        list(tuple): sorted, non-overlapping ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if len(merged) > 0 and start <= merged[-1][1] + step_size:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(from_timestamp, to_timestamp, ranges, step_size):
+    """Compute the step-aligned gaps of a window that are not covered by the given ranges.
+    The ranges are expected to lie on the same step grid as from_timestamp.
+
+    Args:
+        from_timestamp (int): Starting Unix timestamp
+        to_timestamp (int): Ending Unix timestamp
+        ranges (list(tuple)): [(from_timestamp, to_timestamp), ...] covered ranges
+        step_size (int): Step size specified in seconds
+
+    Returns:
+        list(tuple): [(from_timestamp, to_timestamp), ...] uncovered gaps in ascending order
+    """
+    gaps = []
+    current = from_timestamp
+    for start, end in merge_ranges(ranges, step_size):
+        if end < current:
+            continue
+        if start > to_timestamp:
+            break
+        if start > current:
+            gaps.append((current, min(start - step_size, to_timestamp)))
+        current = max(current, end + step_size)
+    if current <= to_timestamp:
+        gaps.append((current, to_timestamp))
+    return gaps
+
+
+def within_ranges(timestamps, ranges):
+    """Mask of the timestamps that fall inside any of the given ranges
+
+    Args:
+        timestamps (numpy.array): Unix timestamps
+        ranges (list(tuple)): sorted, non-overlapping [(from_timestamp, to_timestamp), ...]
+
+    Returns:
+        (numpy.array): boolean mask
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    if len(ranges) == 0:
+        return np.zeros(len(timestamps), dtype=bool)
+    starts = np.asarray([start for start, _ in ranges], dtype=float)
+    ends = np.asarray([end for _, end in ranges], dtype=float)
+    idx = np.searchsorted(starts, timestamps, side="right") - 1
+    return (idx >= 0) & (timestamps <= ends[np.maximum(idx, 0)])
@@ -0,0 +1,153 @@
+"""Plot rendering, either in the current process or in a pool of headless worker processes.
+
+matplotlib and the plots module are only imported once the first plot is rendered, so that
+runs which do not plot never load them.
+"""
+# standard imports
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+# custom imports
+from f3tch import profiling
+
+
+def _init_worker():
+    """Select the non-interactive Agg backend in a worker process"""
+    import matplotlib  # pylint: disable=import-outside-toplevel
+    matplotlib.use("Agg")
+
+
+def _render(plot_function, kwargs, profile_origin=None):
+    """Render a single headless plot in a worker process
+
+    Args:
+        plot_function (str): name of the plotting function of the plots module
+        kwargs (dict): plotting function arguments
+        profile_origin (float, optional): origin of the profiler of the main process, to
+            profile the rendering. Defaults to None, i.e. not profiled.
+
+    Returns:
+        (list(dict)): trace events recorded while rendering
+    """
+    from f3tch import plots  # pylint: disable=import-outside-toplevel
+    if profile_origin is None:
+        getattr(plots, plot_function)(headless=True, **kwargs)
+        return []
+    profiler = profiling.enable(profile_origin)
+    try:
+        getattr(plots, plot_function)(headless=True, **kwargs)
+    finally:
+        profiling.disable()
+    return profiler.events
+
+
+class Renderer:
+    """Render plots in the current process, displaying them at the end of the run unless
+    headless
+    """
+
+    def __init__(self, headless=False):
+        """Initialization function
+
+        Args:
+            headless (bool, optional): Set to True to only save plots with the Agg backend,
+                without pyplot state or windows. Defaults to False.
+        """
+        self.headless = headless
+        self.rendered = False
+
+    def submit(self, plot_function, **kwargs):
+        """Render a plot
+
+        Args:
+            plot_function (str): name of the plotting function of the plots module
+            **kwargs: plotting function arguments
+        """
+        if not self.rendered and self.headless:
+            import matplotlib  # pylint: disable=import-outside-toplevel
+            matplotlib.use("Agg")
+        from f3tch import plots  # pylint: disable=import-outside-toplevel
+        self.rendered = True
+        getattr(plots, plot_function)(headless=self.headless, **kwargs)
+
+    def flush(self):
+        """Wait for the plots submitted so far to be rendered
+
+        Returns:
+            (list): errors raised while rendering plots
+        """
+        return []
+
+    def close(self):
+        """Wait for all plots to be rendered and display them unless headless
+
+        Returns:
+            (list): errors raised while rendering plots
+        """
+        if self.rendered and not self.headless:
+            from matplotlib import pyplot  # pylint: disable=import-outside-toplevel
+            pyplot.show()
+        return []
+
+
+class PoolRenderer(Renderer):
+    """Render headless plots in a pool of worker processes, so that plots are saved in parallel
+    while the remaining metrics are still being processed
+    """
+
+    def __init__(self, workers=None):
+        """Initialization function
+
+        Args:
+            workers (int, optional): number of worker processes. Defaults to None, i.e. the
+                number of CPUs.
+        """
+        super().__init__(headless=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.futures = []
+
+    def submit(self, plot_function, **kwargs):
+        """Queue a plot for rendering in a worker process
+
+        Args:
+            plot_function (str): name of the plotting function of the plots module
+            **kwargs: plotting function arguments, which must be picklable
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                initializer=_init_worker)
+        profiler = profiling.get_profiler()
+        self.futures.append(self.executor.submit(
+            _render, plot_function, kwargs, profiler.origin if profiler is not None else None))
+
+    def flush(self):
+        """Wait for the plots submitted so far to be rendered, keeping the worker processes
+
+        Returns:
+            (list): errors raised while rendering plots
+        """
+        errors = []
+        profiler = profiling.get_profiler()
+        for future in self.futures:
+            try:
+                events = future.result()
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+                continue
+            if profiler is not None:
+                profiler.extend(events)
+        self.futures = []
+        return errors
+
+    def close(self):
+        """Wait for all plots to be rendered and shut the worker processes down
+
+        Returns:
+            (list): errors raised while rendering plots
+        """
+        errors = self.flush()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        return errors
@@ -0,0 +1,232 @@
+"""Rolling statistics computed once per time-series and shared by plots and exports.
+
+Like Pandas.Series.rolling(window), a statistic is NaN until a full window of samples is
+available, and for every window containing a NaN value.
+"""
+# standard imports
+import numpy as np
+
+# custom imports
+from f3tch.parser import GrowableBuffer
+
+# Number of windows whose mean and variance are updated from one exactly computed window,
+# bounding the accumulated rounding error
+BLOCK_SIZE = 4096
+STATISTICS = ["mean", "std", "min", "max"]
+
+
+def _sliding_extreme(values, window, ufunc):
+    """Minimum (ufunc=np.minimum) or maximum (ufunc=np.maximum) of every full window in O(n),
+    from the prefix and suffix extremes of window-sized blocks (van Herk/Gil-Werman)"""
+    num_samples = len(values)
+    identity = np.inf if ufunc is np.minimum else -np.inf
+    blocks = np.append(values, np.full(-num_samples % window, identity)).reshape(-1, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return ufunc(suffix[:num_samples - window + 1], prefix[window - 1:num_samples])
+
+
+def _window_statistics(values, window, quantiles=()):
+    """Statistics of every full window of values
+
+    Args:
+        values (numpy.array): float64 samples, at least window of them
+        window (int): window size
+        quantiles (list(float), optional): quantiles to compute. Defaults to ().
+
+    Returns:
+        (numpy.array): (len(values) - window + 1, 4 + len(quantiles)) array of the mean,
+            standard deviation, minimum, maximum and quantiles of each window
+    """
+    num_windows = len(values) - window + 1
+    stats = np.empty((num_windows, len(STATISTICS) + len(quantiles)))
+
+    missing = np.isnan(values)
+    counts = np.concatenate(([0], np.cumsum(missing)))
+    invalid = counts[window:] - counts[:-window] > 0
+    # Substitute the missing samples and center on a reference value: the substitutes enter
+    # and leave the windows like any other sample, and every window holding one is invalid
+    reference = np.nanmean(values) if not missing.all() else 0.0
+    centered = np.where(missing, reference, values) - reference
+
+    for start in range(0, num_windows, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, num_windows)
+        first = centered[start:start + window]
+        means = np.empty(stop - start)
+        sum_squares = np.empty(stop - start)
+        means[0] = first.mean()
+        sum_squares[0] = np.square(first - means[0]).sum()
+        # Welford update of the mean and sum of squared deviations when the window slides,
+        # old samples leaving and new samples entering it
+        old = centered[start:stop - 1]
+        new = centered[start + window:stop + window - 1]
+        means[1:] = means[0] + np.cumsum(new - old) / window
+        sum_squares[1:] = sum_squares[0] + np.cumsum(
+            (new - old) * (new - means[1:] + old - means[:-1]))
+        stats[start:stop, 0] = means + reference
+        stats[start:stop, 1] = np.sqrt(np.maximum(sum_squares, 0.0) / (window - 1)) \
+            if window > 1 else np.nan
+
+        if len(quantiles) > 0:
+            windows = np.lib.stride_tricks.sliding_window_view(
+                values[start:stop + window - 1], window)
+            stats[start:stop, len(STATISTICS):] = np.quantile(windows, quantiles, axis=1).T
+
+    stats[:, 2] = _sliding_extreme(values, window, np.minimum)
+    stats[:, 3] = _sliding_extreme(values, window, np.maximum)
+    stats[invalid] = np.nan
+    return stats
+
+
+class RollingStats:
+    """Rolling mean, standard deviation, minimum, maximum and optional quantiles of a
+    time-series, computed in one pass and extended incrementally as samples are appended
+    """
+
+    def __init__(self, window, quantiles=()):
+        """Initialization function
+
+        Args:
+            window (int): window size in samples
+            quantiles (list(float), optional): quantiles to compute, e.g. [0.5, 0.95].
+                Defaults to ().
+        """
+        self.window = int(window)
+        self.quantiles = [float(quantile) for quantile in quantiles]
+        self.buffer = GrowableBuffer(width=len(STATISTICS) + len(self.quantiles))
+        # last window - 1 samples, starting the windows of the next samples appended
+        self.tail = np.empty(0)
+
+    @classmethod
+    def from_stats(cls, window, stats, quantiles=()):
+        """Rolling statistics already computed, e.g. those of the samples kept when
+        decimating a stream
+
+        Args:
+            window (int): window size in samples
+            stats (numpy.array): (num_samples, 4 + len(quantiles)) statistics of each sample,
+                in the order of the columns of RollingStats
+            quantiles (list(float), optional): quantiles of the statistics. Defaults to ().
+
+        Returns:
+            (RollingStats): rolling statistics, which cannot be appended to
+        """
+        rolling_stats = cls(window, quantiles)
+        rolling_stats.buffer.append(np.asarray(stats, dtype=np.float64))
+        return rolling_stats
+
+    def append(self, values):
+        """Append samples and compute the statistics of the windows ending on them; the cost
+        only depends on the number of samples appended and the window size
+
+        Args:
+            values (numpy.array): samples
+
+        Returns:
+            (RollingStats): self
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        stats = np.full((len(values), self.buffer.data.shape[1]), np.nan)
+        extended = np.concatenate((self.tail, values))
+        if len(extended) >= self.window:
+            stats[len(stats) - (len(extended) - self.window + 1):] = \
+                _window_statistics(extended, self.window, self.quantiles)
+        self.buffer.append(stats)
+        self.tail = extended[len(extended) - self.window + 1:] if self.window > 1 \
+            else np.empty(0)
+        return self
+
+    def discard(self, count):
+        """Discard the statistics of the first windows, e.g. those leaving a trailing window
+        of samples
+
+        Args:
+            count (int): number of windows to discard
+        """
+        self.buffer.discard(count)
+
+    def __len__(self):
+        return self.buffer.size
+
+    def __column(self, i):
+        return self.buffer.view(0, self.buffer.size)[:, i]
+
+    @property
+    def mean(self):
+        """Rolling mean, as a view"""
+        return self.__column(0)
+
+    @property
+    def std(self):
+        """Rolling sample standard deviation, as a view"""
+        return self.__column(1)
+
+    @property
+    def min(self):
+        """Rolling minimum, as a view"""
+        return self.__column(2)
+
+    @property
+    def max(self):
+        """Rolling maximum, as a view"""
+        return self.__column(3)
+
+    def quantile(self, quantile):
+        """Rolling quantile, as a view
+
+        Args:
+            quantile (float): one of the quantiles computed
+
+        Returns:
+            (numpy.array): rolling quantile
+        """
+        return self.__column(len(STATISTICS) + self.quantiles.index(float(quantile)))
+
+    def to_dataframe(self, index, name):
+        """Convert to a DataFrame with one column per statistic
+
+        Args:
+            index (Pandas.Index): time-series index, of the same length
+            name (str): time-series name the column names are built from
+
+        Returns:
+            (Pandas.DataFrame): rolling statistics
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        columns = [f"moving_avg_{name}", f"moving_stdev_{name}", f"moving_min_{name}",
+                   f"moving_max_{name}"] + [f"moving_q{quantile:g}_{name}"
+                                            for quantile in self.quantiles]
+        return pd.DataFrame(self.buffer.view(0, self.buffer.size), index=index,
+                            columns=columns)
+
+
+def compute_rolling_stats(time_series_df, window, quantiles=()):
+    """Compute the rolling statistics of every column of a time-series DataFrame
+
+    Args:
+        time_series_df (Pandas.DataFrame): time-series DataFrame
+        window (int): window size in samples
+        quantiles (list(float), optional): quantiles to compute. Defaults to ().
+
+    Returns:
+        (dict): RollingStats of each column
+    """
+    return {column: RollingStats(window, quantiles).append(time_series_df[column].to_numpy())
+            for column in time_series_df.columns}
+
+
+def stats_to_dataframe(rolling_stats, index):
+    """Convert the rolling statistics of several columns to a single DataFrame
+
+    Args:
+        rolling_stats (dict): RollingStats of each column
+        index (Pandas.Index): time-series index
+
+    Returns:
+        (Pandas.DataFrame): rolling statistics of all columns
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    return pd.concat([stats.to_dataframe(index, column)
+                      for column, stats in rolling_stats.items()], axis=1)
@@ -0,0 +1,354 @@
+"""Label-preserving multi-series results
+"""
+
+# standard imports
+import os
+import tempfile
+import numpy as np
+
+# custom imports
+from f3tch import profiling, utils
+
+
+class SeriesSet:
+    """Result of a range query returning one or more series.
+
+    The label sets are dictionary-encoded: each label name has a table of its distinct values
+    and every series stores one integer code per label name (-1 when the label is absent).
+    The samples of all series are stored in contiguous timestamp and value arrays, series i
+    spanning [offsets[i], offsets[i+1]). pandas is only imported when converting to a
+    DataFrame.
+    """
+
+    def __init__(self, metric_name, label_names, label_values, label_codes, offsets,
+                 timestamps, values):
+        """Initialization function
+
+        Args:
+            metric_name (str): PromQL expression that returned the series
+            label_names (list(str)): sorted label names found in any series
+            label_values (dict): distinct values of each label name
+            label_codes (numpy.array): (num_series, num_labels) int32 codes into label_values
+            offsets (numpy.array): (num_series + 1) int64 start offsets of each series
+            timestamps (numpy.array): float64 Unix timestamps of all series
+            values (numpy.array): float64 sample values of all series
+        """
+        self.metric_name = metric_name
+        self.label_names = label_names
+        self.label_values = label_values
+        self.label_codes = label_codes
+        self.offsets = offsets
+        self.timestamps = timestamps
+        self.values = values
+
+    @classmethod
+    def from_series(cls, metric_name, series):
+        """Build a SeriesSet from per-series label sets and arrays
+
+        Args:
+            metric_name (str): PromQL expression that returned the series
+            series (list(tuple)): (labels, values) for each series, where labels is a dictionary
+                and values is a 2-dimensional time-series array [[t1,value1], ...]
+
+        Returns:
+            (SeriesSet): encoded series
+        """
+        label_names = sorted({name for labels, _ in series for name in labels})
+        label_values = {name: [] for name in label_names}
+        lookup = {name: {} for name in label_names}
+        label_codes = np.full((len(series), len(label_names)), -1, dtype=np.int32)
+        for i, (labels, _) in enumerate(series):
+            for j, name in enumerate(label_names):
+                if name not in labels:
+                    continue
+                value = labels[name]
+                if value not in lookup[name]:
+                    lookup[name][value] = len(label_values[name])
+                    label_values[name].append(value)
+                label_codes[i, j] = lookup[name][value]
+
+        lengths = [len(values) for _, values in series]
+        offsets = np.zeros(len(series) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        arr = np.concatenate([values for _, values in series]) if len(series) > 0 \
+            else np.empty((0, 2))
+        arr = np.asarray(arr, dtype=np.float64).reshape(-1, 2)
+        return cls(metric_name=metric_name, label_names=label_names, label_values=label_values,
+                   label_codes=label_codes, offsets=offsets,
+                   timestamps=np.ascontiguousarray(arr[:, 0]),
+                   values=np.ascontiguousarray(arr[:, 1]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def num_samples(self):
+        """Total number of samples of all series
+
+        Returns:
+            (int): number of samples
+        """
+        return len(self.timestamps)
+
+    def labels(self, i):
+        """Label set of a series
+
+        Args:
+            i (int): series index
+
+        Returns:
+            (dict): label names and values
+        """
+        return {name: self.label_values[name][code]
+                for name, code in zip(self.label_names, self.label_codes[i]) if code >= 0}
+
+    def series(self, i):
+        """Samples of a series, as views into the contiguous arrays
+
+        Args:
+            i (int): series index
+
+        Returns:
+            (tuple): (timestamps, values) numpy arrays
+        """
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.timestamps[start:stop], self.values[start:stop]
+
+    def series_name(self, i):
+        """Name of a series: the metric name, followed by the labels that differ between the
+        series of the set, e.g. 'sum by (namespace) (x){namespace="a"}'
+
+        Args:
+            i (int): series index
+
+        Returns:
+            (str): series name
+        """
+        if len(self) <= 1:
+            return self.metric_name
+        varying = [j for j, name in enumerate(self.label_names)
+                   if len(self.label_values[name]) > 1 or (self.label_codes[:, j] < 0).any()]
+        labels = ",".join(f'{self.label_names[j]}="{self.label_values[self.label_names[j]][code]}"'
+                          for j, code in ((j, self.label_codes[i, j]) for j in varying)
+                          if code >= 0)
+        return f"{self.metric_name}{{{labels}}}"
+
+    def select(self, from_timestamp, to_timestamp):
+        """Restrict the set to the samples within a time range
+
+        Args:
+            from_timestamp (int): Starting Unix timestamp
+            to_timestamp (int): Ending Unix timestamp
+
+        Returns:
+            (SeriesSet): series with at least one sample in [from_timestamp, to_timestamp],
+                or None if there is none
+        """
+        selected = []
+        for i in range(len(self)):
+            timestamps, values = self.series(i)
+            start = np.searchsorted(timestamps, from_timestamp, side="left")
+            stop = np.searchsorted(timestamps, to_timestamp, side="right")
+            if stop > start:
+                selected.append((self.labels(i),
+                                 np.column_stack((timestamps[start:stop], values[start:stop]))))
+        if len(selected) == 0:
+            return None
+        return SeriesSet.from_series(self.metric_name, selected)
+
+    def to_grid(self, step, dtype=np.float64, directory=None):
+        """Convert to series without timestamps, on the regular grid of the samples
+
+        Args:
+            step (float): step size of the samples, in seconds
+            dtype (numpy.dtype, optional): float64 or float32. Defaults to np.float64.
+            directory (str, optional): directory of a temporary file the values are
+                memory-mapped from, removed as soon as it is mapped. Defaults to None, i.e.
+                the values are held in memory.
+
+        Raises:
+            ValueError: the samples are not on a regular grid of the given step
+
+        Returns:
+            (GridSeries): series on the grid of the samples, or None if there is none
+        """
+        if self.num_samples() == 0:
+            return None
+        start = self.timestamps.min()
+        positions = (self.timestamps - start) / step
+        grid_positions = np.rint(positions).astype(np.int64)
+        if not np.allclose(positions, grid_positions, rtol=0, atol=1e-6):
+            raise ValueError(f"The samples of {self.metric_name} are not on a regular grid of "
+                             f"{step}s")
+
+        shape = (len(self), int(grid_positions.max()) + 1)
+        if directory is None:
+            values = np.empty(shape, dtype=dtype)
+        else:
+            fd, filename = tempfile.mkstemp(suffix=".npy", dir=directory)
+            os.close(fd)
+            try:
+                values = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype,
+                                                   shape=shape)
+            finally:
+                # the mapping outlives the file name, and the file is freed with it
+                os.unlink(filename)
+        values.fill(np.nan)
+        mask = np.zeros(shape, dtype=bool)
+        for i in range(len(self)):
+            start_offset, stop_offset = self.offsets[i], self.offsets[i + 1]
+            columns = grid_positions[start_offset:stop_offset]
+            values[i, columns] = self.values[start_offset:stop_offset]
+            mask[i, columns] = True
+        return GridSeries(metric_name=self.metric_name,
+                          names=[self.series_name(i) for i in range(len(self))],
+                          start=float(start), step=float(step), values=values, mask=mask)
+
+    def to_long(self):
+        """Convert to a long DataFrame with one row per sample, one categorical column per label
+        name and a value column
+
+        Returns:
+            (Pandas.DataFrame): long time-series DataFrame indexed by timestamp
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        lengths = np.diff(self.offsets)
+        data = {}
+        for j, name in enumerate(self.label_names):
+            codes = np.repeat(self.label_codes[:, j], lengths)
+            data[name] = pd.Categorical.from_codes(codes, categories=self.label_values[name])
+        data["value"] = self.values
+        index = utils.timestamps_to_datetime(self.timestamps).rename("timestamp")
+        return pd.DataFrame(data, index=index)
+
+    def __wide_values(self):
+        """Private method to align all series on the union of their timestamps
+
+        Returns:
+            (tuple): (timestamps, matrix) where matrix has one column per series, NaN where a
+                series has no sample
+        """
+        timestamps = np.unique(self.timestamps)
+        matrix = np.full((len(timestamps), len(self)), np.nan)
+        for i in range(len(self)):
+            series_timestamps, series_values = self.series(i)
+            matrix[np.searchsorted(timestamps, series_timestamps), i] = series_values
+        return timestamps, matrix
+
+    def to_wide(self):
+        """Convert to a wide DataFrame with one column per series and MultiIndex columns made
+        of the label values
+
+        Returns:
+            (Pandas.DataFrame): wide time-series DataFrame indexed by timestamp
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        timestamps, matrix = self.__wide_values()
+        if len(self.label_names) > 0:
+            columns = pd.MultiIndex.from_tuples(
+                [tuple(self.labels(i).get(name) for name in self.label_names)
+                 for i in range(len(self))], names=self.label_names)
+        else:
+            columns = pd.Index([self.metric_name])
+        index = utils.timestamps_to_datetime(timestamps).rename("timestamp")
+        return pd.DataFrame(matrix, index=index, columns=columns)
+
+    @profiling.profiled("SeriesSet.to_dataframe")
+    def to_dataframe(self):
+        """Convert to a wide DataFrame with one column per series named after series_name; a
+        single series gives the same DataFrame as timeseries.array_to_dataframe
+
+        Returns:
+            (Pandas.DataFrame): wide time-series DataFrame indexed by timestamp
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        timestamps, matrix = self.__wide_values()
+        index = utils.timestamps_to_datetime(timestamps).rename("timestamp")
+        return pd.DataFrame(matrix, index=index,
+                            columns=[self.series_name(i) for i in range(len(self))])
+
+
+class GridSeries:
+    """Series sampled on a regular grid of timestamps start + k * step, stored without their
+    timestamps: one contiguous row of values per series, NaN at the grid points where the
+    series has no sample, and a validity mask telling those gaps apart from NaN samples.
+
+    The values are either float64 or float32 and may be memory-mapped. The DataFrames built
+    from them share their memory when every grid point is kept.
+    """
+
+    __slots__ = ("metric_name", "names", "start", "step", "values", "mask")
+
+    def __init__(self, metric_name, names, start, step, values, mask):
+        """Initialization function
+
+        Args:
+            metric_name (str): PromQL expression that returned the series
+            names (list(str)): name of each series
+            start (float): Unix timestamp of the first grid point
+            step (float): seconds between two grid points
+            values (numpy.array): (num_series, count) float64 or float32 values
+            mask (numpy.array): (num_series, count) boolean, True where a series has a sample
+        """
+        self.metric_name = metric_name
+        self.names = names
+        self.start = start
+        self.step = step
+        self.values = values
+        self.mask = mask
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def count(self):
+        """Number of grid points"""
+        return self.values.shape[1]
+
+    @property
+    def nbytes(self):
+        """Number of bytes held by the values and the validity mask"""
+        return self.values.nbytes + self.mask.nbytes
+
+    def timestamps(self):
+        """Unix timestamps of the grid points, computed on request
+
+        Returns:
+            (numpy.array): float64 Unix timestamps
+        """
+        return self.start + self.step * np.arange(self.count, dtype=np.float64)
+
+    def series(self, i):
+        """Values of a series, as views into the grid
+
+        Args:
+            i (int): series index
+
+        Returns:
+            (tuple): (values, mask) numpy arrays of the grid points
+        """
+        return self.values[i], self.mask[i]
+
+    @profiling.profiled("GridSeries.to_dataframe")
+    def to_dataframe(self, keep_gaps=False):
+        """Convert to a wide DataFrame with one column per series named after the series; the
+        same DataFrame as SeriesSet.to_dataframe, with the values of the grid
+
+        The columns are views into the values when every grid point is kept. Leaving out the
+        grid points without any sample copies the values, memory-mapped or not.
+
+        Args:
+            keep_gaps (bool, optional): Set to True to keep the grid points without any
+                sample, as NaN rows. Defaults to False, i.e. left out as in
+                SeriesSet.to_dataframe.
+
+        Returns:
+            (Pandas.DataFrame): wide time-series DataFrame indexed by timestamp
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        timestamps, values = self.timestamps(), self.values
+        sampled = self.mask.any(axis=0)
+        if not keep_gaps and not sampled.all():
+            timestamps, values = timestamps[sampled], values[:, sampled]
+        index = utils.timestamps_to_datetime(timestamps).rename("timestamp")
+        # the transposed rows are the single block of the DataFrame
+        return pd.DataFrame(values.T, index=index, columns=self.names, copy=False)
@@ -0,0 +1,71 @@
+"""Time-slices resolved once against a time-series index.
+"""
+
+# custom imports
+from f3tch import utils
+
+
+def parse_time_slices(time_slices):
+    """Parse the time ranges of time-slices into Unix timestamps, once per data specification
+
+    Args:
+        time_slices (list(dict)): time-slices with a time_range of two datetime strings
+            (%d.%m.%Y %H:%M:%S)
+
+    Returns:
+        list(dict): copies of the time-slices with from_timestamp and to_timestamp fields
+    """
+    parsed = []
+    for time_slice in time_slices or []:
+        if "from_timestamp" not in time_slice or "to_timestamp" not in time_slice:
+            date_range = time_slice["time_range"]
+            time_slice = dict(time_slice,
+                              from_timestamp=utils.strtime_to_timestamp(date_range[0]),
+                              to_timestamp=utils.strtime_to_timestamp(date_range[1]))
+        assert time_slice["from_timestamp"] < time_slice["to_timestamp"], \
+            f"{time_slice['time_range'][0]} should be less than {time_slice['time_range'][1]}"
+        parsed.append(time_slice)
+    return parsed
+
+
+class TimeSliceIndex:
+    """(start, stop) positions of each time-slice in a sorted time-series index, so that the
+    samples of a time-slice are obtained as a view instead of by filtering the whole index.
+    The index is shared by every column and every plot of a time-series DataFrame.
+    """
+
+    def __init__(self, index, time_slices):
+        """Initialization function
+
+        Args:
+            index (Pandas.DatetimeIndex): local (timezone naive) datetime index in time order
+            time_slices (list(dict)): time-slices, parsed or not
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        self.time_slices = parse_time_slices(time_slices)
+        bounds = np.array([[time_slice["from_timestamp"], time_slice["to_timestamp"]]
+                           for time_slice in self.time_slices], dtype=np.int64).reshape(-1, 2)
+        # local datetimes go back when clocks go back, so the search runs on Unix timestamps
+        # a time-slice covers [from_timestamp, to_timestamp)
+        positions = np.searchsorted(utils.datetime_to_timestamps(index), bounds.ravel())
+        self.positions = [(int(start), int(stop)) for start, stop in positions.reshape(-1, 2)]
+
+    def __len__(self):
+        return len(self.time_slices)
+
+    def __iter__(self):
+        """Iterate over the time-slices in data specification order
+
+        Returns:
+            (iterator): (time_slice, start, stop) for each time-slice
+        """
+        return iter([(time_slice, start, stop)
+                     for time_slice, (start, stop) in zip(self.time_slices, self.positions)])
+
+    def sorted(self):
+        """Time-slices in ascending time order
+
+        Returns:
+            list(tuple): (time_slice, start, stop) for each time-slice
+        """
+        return sorted(self, key=lambda item: item[0]["from_timestamp"])
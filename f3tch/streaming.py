@@ -0,0 +1,199 @@
+"""Out-of-core processing of metrics too long to be held in memory at once.
+
+A streamed metric is fetched as consecutive sub-ranges sized to a memory budget, and every
+chunk flows through the pipeline before the next one is fetched: the rolling statistics of
+its series carry their window over from the previous chunk, its samples are appended to the
+saved files and decimated into the points that are plotted. Only the chunk in flight, the
+last window of each series and the decimated points are held in memory.
+"""
+# standard imports
+import numpy as np
+
+# custom imports
+from f3tch import decimate, export, rolling, utils
+from f3tch.rolling import RollingStats
+from f3tch.series import SeriesSet
+
+# Estimated bytes held per sample of the chunk in flight: response parse buffer, SeriesSet,
+# wide DataFrame, rolling statistics and export buffers
+BYTES_PER_SAMPLE = 128
+# Points of the first chunk of a metric, fetched before its number of series is known, unless
+# the memory budget does not hold as many points of a single series
+FIRST_CHUNK_POINTS = 1000
+# Two points per pixel column of a default-size figure
+DEFAULT_MAX_POINTS = 3840
+
+
+def chunk_points(memory_bytes, num_series):
+    """Number of points per series of a chunk held within a memory budget
+
+    Args:
+        memory_bytes (int): memory budget of the chunk in flight
+        num_series (int): number of series of the metric
+
+    Returns:
+        (int): points per series
+    """
+    return max(1, int(memory_bytes // (BYTES_PER_SAMPLE * max(1, num_series))))
+
+
+class MetricStream:
+    """State of a metric processed chunk by chunk: the columns of its series, their rolling
+    statistics and decimated plot points, and the files its chunks are appended to
+    """
+
+    def __init__(self, metric, memory_bytes, basename=None, output_format="csv",
+                 compression=None):
+        """Initialization function
+
+        Args:
+            metric (dictionary): metric information used to query prometheus
+            memory_bytes (int): memory budget of the chunk in flight
+            basename (str, optional): file name the time-series data is saved under, without
+                extension. Defaults to None, i.e. not saved.
+            output_format (str, optional): format the time-series data is saved in, but npz.
+                Defaults to "csv".
+            compression (str, optional): compression codec the time-series data is saved with.
+                Defaults to None, i.e. the default codec of output_format.
+        """
+        self.metric = metric
+        self.memory_bytes = memory_bytes
+        self.basename = basename
+        self.output_format = output_format
+        self.compression = compression
+        self.next_from = metric["from_timestamp"]
+        self.window = metric["moving_window"]
+        self.quantiles = metric.get("moving_quantiles", [])
+        # a point budget of 0 keeps every sample, which a stream cannot hold
+        self.max_points = metric.get("max_points") or DEFAULT_MAX_POINTS
+        # label sets of the series, in column order
+        self.labels = []
+        self.columns = {}
+        self.names = []
+        self.rolling_stats = []
+        self.decimators = []
+        self.writers = []
+        self.filenames = []
+        self.parts = 0
+
+    def next_range(self):
+        """Time range of the next chunk to fetch, sized after the number of series seen
+
+        Returns:
+            (tuple): (from_timestamp, to_timestamp) aligned to the step of the metric, or None
+                once the time range of the metric is exhausted
+        """
+        if self.next_from > self.metric["to_timestamp"]:
+            return None
+        points = chunk_points(self.memory_bytes, len(self.labels))
+        if len(self.labels) == 0:
+            points = min(points, FIRST_CHUNK_POINTS)
+        from_timestamp = self.next_from
+        to_timestamp = min(self.metric["to_timestamp"],
+                           from_timestamp + (points - 1) * self.metric["step_size"])
+        self.next_from = to_timestamp + self.metric["step_size"]
+        return from_timestamp, to_timestamp
+
+    def __add_columns(self, series_set):
+        """Private method to add a column for each series seen for the first time, starting
+        new files for the new set of columns"""
+        added = False
+        for i in range(len(series_set)):
+            labels = series_set.labels(i)
+            key = tuple(sorted(labels.items()))
+            if key in self.columns:
+                continue
+            self.columns[key] = len(self.labels)
+            self.labels.append(labels)
+            self.rolling_stats.append(RollingStats(self.window, self.quantiles)
+                                      if self.window > 0 else None)
+            self.decimators.append(decimate.StreamingMinMax(
+                self.metric["from_timestamp"], self.metric["to_timestamp"], self.max_points,
+                width=len(rolling.STATISTICS) + len(self.quantiles) if self.window > 0 else 0,
+                head=self.window))
+            added = True
+        if not added:
+            return
+
+        # series names only show the labels that tell the series of the metric apart
+        named = SeriesSet.from_series(self.metric["metric_name"],
+                                      [(labels, np.empty((0, 2))) for labels in self.labels])
+        self.names = [named.series_name(i) for i in range(len(named))]
+        if self.basename is None:
+            return
+        self.close()
+        basename = self.basename if self.parts == 0 else f"{self.basename}_part{self.parts}"
+        self.parts += 1
+        self.writers = [export.AppendWriter(basename, self.output_format, self.compression)]
+        if self.metric.get("save_rolling_stats", False) and self.window > 0:
+            self.writers.append(export.AppendWriter(f"{basename}_rolling", self.output_format,
+                                                    self.compression))
+
+    def update(self, series_set):
+        """Process a chunk: save its samples and rolling statistics and decimate them
+
+        Args:
+            series_set (series.SeriesSet): series of the chunk, or None
+
+        Returns:
+            (int): number of timestamps of the chunk
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        if series_set is None:
+            return 0
+        self.__add_columns(series_set)
+
+        timestamps = np.unique(series_set.timestamps)
+        values = np.full((len(timestamps), len(self.labels)), np.nan)
+        for i in range(len(series_set)):
+            series_timestamps, series_values = series_set.series(i)
+            column = self.columns[tuple(sorted(series_set.labels(i).items()))]
+            values[np.searchsorted(timestamps, series_timestamps), column] = series_values
+
+        chunk_stats = {}
+        for column, (name, rolling_stats) in enumerate(zip(self.names, self.rolling_stats)):
+            stats = None
+            if rolling_stats is not None:
+                # only the last window of samples is carried over to the next chunk
+                rolling_stats.append(values[:, column])
+                stats = rolling_stats.buffer.view(0, len(rolling_stats)).copy()
+                rolling_stats.discard(len(rolling_stats))
+                chunk_stats[name] = RollingStats.from_stats(self.window, stats, self.quantiles)
+            self.decimators[column].append(timestamps, values[:, column], stats)
+
+        if len(self.writers) > 0:
+            index = utils.timestamps_to_datetime(timestamps).rename("timestamp")
+            self.writers[0].append(pd.DataFrame(values, index=index, columns=self.names))
+            if len(self.writers) > 1:
+                self.writers[1].append(rolling.stats_to_dataframe(chunk_stats, index))
+        return len(timestamps)
+
+    def close(self):
+        """Finish the files the chunks are appended to
+
+        Returns:
+            (list(str)): names of all the files written so far
+        """
+        for writer in self.writers:
+            filename = writer.close()
+            if filename is not None:
+                self.filenames.append(filename)
+        self.writers = []
+        return self.filenames
+
+    def to_dataframes(self):
+        """Decimated plot points of every series
+
+        Returns:
+            (list(tuple)): (series name, time-series DataFrame of the decimated samples with a
+                single column, RollingStats of those samples or None) for each series
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        frames = []
+        for name, decimator in zip(self.names, self.decimators):
+            rows = decimator.result()
+            index = utils.timestamps_to_datetime(rows[:, 0]).rename("timestamp")
+            frames.append((name, pd.DataFrame(rows[:, 1], index=index, columns=[name]),
+                           RollingStats.from_stats(self.window, rows[:, 2:], self.quantiles)
+                           if self.window > 0 else None))
+        return frames
@@ -2,10 +2,11 @@
 """
 
 # standard imports
+import numpy as np
 import pandas as pd
 
 # custom imports
-from f3tch import utils
+from f3tch import profiling, utils
 
 
 def verbose_print(verbose, msg):
@@ -19,6 +20,41 @@ def verbose_print(verbose, msg):
         print(msg)
 
 
+def values_to_columns(values):
+    """This function converts the values of a Prometheus range query result to timestamp and
+    value columns
+
+    Args:
+        values (list): Prometheus result values as such:
+            [[t1,"value1"], [t2,"value2"], ..., [tn,"valuen"]]
+
+    Returns:
+        (tuple): (timestamps, values) float64 numpy arrays
+    """
+    timestamps = np.fromiter((value[0] for value in values), dtype=np.float64,
+                             count=len(values))
+    samples = np.array([value[1] for value in values], dtype=np.float64)
+    return timestamps, samples
+
+
+def columns_to_dataframe(timestamps, values, metric_name):
+    """This function takes timestamp and value columns and converts them to Pandas.DataFrame
+    object
+
+    Args:
+        timestamps (numpy.array): Unix timestamps
+        values (numpy.array): sample values
+        metric_name (str): metric name
+
+    Returns:
+        Time-series data (Pandas.DataFrame): converted Pandas.DataFrame time-series object
+    """
+    assert len(timestamps) > 0, "Given time series data is empty!"
+    index = utils.timestamps_to_datetime(timestamps).rename("timestamp")
+    return pd.DataFrame({metric_name: np.asarray(values, dtype=np.float64)}, index=index)
+
+
+@profiling.profiled("timeseries.array_to_dataframe")
 def array_to_dataframe(arr_time_series, metric_name):
     """This function takes a time-series array and converts it to Pandas.DataFrame object
 
@@ -31,6 +67,6 @@ def array_to_dataframe(arr_time_series, metric_name):
         Time-series data (Pandas.DataFrame): converted Pandas.DataFrame time-series object
     """
     assert len(arr_time_series) > 0, "Given time series data is empty!"
-    return utils.transform_dataframe_time_column(
-        time_series_df=pd.DataFrame(arr_time_series, columns=["timestamp",
-                                                              metric_name])).set_index("timestamp")
+    arr_time_series = np.asarray(arr_time_series, dtype=np.float64).reshape(-1, 2)
+    return columns_to_dataframe(timestamps=arr_time_series[:, 0], values=arr_time_series[:, 1],
+                                metric_name=metric_name)
@@ -0,0 +1,332 @@
+"""Transports used to send HTTP API requests to Prometheus.
+
+Raises:
+    exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+    exceptions.PrometheusQueryFailure: the request could not be sent to Prometheus
+"""
+# standard imports
+from abc import ABC, abstractmethod
+import base64
+import binascii
+import gzip
+import io
+import shlex
+import urllib.parse
+import zlib
+from contextlib import contextmanager
+import openshift
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+# custom imports
+from f3tch import exceptions
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def get_kubeconfig_token(kubeconfig, context=None):
+    """Retrieve the bearer token of the user associated with a kubeconfig context
+
+    Args:
+        kubeconfig (str): path to kube-config file for the OpenShift cluster being queried
+        context (str, optional): kubeconfig context name. Defaults to None, in which case the
+            current-context of the kubeconfig file is used.
+
+    Returns:
+        (str): bearer token, or None if the context user does not authenticate with a token
+    """
+    with open(kubeconfig, "r", encoding="utf8") as file:
+        config = yaml.safe_load(file) or {}
+
+    context = context if context is not None else config.get("current-context")
+    user_name = None
+    for _context in config.get("contexts") or []:
+        if _context.get("name") == context:
+            user_name = (_context.get("context") or {}).get("user")
+            break
+
+    for _user in config.get("users") or []:
+        if _user.get("name") == user_name:
+            return (_user.get("user") or {}).get("token")
+    return None
+
+
+@contextmanager
+def compressed_body(out):
+    """Stream the output of a compressed exec transfer: the base64 encoded response body,
+    gzip compressed unless Prometheus ignored the Accept-Encoding header
+
+    Args:
+        out (str or bytes): base64 encoded response body
+
+    Raises:
+        exceptions.PrometheusQueryFailure: the output is empty, not base64 encoded or not
+            valid gzip data
+
+    Yields:
+        (file-like): binary stream of the response body, decompressed as it is read
+    """
+    try:
+        data = base64.b64decode(out)
+    except (binascii.Error, ValueError) as exc:
+        raise exceptions.PrometheusQueryFailure from exc
+    if len(data) == 0:
+        raise exceptions.PrometheusQueryFailure("Empty response")
+
+    body = io.BytesIO(data)
+    if data[:2] == GZIP_MAGIC:
+        body = gzip.GzipFile(fileobj=body, mode="rb")
+    try:
+        yield body
+    except (OSError, EOFError, zlib.error) as exc:
+        # truncated or corrupted gzip data, e.g. an interrupted exec stream
+        raise exceptions.PrometheusQueryFailure from exc
+    finally:
+        body.close()
+
+
+class Transport(ABC):
+    """Base class for the transports used to reach the Prometheus HTTP API
+    """
+
+    @abstractmethod
+    def get(self, path, params):
+        """Send a GET request to the Prometheus HTTP API
+
+        Args:
+            path (str): API path, e.g. "/api/v1/query_range"
+            params (dict): query string parameters
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the request could not be sent to Prometheus
+
+        Returns:
+            (str or bytes): response body
+        """
+
+    @contextmanager
+    def stream(self, path, params):
+        """Send a GET request to the Prometheus HTTP API and stream the response body
+
+        Args:
+            path (str): API path, e.g. "/api/v1/query_range"
+            params (dict): query string parameters
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the request could not be sent to Prometheus
+
+        Yields:
+            (file-like): binary stream of the response body
+        """
+        out = self.get(path, params)
+        yield io.BytesIO(out.encode("utf8") if isinstance(out, str) else out)
+
+    def close(self):
+        """Release any resources held by the transport"""
+
+
+class ExecTransport(Transport):
+    """Transport that runs curl inside the Prometheus pod through `oc exec`
+    """
+
+    def __init__(self, prometheus_pod, kubeconfig=None, base_url="http://localhost:9090",
+                 compressed=False):
+        """Intialization function
+
+        Args:
+            prometheus_pod (openshift.APIObject): Prometheus pod object
+            kubeconfig (str, optional): path to kube-config file for the OpenShift cluster.
+                Defaults to None.
+            base_url (str, optional): Prometheus URL as seen from inside the pod.
+                Defaults to "http://localhost:9090".
+            compressed (bool, optional): Set to True to have Prometheus gzip the response
+                body, sent back base64 encoded through the exec channel and decompressed as
+                it is parsed. Defaults to False.
+
+        Raises:
+            exceptions.PrometheusPodNotFound: unable to locate the Prometheus pod
+        """
+        if prometheus_pod is None:
+            raise exceptions.PrometheusPodNotFound
+        self.prometheus_pod = prometheus_pod
+        self.kubeconfig = kubeconfig
+        self.base_url = base_url
+        self.compressed = compressed
+
+    def __command(self, query):
+        """Private method to build the command run inside the Prometheus pod
+
+        Args:
+            query (str): request URL
+
+        Returns:
+            list(str): command
+        """
+        if not self.compressed:
+            return ['curl', query]
+        # curl --compressed would decompress inside the pod, so the encoding is requested
+        # explicitly and the gzip body is base64 encoded to travel through the text stream
+        return ['sh', '-c',
+                f"curl -s -H 'Accept-Encoding: gzip' {shlex.quote(query)} | base64"]
+
+    def __execute(self, path, params):
+        """Private method to run the request inside the Prometheus pod
+
+        Args:
+            path (str): API path
+            params (dict): query string parameters
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the request could not be sent to Prometheus
+
+        Returns:
+            (str): command output
+        """
+        # The default kubeconfig path is thread-local in the openshift client, so it has to be
+        # set again when the query is issued from a worker thread
+        if self.kubeconfig is not None:
+            openshift.set_default_kubeconfig_path(self.kubeconfig)
+
+        query = f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+        try:
+            res = self.prometheus_pod.execute(  # pylint: disable=E1101
+                cmd_to_exec=self.__command(query), auto_raise=True)
+        except openshift.model.OpenShiftPythonException as exc:
+            raise exceptions.PrometheusQueryFailure from exc
+
+        if res.status() != 0:
+            raise exceptions.PrometheusQueryFailure
+        return res.out()
+
+    def get(self, path, params):
+        out = self.__execute(path, params)
+        if not self.compressed:
+            return out
+        with compressed_body(out) as body:
+            return body.read()
+
+    @contextmanager
+    def stream(self, path, params):
+        out = self.__execute(path, params)
+        if not self.compressed:
+            yield io.BytesIO(out.encode("utf8") if isinstance(out, str) else out)
+            return
+        with compressed_body(out) as body:
+            yield body
+
+
+class HttpTransport(Transport):
+    """Transport that talks to the Prometheus HTTP API directly, e.g. through a route URL,
+    a service URL or a locally established port-forward, over pooled keep-alive connections
+    """
+
+    def __init__(self, base_url, token=None, verify=True, timeout=300, pool_size=10):
+        """Intialization function
+
+        Args:
+            base_url (str): Prometheus URL, e.g. "https://prometheus-k8s-openshift-monitoring.apps"
+                or "http://localhost:9090"
+            token (str, optional): bearer token used to authenticate. Defaults to None.
+            verify (bool or str, optional): verify the server TLS certificate, or path to a CA
+                bundle. Defaults to True.
+            timeout (int, optional): request timeout in seconds. Defaults to 300.
+            pool_size (int, optional): maximum number of keep-alive connections kept open.
+                Defaults to 10.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.verify = verify
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token is not None:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def __request(self, path, params, stream=False):
+        """Private method to send a GET request and check its response
+
+        Args:
+            path (str): API path
+            params (dict): query string parameters
+            stream (bool, optional): Set to True to defer downloading the response body.
+                Defaults to False.
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the request could not be sent to Prometheus
+
+        Returns:
+            (requests.Response): response
+        """
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params,
+                                        timeout=self.timeout, stream=stream)
+        except requests.RequestException as exc:
+            raise exceptions.PrometheusQueryFailure from exc
+
+        # Prometheus reports query errors (bad_data, timeout, ...) as JSON bodies with 4xx/5xx
+        # status codes, so only non-JSON error responses are treated as transport failures
+        if not response.ok and \
+                not response.headers.get("Content-Type", "").startswith("application/json"):
+            response.close()
+            raise exceptions.PrometheusQueryFailure(
+                f"HTTP {response.status_code}: {response.reason}")
+        return response
+
+    def get(self, path, params):
+        return self.__request(path, params).content
+
+    @contextmanager
+    def stream(self, path, params):
+        response = self.__request(path, params, stream=True)
+        try:
+            response.raw.decode_content = True
+            yield response.raw
+        finally:
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+
+class TunnelTransport(HttpTransport):
+    """Transport that talks to the Prometheus HTTP API of a pod through a persistent
+    port-forward, checked and re-established if needed before every request
+    """
+
+    def __init__(self, tunnel, **kwargs):
+        """Intialization function
+
+        Args:
+            tunnel (tunnel.PortForward): established port-forward to the Prometheus pod
+            **kwargs: HttpTransport arguments other than base_url
+        """
+        super().__init__(base_url=tunnel.url, **kwargs)
+        self.tunnel = tunnel
+
+    def __ensure_tunnel(self):
+        """Private method to re-establish the port-forward if it is no longer healthy
+
+        Raises:
+            exceptions.PrometheusQueryFailure: the port-forward could not be re-established
+        """
+        try:
+            self.tunnel.ensure()
+        except exceptions.PortForwardFailure as exc:
+            raise exceptions.PrometheusQueryFailure from exc
+
+    def get(self, path, params):
+        self.__ensure_tunnel()
+        return super().get(path, params)
+
+    @contextmanager
+    def stream(self, path, params):
+        self.__ensure_tunnel()
+        with super().stream(path, params) as body:
+            yield body
+
+    def close(self):
+        super().close()
+        self.tunnel.close()
@@ -0,0 +1,190 @@
+"""Persistent `oc port-forward` tunnel to the Prometheus pod, shared by every query of a run.
+
+Raises:
+    exceptions.PortForwardFailure: the port-forward could not be established
+"""
+# standard imports
+import atexit
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+# custom imports
+from f3tch import exceptions
+
+DEFAULT_REMOTE_PORT = 9090
+DEFAULT_STARTUP_TIMEOUT = 30
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+
+
+def _free_port():
+    """Local TCP port that is currently free"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class PortForward:
+    """`oc port-forward` process forwarding a local port to a port of a pod, checked before
+    every use and re-established on the same local port when it died. Every connection to
+    the local port opens a stream to the pod, so that connections are only checked every
+    health_check_interval seconds, and between checks only the process is.
+    """
+
+    def __init__(self, namespace, pod_name, kubeconfig=None,
+                 remote_port=DEFAULT_REMOTE_PORT, local_port=None, oc_path="oc",
+                 startup_timeout=DEFAULT_STARTUP_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL):
+        """Initialization function
+
+        Args:
+            namespace (str): namespace of the pod
+            pod_name (str): pod name
+            kubeconfig (str, optional): path to kube-config file for the OpenShift cluster.
+                Defaults to None.
+            remote_port (int, optional): pod port forwarded to. Defaults to 9090.
+            local_port (int, optional): local port forwarded from. Defaults to None, i.e. a
+                free port.
+            oc_path (str, optional): oc binary. Defaults to "oc".
+            startup_timeout (int, optional): seconds to wait for the local port to accept
+                connections. Defaults to 30.
+            health_check_interval (int, optional): seconds between checks that the local
+                port accepts connections. Defaults to 30.
+        """
+        self.namespace = namespace
+        self.pod_name = pod_name
+        self.kubeconfig = kubeconfig
+        self.remote_port = remote_port
+        self.local_port = local_port or _free_port()
+        self.oc_path = oc_path
+        self.startup_timeout = startup_timeout
+        self.health_check_interval = health_check_interval
+        self.last_health_check = 0.0
+        self.process = None
+        self.stderr = None
+        self.restarts = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Local URL of the forwarded port"""
+        return f"http://127.0.0.1:{self.local_port}"
+
+    def command(self):
+        """Command running the port-forward
+
+        Returns:
+            list(str): command
+        """
+        command = [self.oc_path]
+        if self.kubeconfig is not None:
+            command += ["--kubeconfig", self.kubeconfig]
+        if self.namespace is not None:
+            command += ["--namespace", self.namespace]
+        return command + ["port-forward", f"pod/{self.pod_name}",
+                          f"{self.local_port}:{self.remote_port}"]
+
+    def __accepts_connections(self):
+        """Private method to check whether the local port accepts connections"""
+        try:
+            with socket.create_connection(("127.0.0.1", self.local_port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def healthy(self):
+        """Check that the port-forward process is running and its local port accepts
+        connections
+
+        Returns:
+            (bool): True if the tunnel can be used
+        """
+        return self.process is not None and self.process.poll() is None \
+            and self.__accepts_connections()
+
+    def __start(self):
+        """Private method to start the port-forward process and wait for its local port
+
+        Raises:
+            exceptions.PortForwardFailure: the port-forward could not be established
+        """
+        # errors go to a file rather than a pipe, which would block oc once full
+        stderr = tempfile.TemporaryFile()
+        try:
+            self.process = subprocess.Popen(self.command(), stdin=subprocess.DEVNULL,
+                                            stdout=subprocess.DEVNULL, stderr=stderr)
+        except OSError as exc:
+            stderr.close()
+            raise exceptions.PortForwardFailure(f"Failed to run {self.oc_path}") from exc
+        self.stderr = stderr
+
+        deadline = time.monotonic() + self.startup_timeout
+        while not self.__accepts_connections():
+            if self.process.poll() is not None:
+                self.stderr.seek(0)
+                error = self.stderr.read().decode("utf8", errors="replace").strip()
+                self.stderr.close()
+                self.process = None
+                raise exceptions.PortForwardFailure(
+                    f"Port-forward to {self.namespace}:pod/{self.pod_name} exited: {error}")
+            if time.monotonic() > deadline:
+                self.__stop()
+                raise exceptions.PortForwardFailure(
+                    f"Port-forward to {self.namespace}:pod/{self.pod_name} not ready after "
+                    f"{self.startup_timeout}s")
+            time.sleep(0.1)
+        self.last_health_check = time.monotonic()
+        atexit.register(self.close)
+
+    def __stop(self):
+        """Private method to terminate the port-forward process"""
+        if self.process is None:
+            return
+        atexit.unregister(self.close)
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.stderr.close()
+        self.process = None
+
+    def start(self):
+        """Establish the port-forward
+
+        Raises:
+            exceptions.PortForwardFailure: the port-forward could not be established
+
+        Returns:
+            (PortForward): self
+        """
+        with self.lock:
+            if self.process is None:
+                self.__start()
+        return self
+
+    def ensure(self):
+        """Re-establish the port-forward on the same local port if it is no longer healthy,
+        e.g. after the pod restarted or the connection to the API server was lost
+
+        Raises:
+            exceptions.PortForwardFailure: the port-forward could not be re-established
+        """
+        with self.lock:
+            if self.process is not None and self.process.poll() is None and \
+                    time.monotonic() - self.last_health_check < self.health_check_interval:
+                return
+            if self.healthy():
+                self.last_health_check = time.monotonic()
+                return
+            self.__stop()
+            self.restarts += 1
+            self.__start()
+
+    def close(self):
+        """Tear the port-forward down"""
+        with self.lock:
+            self.__stop()
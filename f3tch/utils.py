@@ -2,8 +2,12 @@
 """
 
 #standard imports
+import time
 from datetime import datetime
-import pandas as pd
+
+# Width in seconds of the buckets over which the local UTC offset is assumed constant;
+# every time zone transition falls on a multiple of 15 minutes
+UTC_OFFSET_BUCKET = 900
 
 
 def convert_time(timestamp):
@@ -31,6 +35,65 @@ def strtime_to_timestamp(strtime):
     return int(datetime.strptime(strtime, '%d.%m.%Y %H:%M:%S').timestamp())
 
 
+def timestamps_to_datetime(timestamps):
+    """Convert Unix timestamps to local, second-resolution datetimes without any per-sample
+    Python calls: the local UTC offset is only looked up once per UTC_OFFSET_BUCKET
+
+    Args:
+        timestamps (numpy.array): Unix timestamps
+
+    Returns:
+        (Pandas.DatetimeIndex): local (timezone naive) datetimes
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    seconds = np.floor(np.asarray(timestamps, dtype=float)).astype(np.int64)
+    if len(seconds) == 0:
+        return pd.DatetimeIndex(seconds.astype("datetime64[ns]"))
+    return pd.DatetimeIndex((seconds + _utc_offsets(seconds)).astype("datetime64[s]")
+                            .astype("datetime64[ns]"))
+
+
+def _utc_offsets(seconds):
+    """Local UTC offset of each Unix timestamp, looked up once per UTC_OFFSET_BUCKET"""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    buckets, inverse = np.unique(seconds // UTC_OFFSET_BUCKET, return_inverse=True)
+    offsets = np.fromiter((time.localtime(int(bucket) * UTC_OFFSET_BUCKET).tm_gmtoff
+                           for bucket in buckets), dtype=np.int64, count=len(buckets))
+    return offsets[inverse]
+
+
+def datetime_to_timestamps(index):
+    """Convert local, second-resolution datetimes in time order back to Unix timestamps,
+    the inverse of timestamps_to_datetime. A local time repeated when clocks go back is
+    read as its first occurrence, unless its first occurrence is already behind.
+
+    Args:
+        index (Pandas.DatetimeIndex): local (timezone naive) datetimes in time order
+
+    Returns:
+        (numpy.array): Unix timestamps (int64)
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    local = np.asarray(index, dtype="datetime64[s]").astype(np.int64)
+    if len(local) == 0:
+        return local
+    # every offset in use around the datetimes, at most a day away from UTC
+    day = 86400
+    around = np.arange(local.min() - day, local.max() + 2 * day, UTC_OFFSET_BUCKET)
+    candidates = np.unique(_utc_offsets(around))
+    # a local time is one of its candidate timestamps that has the candidate offset
+    timestamps = local[:, None] - candidates[None, :]
+    valid = _utc_offsets(timestamps.ravel()).reshape(timestamps.shape) == candidates[None, :]
+    first = np.where(valid, timestamps, np.iinfo(np.int64).max).min(axis=1)
+    last = np.where(valid, timestamps, np.iinfo(np.int64).min).max(axis=1)
+    # a local time skipped when clocks go forward has no valid candidate
+    first = np.where(valid.any(axis=1), first, local - candidates.max())
+    last = np.where(valid.any(axis=1), last, first)
+    preceding = np.maximum.accumulate(np.concatenate(([np.iinfo(np.int64).min], first[:-1])))
+    return np.where(first <= preceding, last, first)
+
+
 def transform_dataframe_time_column(time_series_df):
     """Transform Pandas.DataFrame time-series timestamp column
 
@@ -42,8 +105,7 @@ def transform_dataframe_time_column(time_series_df):
         (Pandas.DataFrame): Timestamp-formatted DataFrame
     """
     assert "timestamp" in time_series_df.columns
-    time_series_df.timestamp = time_series_df.timestamp.apply(
-        lambda y: datetime.fromtimestamp(y).strftime('%Y-%m-%d %H:%M:%S')).astype("datetime64")
+    time_series_df.timestamp = timestamps_to_datetime(time_series_df.timestamp.to_numpy())
     return time_series_df
 
 
@@ -61,6 +123,7 @@ def date_filter(time_series_df, date_range):
     assert strtime_to_timestamp(date_range[0]) < strtime_to_timestamp(date_range[1]), \
         f"{date_range[0]} should be less than {date_range[1]}"
 
+    import pandas as pd  # pylint: disable=import-outside-toplevel
     date_range_df = transform_dataframe_time_column(
         time_series_df=pd.DataFrame([strtime_to_timestamp(_) for _ in date_range], columns=["timestamp"]))
 
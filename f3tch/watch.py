@@ -0,0 +1,148 @@
+"""In-memory state of the metrics of a watch, extended with the samples of every tick.
+
+Each metric keeps a trailing window of the length of its data specification time range:
+every tick only fetches the samples after the last one seen, appends them and their rolling
+statistics, and discards the samples leaving the window, so that the cost of a tick does not
+depend on how long the watch has been running.
+"""
+# standard imports
+import numpy as np
+
+# custom imports
+from f3tch import utils
+from f3tch.parser import GrowableBuffer
+from f3tch.rolling import RollingStats
+
+
+class MetricWatch:
+    """Trailing window of the samples of every series of a metric, one column per series,
+    and of their rolling statistics
+    """
+
+    def __init__(self, metric):
+        """Initialization function
+
+        Args:
+            metric (dictionary): metric information used to query prometheus, whose time
+                range gives the length of the trailing window
+        """
+        self.metric = metric
+        self.step_size = metric["step_size"]
+        self.span = metric["to_timestamp"] - metric["from_timestamp"]
+        self.last_timestamp = None
+        # label sets of the series, in column order
+        self.labels = []
+        self.columns = {}
+        self.names = []
+        # timestamp column followed by one column per series
+        self.samples = GrowableBuffer(width=1)
+        self.rolling_stats = []
+
+    def next_range(self, now):
+        """Time range of the samples to fetch at a tick
+
+        Args:
+            now (float): Unix timestamp of the tick
+
+        Returns:
+            (tuple): (from_timestamp, to_timestamp) aligned to the step of the metric, or None
+                if no new sample can be available yet
+        """
+        to_timestamp = int(now) - int(now) % self.step_size
+        if self.last_timestamp is None:
+            return to_timestamp - self.span, to_timestamp
+        from_timestamp = int(self.last_timestamp) + self.step_size
+        if from_timestamp > to_timestamp:
+            return None
+        # a watch that fell behind by more than a window only needs the last one
+        return max(from_timestamp, to_timestamp - self.span), to_timestamp
+
+    def __add_columns(self, series_set):
+        """Private method to add a column for each series seen for the first time, with no
+        sample in the current window"""
+        added = False
+        for i in range(len(series_set)):
+            labels = series_set.labels(i)
+            key = tuple(sorted(labels.items()))
+            if key in self.columns:
+                continue
+            self.columns[key] = len(self.labels)
+            self.labels.append(labels)
+            if self.metric["moving_window"] > 0:
+                self.rolling_stats.append(
+                    RollingStats(self.metric["moving_window"],
+                                 self.metric.get("moving_quantiles", [])).append(
+                                     np.full(self.samples.size, np.nan)))
+            added = True
+        if not added:
+            return
+
+        samples = GrowableBuffer(capacity=2 * self.samples.size, width=1 + len(self.labels))
+        current = self.samples.view(0, self.samples.size)
+        extended = np.full((len(current), 1 + len(self.labels)), np.nan)
+        extended[:, :current.shape[1]] = current
+        samples.append(extended)
+        self.samples = samples
+        # series names only show the labels that tell the series of the window apart
+        from f3tch.series import SeriesSet  # pylint: disable=import-outside-toplevel
+        named = SeriesSet.from_series(self.metric["metric_name"],
+                                      [(labels, np.empty((0, 2))) for labels in self.labels])
+        self.names = [named.series_name(i) for i in range(len(named))]
+
+    def update(self, series_set):
+        """Append the samples fetched at a tick and discard those leaving the window
+
+        Args:
+            series_set (series.SeriesSet): series fetched since the last tick, or None
+
+        Returns:
+            (int): number of new timestamps
+        """
+        if series_set is None:
+            return 0
+        if self.last_timestamp is not None:
+            series_set = series_set.select(self.last_timestamp + 1, np.inf)
+            if series_set is None:
+                return 0
+        self.__add_columns(series_set)
+
+        timestamps = np.unique(series_set.timestamps)
+        rows = np.full((len(timestamps), 1 + len(self.labels)), np.nan)
+        rows[:, 0] = timestamps
+        for i in range(len(series_set)):
+            series_timestamps, series_values = series_set.series(i)
+            column = 1 + self.columns[tuple(sorted(series_set.labels(i).items()))]
+            rows[np.searchsorted(timestamps, series_timestamps), column] = series_values
+        self.samples.append(rows)
+        for column, rolling_stats in enumerate(self.rolling_stats):
+            rolling_stats.append(rows[:, 1 + column])
+        self.last_timestamp = timestamps[-1]
+
+        expired = int(np.searchsorted(self.samples.view(0, self.samples.size)[:, 0],
+                                      self.last_timestamp - self.span, side="left"))
+        self.samples.discard(expired)
+        for rolling_stats in self.rolling_stats:
+            rolling_stats.discard(expired)
+        return len(timestamps)
+
+    def to_dataframe(self):
+        """Convert the trailing window to a DataFrame
+
+        Returns:
+            (Pandas.DataFrame): wide time-series DataFrame indexed by timestamp, with one
+                column per series named after series_name, or None if the window is empty
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        if self.samples.size == 0:
+            return None
+        window = self.samples.view(0, self.samples.size)
+        index = utils.timestamps_to_datetime(window[:, 0]).rename("timestamp")
+        return pd.DataFrame(window[:, 1:], index=index, columns=self.names)
+
+    def get_rolling_stats(self):
+        """Rolling statistics of the trailing window
+
+        Returns:
+            (dict): RollingStats of each column, empty without a moving window
+        """
+        return dict(zip(self.names, self.rolling_stats))
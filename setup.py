@@ -12,7 +12,10 @@ dev_require = [
     "numpy==1.22.3",
     "openshift==0.13.1",
     "openshift_client==1.0.16",
-    "pandas==1.4.2"
+    "pandas==1.4.2",
+    "pyarrow==9.0.0",
+    "PyYAML==6.0",
+    "requests==2.28.1"
 ]
 
 install_requires = [
@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import openshift
+import pytest
+
+from f3tch.prometheus import Prometheus
+
+
+def synthetic_values(start, end, step):
+    return [[t, str(t % 100)] for t in range(int(start), int(end) + 1, int(step))]
+
+
+class PrometheusStub(BaseHTTPRequestHandler):
+    """Local stand-in for the Prometheus HTTP API serving synthetic query_range results"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append({"path": url.path, "params": params,
+                                     "authorization": self.headers.get("Authorization"),
+                                     "client": self.client_address})
+        if url.path != "/api/v1/query_range" or params.get("start") in self.server.failing:
+            self.send_response(404)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        step = int(params["step"].rstrip("s"))
+        result = [{"metric": labels,
+                   "values": synthetic_values(params["start"], params["end"], step)}
+                  for labels in self.server.series]
+        body = json.dumps({"status": "success",
+                           "data": {"resultType": "matrix", "result": result}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def prometheus_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PrometheusStub)
+    server.requests = []
+    server.series = [{}]
+    # start parameters of the query_range requests that fail
+    server.failing = set()
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def kubeconfig(tmp_path):
+    path = tmp_path / "kubeconfig"
+    path.write_text("current-context: admin\n")
+    return str(path)
+
+
+@pytest.fixture
+def http_prometheus(prometheus_server, kubeconfig, monkeypatch):
+    """Returns a factory of Prometheus objects querying the local stand-in server"""
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    prometheus_objs = []
+
+    def factory(**kwargs):
+        prometheus_obj = Prometheus(kubeconfig=kubeconfig, prometheus_url=prometheus_server.url,
+                                    **kwargs)
+        prometheus_objs.append(prometheus_obj)
+        return prometheus_obj
+
+    yield factory
+    for prometheus_obj in prometheus_objs:
+        prometheus_obj.close()
@@ -0,0 +1,39 @@
+from benchmarks import bench_pipeline
+from benchmarks.synthetic import FakeTransport
+from f3tch import parser
+
+
+def test_fake_transport_streams_query_range():
+    fake_transport = FakeTransport(3, 100, chunk_size=1000)
+
+    with fake_transport.stream("/api/v1/query_range", {"query": "up"}) as body:
+        assert len(body.read(1 << 20)) == 1000
+        body.seek(0)
+        status, _, series = parser.parse_query_range(body)
+
+    assert status == "success"
+    assert [values.shape for _, values in series] == [(100, 2)] * 3
+    assert fake_transport.requests == [("/api/v1/query_range", {"query": "up"})]
+
+
+def test_compare_reports_regressions():
+    baselines = {"small": {"parse": {"seconds": 1.0, "peak_rss": 100},
+                           "plot": {"seconds": 0.01, "peak_rss": 100}}}
+    results = {"small": {"parse": {"seconds": 1.5, "peak_rss": 200},
+                         "plot": {"seconds": 0.03, "peak_rss": 100},
+                         "save": {"seconds": 9.0, "peak_rss": 900}}}
+
+    regressions = bench_pipeline.compare(results, baselines, threshold=0.25, rss_threshold=0.5)
+
+    # plot only regressed by 20ms, within the noise floor, and save has no baseline
+    assert len(regressions) == 2
+    assert all(regression.startswith("small/parse") for regression in regressions)
+    assert bench_pipeline.compare(results, baselines, threshold=1.0, rss_threshold=1.0) == []
+
+
+def test_run_scenario_times_every_stage():
+    results = bench_pipeline.run_scenario(2, 500, moving_window=5, output_format="csv")
+
+    assert list(results) == bench_pipeline.STAGES + ["total"]
+    assert all(result["seconds"] >= 0 and result["peak_rss"] > 0
+               for result in results.values())
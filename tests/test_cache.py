@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+
+from f3tch.cache import SeriesCache
+
+
+def make_values(start, end, step):
+    timestamps = np.arange(start, end + 1, step, dtype=float)
+    return np.column_stack([timestamps, timestamps % 100])
+
+
+def test_series_cache_round_trip(tmp_path):
+    cache = SeriesCache(directory=str(tmp_path), mutable_horizon=0)
+    key = cache.key("cluster", "up", 60, 0)
+
+    assert cache.load(key) == ([], [])
+
+    cache.store(key, held=[(0, 600)], series=[({"job": "a"}, make_values(0, 600, 60))],
+                step_size=60)
+    held, series = cache.load(key)
+
+    assert held == [(0, 600)]
+    assert series[0][0] == {"job": "a"}
+    np.testing.assert_array_equal(series[0][1], make_values(0, 600, 60))
+
+
+def test_series_cache_key_depends_on_step_grid():
+    assert SeriesCache.key("cluster", "up", 60, 0) == SeriesCache.key("cluster", "up", 60, 120)
+    assert SeriesCache.key("cluster", "up", 60, 0) != SeriesCache.key("cluster", "up", 60, 30)
+    assert SeriesCache.key("cluster", "up", 60, 0) != SeriesCache.key("cluster", "up", 30, 0)
+
+
+def test_series_cache_mutable_horizon(tmp_path):
+    cache = SeriesCache(directory=str(tmp_path), mutable_horizon=3600)
+    now = int(time.time()) // 60 * 60
+    key = cache.key("cluster", "up", 60, 0)
+
+    cache.store(key, held=[(now - 7200, now)],
+                series=[({}, make_values(now - 7200, now, 60))], step_size=60)
+    held, series = cache.load(key)
+
+    assert held[0][0] == now - 7200
+    assert held[0][1] <= now - 3600
+    assert series[0][1][-1, 0] <= now - 3600
+
+
+def test_series_cache_lru_eviction(tmp_path):
+    cache = SeriesCache(directory=str(tmp_path), mutable_horizon=0)
+    keys = [cache.key("cluster", f"m{i}", 60, 0) for i in range(3)]
+    for key in keys:
+        cache.store(key, held=[(0, 6000)], series=[({}, make_values(0, 6000, 60))],
+                    step_size=60)
+    cache.load(keys[0])
+
+    cache.max_bytes = 2 * max(path.stat().st_size for path in tmp_path.glob("*.npz"))
+    cache.store(keys[2], held=[(0, 6000)], series=[({}, make_values(0, 6000, 60))],
+                step_size=60)
+
+    assert cache.load(keys[1]) == ([], [])
+    assert cache.load(keys[0])[0] == [(0, 6000)]
+    assert cache.load(keys[2])[0] == [(0, 6000)]
+
+
+def test_get_time_series_fetches_only_gaps(tmp_path, prometheus_server, http_prometheus):
+    cache = SeriesCache(directory=str(tmp_path), mutable_horizon=0)
+    prometheus_obj = http_prometheus(series_cache=cache)
+    start = 1652904480
+
+    first = prometheus_obj.get_time_series(metric_name="up", from_timestamp=start,
+                                           to_timestamp=start + 600, step_size=60)
+    second = prometheus_obj.get_time_series(metric_name="up", from_timestamp=start,
+                                            to_timestamp=start + 1200, step_size=60)
+
+    assert len(prometheus_server.requests) == 2
+    assert prometheus_server.requests[1]["params"]["start"] == str(start + 660)
+    assert len(first) == 11
+    assert len(second) == 21
+    np.testing.assert_array_equal(second.iloc[:11].to_numpy(), first.to_numpy())
@@ -0,0 +1,84 @@
+import asyncio
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import openshift
+import pytest
+
+from f3tch import exceptions
+from f3tch.client import AsyncClient
+from f3tch.series import SeriesSet
+
+
+@pytest.fixture
+def client_factory(prometheus_server, kubeconfig, monkeypatch):
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+
+    def factory(**kwargs):
+        kwargs.setdefault("prometheus_url", prometheus_server.url)
+        return AsyncClient(kubeconfig=kubeconfig, **kwargs)
+
+    return factory
+
+
+def test_range_query_concurrently(client_factory, prometheus_server):
+    prometheus_server.series = [{"pod": "a"}, {"pod": "b"}]
+
+    async def run():
+        async with client_factory(max_concurrency=32) as client:
+            return await asyncio.gather(*[client.range_query(f"up{{i='{i}'}}", 0, 600 + i, 60)
+                                          for i in range(200)])
+
+    results = asyncio.run(run())
+
+    assert len(prometheus_server.requests) == 200
+    for i, series_set in enumerate(results):
+        assert isinstance(series_set, SeriesSet)
+        assert series_set.metric_name == f"up{{i='{i}'}}"
+        assert [series_set.labels(j) for j in range(len(series_set))] == \
+            [{"pod": "a"}, {"pod": "b"}]
+        timestamps, values = series_set.series(1)
+        np.testing.assert_array_equal(timestamps, np.arange(0, 601 + i, 60))
+        np.testing.assert_array_equal(values, timestamps % 100)
+
+
+def test_range_query_datetimes(client_factory, prometheus_server):
+    start = datetime.fromtimestamp(1652904480)
+
+    async def run():
+        client = client_factory()
+        try:
+            return await client.range_query("up", start, start + timedelta(minutes=5),
+                                            timedelta(minutes=1))
+        finally:
+            await client.close()
+
+    series_set = asyncio.run(run())
+
+    assert prometheus_server.requests[0]["params"]["step"] == "60s"
+    assert series_set.num_samples() == 6
+    assert list(series_set.to_dataframe().columns) == ["up"]
+
+
+def test_range_query_raises(client_factory, prometheus_server):
+    prometheus_server.series = []
+
+    async def run(client, expr):
+        async with client:
+            return await client.range_query(expr, 0, 600, 60)
+
+    assert len(asyncio.run(run(client_factory(), "up"))) == 0
+    with pytest.raises(exceptions.PrometheusQueryFailure):
+        asyncio.run(run(client_factory(prometheus_url=f"{prometheus_server.url}/missing"),
+                        "up"))
+
+
+def test_client_does_not_import_pandas():
+    out = subprocess.run([sys.executable, "-c",
+                          "import sys, f3tch.client, f3tch.prometheus; "
+                          "print('pandas' in sys.modules)"],
+                         capture_output=True, text=True, check=True).stdout
+
+    assert out.strip() == "False"
@@ -0,0 +1,139 @@
+import json
+import os
+import stat
+
+import numpy as np
+import openshift
+import pytest
+import yaml
+
+from f3tch import __main__, clusters, core, exceptions, export, planner, utils
+from f3tch.series import SeriesSet
+
+
+def make_metrics(names, from_timestamp=0, to_timestamp=600):
+    return [{"metric_name": name, "from_timestamp": from_timestamp,
+             "to_timestamp": to_timestamp, "step_size": 60} for name in names]
+
+
+def write_kubeconfig(path, contexts):
+    path.write_text(yaml.safe_dump({"current-context": contexts[0],
+                                    "contexts": [{"name": name, "context": {"cluster": name}}
+                                                 for name in contexts]}))
+    return str(path)
+
+
+def test_kubeconfigs_named_after_files(tmp_path):
+    paths = [str(tmp_path / "east.yaml"), str(tmp_path / "west"), str(tmp_path / "a" / "west")]
+
+    with clusters.kubeconfigs(paths) as targets:
+        assert [target.name for target in targets] == ["east", "west-1", "west-2"]
+        assert [target.kubeconfig for target in targets] == paths
+
+
+def test_kubeconfigs_of_contexts(tmp_path):
+    kubeconfig = write_kubeconfig(tmp_path / "kubeconfig", ["east", "west"])
+
+    with clusters.kubeconfigs([kubeconfig], ["west", "east"]) as targets:
+        assert [target.name for target in targets] == ["west", "east"]
+        for target in targets:
+            with open(target.kubeconfig, "r", encoding="utf8") as file:
+                assert yaml.safe_load(file)["current-context"] == target.name
+            assert stat.S_IMODE(os.stat(target.kubeconfig).st_mode) == 0o600
+    assert not any(os.path.exists(target.kubeconfig) for target in targets)
+
+    with pytest.raises(exceptions.OpenshiftConnectionFailure):
+        with clusters.kubeconfigs([kubeconfig], ["north"]):
+            pass
+    with pytest.raises(exceptions.OpenshiftConnectionFailure):
+        with clusters.kubeconfigs([kubeconfig, kubeconfig], ["east"]):
+            pass
+
+
+def test_prometheus_urls():
+    assert clusters.prometheus_urls(["east", "west"]) == [None, None]
+    assert clusters.prometheus_urls(["east"], ["http://east:9090/?a=b"]) == \
+        ["http://east:9090/?a=b"]
+    assert clusters.prometheus_urls(["east", "west"], ["west=http://west:9090"]) == \
+        [None, "http://west:9090"]
+    with pytest.raises(exceptions.OpenshiftConnectionFailure):
+        clusters.prometheus_urls(["east", "west"], ["http://east:9090"])
+    with pytest.raises(exceptions.OpenshiftConnectionFailure):
+        clusters.prometheus_urls(["east", "west"], ["east=http://a", "east=http://b"])
+
+
+def test_run_several_clusters_rejects_shared_url(kubeconfig, tmp_path, capsys):
+    paths = [str(tmp_path / "east"), str(tmp_path / "west")]
+    for path in paths:
+        with open(kubeconfig, "r", encoding="utf8") as src, open(path, "w",
+                                                                 encoding="utf8") as dst:
+            dst.write(src.read())
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps({"step_size": 60, "moving_window": 0,
+                                    "from_timestamp": "12.09.2022 14:00:00",
+                                    "to_timestamp": "12.09.2022 15:00:00",
+                                    "metric_list": [{"metric": "up"}]}))
+
+    assert __main__.main(["-k", paths[0], "-k", paths[1], "-d", str(filename),
+                          "-u", "http://localhost:9090"]) != 0
+    assert "<cluster>=<url>" in capsys.readouterr().out
+
+
+def test_merge_tags_series_with_cluster():
+    timestamps = np.arange(0, 180, 60, dtype=float)
+    series_set = SeriesSet.from_series("up", [({"pod": "p"}, np.column_stack((timestamps,
+                                                                              timestamps)))])
+
+    merged = clusters.merge("up", [("east", series_set), ("west", None), ("north", series_set)])
+
+    assert [merged.series_name(i) for i in range(len(merged))] == \
+        ['up{cluster="east"}', 'up{cluster="north"}']
+    assert clusters.merge("up", [("east", None)]) is None
+
+
+def test_fetch_clusters_isolates_cluster_failures(http_prometheus, tmp_path):
+    targets = [clusters.Cluster("east", "east"), clusters.Cluster("west", "west"),
+               clusters.Cluster("down", "down")]
+
+    def connect_function(target):
+        if target.kubeconfig == "down":
+            raise exceptions.PrometheusPodNotFound("no Prometheus pod")
+        return http_prometheus()
+
+    metrics = make_metrics(["up", "up"], from_timestamp=0, to_timestamp=600)
+    metrics[1]["from_timestamp"] = 300
+    results = core.fetch_clusters(targets, connect_function, metrics, planner.plan(metrics),
+                                  max_concurrent_queries=2)
+
+    for (time_series_df, error), metric in zip(results, metrics):
+        assert list(time_series_df.columns) == ['up{cluster="east"}', 'up{cluster="west"}']
+        assert time_series_df.index[0] == \
+            utils.timestamps_to_datetime(np.array([metric["from_timestamp"]]))[0]
+        assert isinstance(error, exceptions.ClusterFetchFailure)
+        assert "down: no Prometheus pod" in str(error)
+
+
+def test_run_several_clusters(prometheus_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    kubeconfig = write_kubeconfig(tmp_path / "kubeconfig", ["east", "west"])
+    spec = {"step_size": 60, "moving_window": 0, "from_timestamp": "12.09.2022 14:00:00",
+            "to_timestamp": "12.09.2022 15:00:00", "save_fetched_data": True,
+            "plot_fetched_data": True, "output_directory": str(tmp_path),
+            "metric_list": [{"metric": "up", "plot_filename": str(tmp_path / "up.png"),
+                             "time_slices": [{"label": "all", "color": "red",
+                                              "time_range": ["12.09.2022 14:00:00",
+                                                             "12.09.2022 15:00:00"]}]}]}
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps(spec))
+
+    exit_status = __main__.main(["-k", kubeconfig, "--context", "east", "--context", "west",
+                                 "-d", str(filename), "-u", f"east={prometheus_server.url}",
+                                 "-u", f"west={prometheus_server.url}",
+                                 "--no-cache", "--headless", "--render-workers", "1",
+                                 "--compare-clusters"])
+
+    assert exit_status == 0
+    [saved] = [name for name in os.listdir(tmp_path) if name.endswith(".csv")]
+    assert list(export.load(str(tmp_path / saved)).columns) == \
+        ['up{cluster="east"}', 'up{cluster="west"}']
+    assert os.path.exists(tmp_path / "up_clusters.png")
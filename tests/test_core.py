@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+
+import pytest
+
+import f3tch.core as core
+from f3tch import __main__
+
+
+class FakePrometheus:
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = failing
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get_time_series(self, metric_name, from_timestamp, to_timestamp, step_size):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delays[metric_name])
+        with self.lock:
+            self.in_flight -= 1
+        if metric_name in self.failing:
+            raise RuntimeError(f"{metric_name} failed")
+        return metric_name
+
+
+def make_metrics(names):
+    return [{"metric_name": name, "from_timestamp": 0, "to_timestamp": 60, "step_size": 15}
+            for name in names]
+
+
+def test_fetch_all_keeps_order():
+    prometheus_obj = FakePrometheus(delays={"a": 0.05, "b": 0.0, "c": 0.02})
+
+    results = core.fetch_all(prometheus_obj, make_metrics(["a", "b", "c"]),
+                             max_concurrent_queries=3)
+
+    assert [time_series for time_series, _ in results] == ["a", "b", "c"]
+    assert all(error is None for _, error in results)
+
+
+def test_fetch_all_limits_in_flight_queries():
+    names = [f"m{i}" for i in range(8)]
+    prometheus_obj = FakePrometheus(delays={name: 0.02 for name in names})
+
+    core.fetch_all(prometheus_obj, make_metrics(names), max_concurrent_queries=2)
+
+    assert prometheus_obj.max_in_flight <= 2
+
+
+def test_fetch_all_isolates_errors():
+    prometheus_obj = FakePrometheus(delays={"a": 0.0, "b": 0.0, "c": 0.0}, failing=("b",))
+
+    results = core.fetch_all(prometheus_obj, make_metrics(["a", "b", "c"]),
+                             max_concurrent_queries=2)
+
+    assert results[0] == ("a", None)
+    assert results[1][0] is None
+    assert isinstance(results[1][1], RuntimeError)
+    assert results[2] == ("c", None)
+
+
+def test_run_creates_no_renderer_when_connection_fails(kubeconfig, monkeypatch, tmp_path,
+                                                        capsys):
+    created = []
+
+    def connect(*args, **kwargs):
+        raise core.exceptions.PrometheusPodNotFound("no Prometheus pod")
+
+    monkeypatch.setattr(core, "connect", connect)
+    monkeypatch.setattr(core, "PoolRenderer", lambda **kwargs: created.append(kwargs))
+    monkeypatch.setattr(core, "Renderer", lambda **kwargs: created.append(kwargs))
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps({"step_size": 60, "moving_window": 0,
+                                    "from_timestamp": "12.09.2022 14:00:00",
+                                    "to_timestamp": "12.09.2022 15:00:00",
+                                    "metric_list": [{"metric": "up"}]}))
+
+    for extra in ([], ["--stream-memory", "1"]):
+        assert __main__.main(["-k", kubeconfig, "-d", str(filename), "--headless"] +
+                             extra) != 0
+        assert "no Prometheus pod" in capsys.readouterr().out
+    assert created == []
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from f3tch import decimate, exceptions
+
+
+def make_signal(num_samples=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(num_samples, dtype=np.float64) * 15
+    y = np.sin(np.arange(num_samples) / 500.0) + rng.normal(0, 0.1, num_samples)
+    return x, y
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_decimate_respects_point_budget(method):
+    x, y = make_signal()
+
+    idx = decimate.decimate_indices(x, y, 1000, method)
+
+    assert len(idx) <= 1000
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert (np.diff(idx) > 0).all()
+
+
+def test_minmax_keeps_extremes():
+    x, y = make_signal()
+    y[12345] = 10.0
+    y[54321] = -10.0
+
+    idx = decimate.decimate_indices(x, y, 500, "minmax")
+
+    assert 12345 in idx and 54321 in idx
+
+
+def test_lttb_keeps_spikes():
+    x, y = make_signal()
+    y[12345] = 10.0
+
+    idx = decimate.decimate_indices(x, y, 500, "lttb")
+
+    assert 12345 in idx
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_decimate_keeps_gaps(method):
+    x, y = make_signal()
+    y[:100] = np.nan
+    y[50000:50100] = np.nan
+
+    idx = decimate.decimate_indices(x, y, 1000, method)
+
+    assert 50000 in idx
+    assert np.isfinite(y[idx]).sum() <= 1000
+
+
+def test_decimate_small_or_disabled():
+    x, y = make_signal(num_samples=50)
+
+    assert len(decimate.decimate_indices(x, y, 100)) == 50
+    assert len(decimate.decimate_indices(*make_signal(), 0)) == 100000
+    assert len(decimate.decimate_indices(*make_signal(), 10, "none")) == 100000
+
+
+def test_unknown_method():
+    with pytest.raises(exceptions.UnsupportedDecimation):
+        decimate.decimate_indices(*make_signal(), 10, "average")
+
+
+def test_streaming_minmax_matches_minmax():
+    x, y = make_signal()
+    y[50000:50100] = np.nan
+
+    streaming = decimate.StreamingMinMax(x[0], x[-1], 1000, width=1, head=5)
+    for start in range(0, len(x), 7000):
+        stop = start + 7000
+        streaming.append(x[start:stop], y[start:stop], y[start:stop, np.newaxis] * 2)
+    rows = streaming.result()
+
+    idx = decimate.minmax_indices(y, 1000)
+    assert len(rows) <= 1000 + 5 + 1
+    assert np.isin([0, 1, 4, len(x) - 1, 50000, np.nanargmax(y), np.nanargmin(y)],
+                   (rows[:, 0] / 15).astype(int)).all()
+    assert np.isin(x[idx], rows[:, 0]).mean() > 0.95
+    np.testing.assert_array_equal(rows[:, 2], rows[:, 1] * 2)
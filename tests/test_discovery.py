@@ -0,0 +1,116 @@
+import json
+
+import openshift
+import pytest
+import yaml
+
+from f3tch import clusters, discovery, exceptions
+from f3tch.prometheus import Prometheus
+
+
+class FakePod:
+    def __init__(self, fqname):
+        self._fqname = fqname
+
+    def fqname(self):
+        return self._fqname
+
+
+def test_parse_fqname():
+    assert discovery.parse_fqname("openshift-monitoring:pod/prometheus-k8s-0") == \
+        ("openshift-monitoring", "pod/prometheus-k8s-0")
+    assert discovery.parse_fqname("pod/prometheus-k8s-0") == (None, "pod/prometheus-k8s-0")
+
+
+def test_parse_label_selector():
+    assert discovery.parse_label_selector("app.kubernetes.io/name=prometheus, prometheus=k8s") == \
+        {"app.kubernetes.io/name": "prometheus", "prometheus": "k8s"}
+
+
+def test_discovery_cache(tmp_path, kubeconfig):
+    cache = discovery.DiscoveryCache(filename=str(tmp_path / "cache" / "discovery.json"), ttl=60)
+    key = cache.key(kubeconfig, discovery.DEFAULT_PROMETHEUS_FQNAME)
+
+    assert "|admin|" in key
+    assert cache.get(key) is None
+
+    cache.put(key, fqname="ns:pod/p-0", server_version="4.11.0")
+    assert cache.get(key)["fqname"] == "ns:pod/p-0"
+
+    cache.invalidate(key)
+    assert cache.get(key) is None
+
+    cache.put(key, fqname="ns:pod/p-0", server_version="4.11.0")
+    cache.ttl = -1
+    assert cache.get(key) is None
+
+
+def test_discovery_cache_keys_context_copies_on_origin(tmp_path):
+    kubeconfig = tmp_path / "kubeconfig"
+    kubeconfig.write_text(yaml.safe_dump({"current-context": "east",
+                                          "contexts": [{"name": "east"}, {"name": "west"}]}))
+    cache = discovery.DiscoveryCache(filename=str(tmp_path / "discovery.json"), ttl=60)
+
+    keys = []
+    for _ in range(2):
+        with clusters.kubeconfigs([str(kubeconfig)], ["west"]) as [target]:
+            keys.append(cache.key(target.kubeconfig, "lookup", target.origin))
+    assert keys[0] == keys[1] == cache.key(str(kubeconfig), "lookup").replace("|east|", "|west|")
+
+    # expired entries are dropped whenever an entry is stored
+    cache.put("old", fqname="ns:pod/p-0", server_version="4.11.0")
+    cache.ttl = -1
+    cache.put(keys[0], fqname="ns:pod/p-0", server_version="4.11.0")
+    with open(cache.filename, "r", encoding="utf8") as file:
+        assert list(json.load(file)) == [keys[0]]
+
+
+def test_prometheus_uses_discovery_cache(tmp_path, kubeconfig, monkeypatch):
+    calls = {"server_version": 0, "get_pod": []}
+
+    def get_server_version():
+        calls["server_version"] += 1
+        return "4.11.0"
+
+    def get_pod(fqname):
+        calls["get_pod"].append(fqname)
+        return FakePod(fqname)
+
+    monkeypatch.setattr(openshift, "get_server_version", get_server_version)
+    monkeypatch.setattr(discovery, "get_pod", get_pod)
+    cache = discovery.DiscoveryCache(filename=str(tmp_path / "discovery.json"), ttl=60)
+
+    Prometheus(kubeconfig=kubeconfig, discovery_cache=cache)
+    prometheus_obj = Prometheus(kubeconfig=kubeconfig, discovery_cache=cache)
+
+    assert calls["server_version"] == 1
+    assert calls["get_pod"] == [discovery.DEFAULT_PROMETHEUS_FQNAME] * 2
+    assert prometheus_obj.server_version == "4.11.0"
+
+
+def test_prometheus_pod_not_found(tmp_path, kubeconfig, monkeypatch):
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    monkeypatch.setattr(discovery, "get_pod", lambda fqname: None)
+    cache = discovery.DiscoveryCache(filename=str(tmp_path / "discovery.json"), ttl=60)
+
+    with pytest.raises(exceptions.PrometheusPodNotFound):
+        Prometheus(kubeconfig=kubeconfig, discovery_cache=cache)
+    assert cache.get(cache.key(kubeconfig, discovery.DEFAULT_PROMETHEUS_FQNAME)) is None
+
+
+def test_prometheus_selector_defaults_to_pod_namespace(kubeconfig, monkeypatch):
+    found = []
+
+    def find_pod(namespace, label_selector):
+        found.append((namespace, label_selector))
+        return FakePod(f"{namespace}:pod/prometheus-0")
+
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    monkeypatch.setattr(discovery, "find_pod", find_pod)
+
+    Prometheus(kubeconfig=kubeconfig, prometheus_selector="app=prometheus")
+    Prometheus(kubeconfig=kubeconfig, prometheus_fqname="monitoring:pod/prometheus-0",
+               prometheus_selector="app=prometheus")
+
+    assert found == [("openshift-monitoring", "app=prometheus"),
+                     ("monitoring", "app=prometheus")]
@@ -0,0 +1,123 @@
+import json
+import os
+
+import numpy as np
+import openshift
+import pandas as pd
+import pytest
+
+from f3tch import __main__, exceptions, export
+from f3tch.series import SeriesSet
+
+
+def make_frame(offset=0):
+    timestamps = np.arange(1652904480, 1652905080, 60, dtype=float)
+    return SeriesSet.from_series("cpu", [
+        ({"namespace": "a"}, np.column_stack([timestamps, timestamps % 7 + offset])),
+        ({"namespace": "b"}, np.column_stack([timestamps, timestamps % 5 + offset]))
+    ]).to_dataframe()
+
+
+@pytest.mark.parametrize("output_format", list(export.FORMATS))
+@pytest.mark.parametrize("compression", [None, "none"])
+def test_save_and_load(tmp_path, output_format, compression):
+    time_series_df = make_frame()
+
+    filename = export.save(time_series_df, str(tmp_path / "cpu"), output_format=output_format,
+                           compression=compression)
+
+    pd.testing.assert_frame_equal(export.load(filename), time_series_df, check_freq=False)
+
+
+def test_check_format():
+    assert export.check_format("parquet") == "snappy"
+    assert export.check_format("csv", "gzip") == "gzip"
+    assert export.check_format("npz", "none") is None
+    with pytest.raises(exceptions.UnsupportedOutputFormat):
+        export.check_format("xlsx")
+    with pytest.raises(exceptions.UnsupportedOutputFormat):
+        export.check_format("feather", "gzip")
+
+
+def test_csv_compression_extension(tmp_path):
+    filename = export.save(make_frame(), str(tmp_path / "cpu"), compression="gzip")
+
+    assert filename.endswith(".csv.gz")
+    pd.testing.assert_frame_equal(export.load(filename), make_frame(), check_freq=False)
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "npz"])
+def test_dataset_round_trip(tmp_path, output_format):
+    frames = [('sum by (namespace) (cpu{job="x"})', make_frame()), ("memory/bytes", make_frame(1))]
+
+    export.save_dataset(frames, str(tmp_path / "run"), output_format=output_format)
+    loaded = export.load_run(str(tmp_path / "run"))
+
+    assert sorted(loaded) == sorted(name for name, _ in frames)
+    for name, time_series_df in frames:
+        pd.testing.assert_frame_equal(loaded[name], time_series_df, check_freq=False)
+
+
+def test_dataset_rejects_repeated_metrics(tmp_path, kubeconfig, capsys):
+    with pytest.raises(exceptions.UnsupportedOutputFormat):
+        export.save_dataset([("cpu", make_frame()), ("cpu", make_frame(1))],
+                            str(tmp_path / "run"))
+    assert not os.path.exists(tmp_path / "run")
+
+    # the same expression over two time ranges is rejected before anything is fetched
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps({"step_size": 60, "moving_window": 0,
+                                    "from_timestamp": "12.09.2022 14:00:00",
+                                    "to_timestamp": "12.09.2022 15:00:00",
+                                    "save_fetched_data": True, "output_dataset": True,
+                                    "metric_list": [{"metric": "up"},
+                                                    {"metric": "up",
+                                                     "from_timestamp": "12.09.2022 15:00:00",
+                                                     "to_timestamp": "12.09.2022 16:00:00"}]}))
+    assert __main__.main(["-k", kubeconfig, "-d", str(filename),
+                          "-o", str(tmp_path / "out")]) != 0
+    assert "cannot be saved into one dataset: ['up']" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("output_format,compression",
+                         [("csv", None), ("csv", "gzip"), ("parquet", None), ("feather", None)])
+def test_append_writer(tmp_path, output_format, compression):
+    time_series_df = make_frame()
+
+    writer = export.AppendWriter(str(tmp_path / "cpu"), output_format, compression)
+    for start in range(0, len(time_series_df), 3):
+        writer.append(time_series_df.iloc[start:start + 3])
+    filename = writer.close()
+
+    pd.testing.assert_frame_equal(export.load(filename), time_series_df, check_freq=False)
+    assert export.AppendWriter(str(tmp_path / "empty")).close() is None
+    with pytest.raises(exceptions.UnsupportedOutputFormat):
+        export.AppendWriter(str(tmp_path / "cpu"), "npz")
+
+
+def test_run_creates_output_directory(prometheus_server, kubeconfig, monkeypatch, tmp_path,
+                                      capsys):
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps({"step_size": 60, "moving_window": 0,
+                                    "from_timestamp": "12.09.2022 14:00:00",
+                                    "to_timestamp": "12.09.2022 15:00:00",
+                                    "save_fetched_data": True,
+                                    "metric_list": [{
+                                        "metric": "up", "plot_filename": str(tmp_path / "up.png"),
+                                        "time_slices": [{"label": "all", "color": "red",
+                                                         "time_range": ["12.09.2022 14:00:00",
+                                                                        "12.09.2022 15:00:00"]}]
+                                    }]}))
+    common = ["-k", kubeconfig, "-u", prometheus_server.url, "-d", str(filename), "--no-cache",
+              "--headless", "--render-workers", "1"]
+
+    assert __main__.main(common + ["-o", str(tmp_path / "out" / "run")]) == 0
+    assert [name.endswith(".csv") for name in os.listdir(tmp_path / "out" / "run")] == [True]
+
+    # a directory that cannot be created is reported before anything is fetched
+    (tmp_path / "file").write_text("")
+    requests = len(prometheus_server.requests)
+    assert __main__.main(common + ["-o", str(tmp_path / "file" / "run")]) != 0
+    assert "unable to create the output directory" in capsys.readouterr().out
+    assert len(prometheus_server.requests) == requests
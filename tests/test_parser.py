@@ -0,0 +1,64 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from f3tch import parser
+
+RESPONSE = {"status": "success", "data": {"resultType": "matrix", "result": [
+    {"metric": {"namespace": 'tricky]] "values":[', "pod": "a"},
+     "values": [[1652904485, "1.5"], [1652904500.25, "NaN"], [1652904515, "+Inf"]]},
+    {"metric": {}, "values": []},
+    {"metric": {"pod": "b"}, "values": [[1652904485, "-2e-3"]]}]}}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, parser.DEFAULT_CHUNK_SIZE])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_parse_query_range(chunk_size, indent):
+    body = io.BytesIO(json.dumps(RESPONSE, indent=indent).encode())
+
+    status, error, series = parser.parse_query_range(body, chunk_size=chunk_size)
+
+    assert status == "success"
+    assert error is None
+    assert len(series) == 3
+    for (labels, values), expected in zip(series, RESPONSE["data"]["result"]):
+        assert labels == expected["metric"]
+        np.testing.assert_array_equal(values,
+                                      np.array(expected["values"], dtype=float).reshape(-1, 2))
+
+
+def test_parse_query_range_error():
+    body = io.BytesIO(json.dumps({"status": "error", "errorType": "bad_data",
+                                  "error": "1:5: parse error"}).encode())
+
+    assert parser.parse_query_range(body, chunk_size=5) == ("error", "1:5: parse error", [])
+
+
+def test_parse_query_range_truncated():
+    body = io.BytesIO(json.dumps(RESPONSE).encode()[:80])
+
+    with pytest.raises(ValueError):
+        parser.parse_query_range(body)
+
+
+def test_growable_buffer():
+    buffer = parser.GrowableBuffer(capacity=2)
+    for i in range(1000):
+        buffer.append(np.array([[i, -i]], dtype=float))
+
+    assert buffer.size == 1000
+    np.testing.assert_array_equal(buffer.view(998, 1000), [[998, -998], [999, -999]])
+
+
+def test_growable_buffer_discard():
+    buffer = parser.GrowableBuffer(capacity=1024)
+    for i in range(10000):
+        buffer.append(np.array([[i, -i]], dtype=float))
+        buffer.discard(buffer.size - 100)
+
+    # the trailing window is kept without growing the buffer
+    assert buffer.size == 100
+    assert len(buffer.data) == 1024
+    np.testing.assert_array_equal(buffer.view(0, 100)[:, 0], np.arange(9900, 10000))
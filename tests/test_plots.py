@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from matplotlib import pyplot
+
+import f3tch.core as core
+from f3tch import plots
+from f3tch.render import PoolRenderer, Renderer
+
+
+def make_time_series(name="cpu", num_samples=200):
+    index = pd.date_range("2022-09-01 00:00", periods=num_samples, freq="15s", name="timestamp")
+    return pd.DataFrame({name: np.sin(np.arange(num_samples) / 10.0)}, index=index)
+
+
+def make_metric(plot_filename):
+    return {"metric_name": "cpu", "from_timestamp": 0, "to_timestamp": 60, "step_size": 15,
+            "moving_window": 5, "plot_color": "blue", "plot_title": "CPU",
+            "plot_filename": plot_filename,
+            "time_slices": [{"label": "slice", "color": "green",
+                             "time_range": ["01.09.2022 00:10:00", "01.09.2022 00:20:00"]}],
+            "plot_time_slices_overlaid": True,
+            "plot_time_slices_discontiguous": {"spacing_between_slices": 5}}
+
+
+def test_headless_plot_does_not_use_pyplot(tmp_path):
+    pyplot.close("all")
+    filename = tmp_path / "cpu.png"
+
+    plots.plot_timeseries(make_time_series(), "cpu", moving_avg_window_size=5,
+                          plot_minmax=True, plot_filename=str(filename), headless=True)
+
+    assert filename.stat().st_size > 0
+    assert pyplot.get_fignums() == []
+
+
+def test_pool_renderer_saves_all_plots(tmp_path):
+    renderer = PoolRenderer(workers=2)
+    for name in ["a", "b"]:
+        core.process(make_metric(str(tmp_path / f"{name}.png")), make_time_series(),
+                     save_data=False, plot_data=True, renderer=renderer)
+
+    assert renderer.close() == []
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "a.png", "a_discontiguous.png", "a_overlaid.png",
+        "b.png", "b_discontiguous.png", "b_overlaid.png"]
+
+
+def test_pool_renderer_reports_errors(tmp_path):
+    renderer = PoolRenderer(workers=1)
+    renderer.submit("plot_timeseries", time_series=make_time_series(), metric_name="missing",
+                    plot_filename=str(tmp_path / "missing.png"))
+
+    errors = renderer.close()
+
+    assert len(errors) == 1 and isinstance(errors[0], AssertionError)
+
+
+def test_headless_renderer_skips_show(monkeypatch, tmp_path):
+    monkeypatch.setattr(pyplot, "show", lambda: (_ for _ in ()).throw(AssertionError))
+    renderer = Renderer(headless=True)
+    renderer.submit("plot_timeseries", time_series=make_time_series(), metric_name="cpu",
+                    plot_filename=str(tmp_path / "cpu.png"))
+
+    assert renderer.close() == []
+    assert (tmp_path / "cpu.png").exists()
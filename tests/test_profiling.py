@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from f3tch import profiling
+
+
+@pytest.fixture
+def profiler():
+    profiler = profiling.enable()
+    yield profiler
+    profiling.disable()
+
+
+def test_spans_are_not_recorded_when_disabled():
+    with profiling.span("stage", samples=3) as counters:
+        counters["bytes"] = 10
+
+    assert profiling.get_profiler() is None
+
+
+def test_spans_and_counters(profiler):
+    @profiling.profiled("inner")
+    def inner():
+        return 42
+
+    with profiling.span("outer", samples=3) as counters:
+        assert inner() == 42
+        assert inner() == 42
+        counters["bytes"] = 10
+
+    stages = profiler.stages()
+    assert list(stages) == ["outer", "inner"]
+    assert stages["inner"]["calls"] == 2
+    assert (stages["outer"]["samples"], stages["outer"]["bytes"]) == (3, 10)
+    assert stages["outer"]["seconds"] >= stages["inner"]["seconds"]
+    assert profiler.summary().splitlines()[1].startswith("outer")
+
+
+def test_trace_and_prometheus_text(profiler, tmp_path):
+    with profiling.span("core.save", samples=5):
+        pass
+    filename = tmp_path / "trace.json"
+
+    profiler.write_trace(str(filename))
+    text = profiler.to_prometheus_text()
+
+    trace = json.loads(filename.read_text())
+    assert trace["traceEvents"][0]["name"] == "core.save"
+    assert trace["traceEvents"][0]["ph"] == "X"
+    assert 'f3tch_stage_samples_total{stage="core.save"} 5' in text
+    assert "# TYPE f3tch_stage_seconds_total counter" in text
+
+
+def test_query_range_bytes_and_samples(profiler, http_prometheus):
+    prometheus_obj = http_prometheus(max_points_per_request=50)
+
+    prometheus_obj.get_time_series("up", 0, 1485, 15)
+
+    stages = profiler.stages()
+    assert stages["Prometheus.query_range"]["calls"] == 2
+    assert stages["Prometheus.query_range"]["samples"] == 100
+    assert stages["Prometheus.query_range"]["bytes"] > 0
+    assert stages["Prometheus.get_time_series"]["samples"] == 100
+    assert "SeriesSet.to_dataframe" in stages
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from f3tch import exceptions, pushdown
+from f3tch.query_object import Query
+
+
+def make_metric(**kwargs):
+    metric = {"metric_name": "pod:container_cpu_usage:sum", "from_timestamp": 1000,
+              "to_timestamp": 9000, "step_size": 60, "moving_window": 120}
+    metric.update(kwargs)
+    return metric
+
+
+def test_rewrite_over_time_aligned_to_step():
+    rewritten = pushdown.rewrite(make_metric(), {"over_time": "avg"})
+
+    assert rewritten["metric_name"] == \
+        "avg_over_time((pod:container_cpu_usage:sum)[7200s:60s])"
+    assert rewritten["step_size"] == 7200
+    assert (rewritten["from_timestamp"], rewritten["to_timestamp"]) == (0, 14400)
+    assert rewritten["moving_window"] == 0
+
+
+def test_rewrite_aggregation_by_labels_and_quantile():
+    rewritten = pushdown.rewrite(make_metric(), {
+        "by": ["namespace", "pod"], "over_time": "quantile", "quantile": 0.95,
+        "window": 290, "step": 600})
+
+    assert rewritten["metric_name"] == "quantile_over_time(0.95, (sum by (namespace, pod) " \
+        "(pod:container_cpu_usage:sum))[300s:60s])"
+    assert rewritten["step_size"] == 600
+
+
+def test_rewrite_aggregation_only_keeps_step():
+    rewritten = pushdown.rewrite(make_metric(), {"aggregate": "max"})
+
+    assert rewritten["metric_name"] == "max(pod:container_cpu_usage:sum)"
+    assert rewritten["step_size"] == 60
+    assert rewritten["moving_window"] == 120
+
+
+def test_rewrite_durations_and_single_label():
+    rewritten = pushdown.rewrite(make_metric(), {"by": "namespace", "over_time": "avg",
+                                                 "window": "1h30m", "step": "10m"})
+
+    assert rewritten["metric_name"] == "avg_over_time((sum by (namespace) " \
+        "(pod:container_cpu_usage:sum))[5400s:60s])"
+    assert rewritten["step_size"] == 600
+
+
+@pytest.mark.parametrize("aggregation", [{"over_time": "median"}, {"aggregate": "topk"},
+                                         {"over_time": "quantile"},
+                                         {"over_time": "avg", "window": 0},
+                                         {"over_time": "avg", "window": "5 minutes"},
+                                         {"over_time": "avg", "step": [60]},
+                                         {"over_time": "quantile", "quantile": "high"},
+                                         {"by": {"namespace": 1}}])
+def test_rewrite_invalid(aggregation):
+    with pytest.raises(exceptions.InvalidQueryFileFormat):
+        pushdown.rewrite(make_metric(), aggregation)
+
+
+def test_query_applies_aggregation(tmp_path):
+    spec = {"step_size": 60, "moving_window": 10, "from_timestamp": "12.09.2022 14:00:00",
+            "to_timestamp": "12.09.2022 17:00:00", "aggregation": {"over_time": "max"},
+            "metric_list": [{"metric": "a"}, {"metric": "b", "aggregation": None}]}
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps(spec))
+
+    metrics = Query(filename=str(filename)).get_metrics()
+
+    assert metrics[0]["metric_name"] == "max_over_time((a)[600s:60s])"
+    assert metrics[1]["metric_name"] == "b"
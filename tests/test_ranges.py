@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from f3tch import exceptions
+
+import f3tch.ranges as ranges
+
+
+def test_num_points():
+    assert ranges.num_points(0, 600, 60) == 11
+    assert ranges.num_points(0, 599, 60) == 10
+    assert ranges.num_points(600, 0, 60) == 0
+
+
+def test_split_range_single():
+    assert ranges.split_range(0, 600, 60, max_points=11) == [(0, 600)]
+
+
+def test_split_range_step_aligned():
+    sub_ranges = ranges.split_range(10, 1000, 60, max_points=5)
+
+    assert sub_ranges[0] == (10, 250)
+    assert sub_ranges[-1][1] == 1000
+    evaluated = [t for start, end in sub_ranges for t in range(start, end + 1, 60)]
+    assert evaluated == list(range(10, 1001, 60))
+    assert all(ranges.num_points(start, end, 60) <= 5 for start, end in sub_ranges)
+
+
+def test_stitch():
+    parts = [np.array([[120., 3.], [180., 4.]]),
+             np.empty((0, 2)),
+             np.array([[0., 1.], [60., 2.], [120., 30.]])]
+
+    actual = ranges.stitch(parts)
+    expected = np.array([[0., 1.], [60., 2.], [120., 3.], [180., 4.]])
+
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_get_time_series_splits_long_windows(prometheus_server, http_prometheus):
+    prometheus_server.series = [{"instance": "a"}]
+    prometheus_obj = http_prometheus(max_points_per_request=100, chunk_concurrency=3)
+
+    time_series = prometheus_obj.get_time_series(metric_name="up", from_timestamp=1652904485,
+                                                 to_timestamp=1652904485 + 999 * 15,
+                                                 step_size=15)
+
+    assert len(prometheus_server.requests) == 10
+    assert len(time_series) == 1000
+    assert time_series.index.is_monotonic_increasing
+    assert time_series.index.is_unique
+
+
+def test_get_series_set_fails_on_missing_sub_range(prometheus_server, http_prometheus, capsys):
+    prometheus_obj = http_prometheus(max_points_per_request=100, chunk_concurrency=3)
+    prometheus_server.failing = {str(1652904485 + 300 * 15)}
+
+    with pytest.raises(exceptions.PrometheusQueryFailure, match=str(1652904485 + 300 * 15)):
+        prometheus_obj.get_series_set(metric_name="up", from_timestamp=1652904485,
+                                      to_timestamp=1652904485 + 999 * 15, step_size=15)
+    assert len(prometheus_server.requests) == 10
+    # the failure is only reported by the caller
+    assert "Failed to retrieve" not in capsys.readouterr().out
+
+
+def test_merge_ranges():
+    assert ranges.merge_ranges([(120, 180), (0, 60), (240, 300), (500, 600)], 60) == \
+        [(0, 300), (500, 600)]
+
+
+def test_subtract_ranges():
+    assert ranges.subtract_ranges(0, 600, [], 60) == [(0, 600)]
+    assert ranges.subtract_ranges(0, 600, [(0, 600)], 60) == []
+    assert ranges.subtract_ranges(0, 600, [(120, 240), (360, 420)], 60) == \
+        [(0, 60), (300, 300), (480, 600)]
+
+
+def test_within_ranges():
+    timestamps = np.array([0., 60., 120., 180., 240.])
+
+    actual = ranges.within_ranges(timestamps, [(60, 120), (240, 300)])
+
+    np.testing.assert_array_equal(actual, [False, True, True, False, True])
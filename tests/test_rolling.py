@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from f3tch import rolling
+
+
+def make_values(num_samples=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 1e6 + rng.normal(0, 1, num_samples)
+    values[5000:5003] = np.nan
+    return values
+
+
+@pytest.mark.filterwarnings("ignore:Degrees of freedom", "ignore:invalid value")
+@pytest.mark.parametrize("window", [1, 2, 120])
+def test_rolling_stats_match_pandas(window):
+    values = make_values()
+    expected = pd.Series(values).rolling(window=window)
+
+    stats = rolling.RollingStats(window, quantiles=[0.5, 0.9]).append(values)
+
+    np.testing.assert_allclose(stats.mean, expected.mean(), rtol=1e-12)
+    # two-pass reference, Pandas loses precision on large values with small variance
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    std = np.concatenate((np.full(window - 1, np.nan), windows.std(axis=1, ddof=1)))
+    np.testing.assert_allclose(stats.std, std, rtol=1e-6, atol=1e-8)
+    np.testing.assert_array_equal(stats.min, expected.min())
+    np.testing.assert_array_equal(stats.max, expected.max())
+    np.testing.assert_allclose(stats.quantile(0.9), expected.quantile(0.9), rtol=1e-12)
+
+
+def test_rolling_stats_append_incrementally():
+    values = make_values()
+    expected = rolling.RollingStats(120, quantiles=[0.5]).append(values)
+
+    stats = rolling.RollingStats(120, quantiles=[0.5])
+    for chunk in np.array_split(values, 97):
+        stats.append(chunk)
+
+    assert len(stats) == len(values)
+    np.testing.assert_allclose(stats.buffer.view(0, len(stats)),
+                               expected.buffer.view(0, len(expected)), rtol=1e-9)
+
+
+def test_compute_rolling_stats_to_dataframe():
+    index = pd.date_range("2022-09-01", periods=100, freq="15s", name="timestamp")
+    time_series_df = pd.DataFrame({"a": np.arange(100.0), "b": np.arange(100.0) * 2},
+                                  index=index)
+
+    stats = rolling.compute_rolling_stats(time_series_df, 10, quantiles=[0.5])
+    stats_df = rolling.stats_to_dataframe(stats, index)
+
+    assert list(stats_df.columns) == [
+        "moving_avg_a", "moving_stdev_a", "moving_min_a", "moving_max_a", "moving_q0.5_a",
+        "moving_avg_b", "moving_stdev_b", "moving_min_b", "moving_max_b", "moving_q0.5_b"]
+    assert stats_df["moving_max_b"].iloc[-1] == 198.0
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import f3tch.timeseries as timeseries
+from f3tch.series import SeriesSet
+
+
+def make_values(start, end, step, offset=0):
+    timestamps = np.arange(start, end + 1, step, dtype=float)
+    return np.column_stack([timestamps, timestamps % 100 + offset])
+
+
+def make_series_set():
+    return SeriesSet.from_series("cpu", [
+        ({"namespace": "a", "job": "kubelet"}, make_values(0, 120, 60)),
+        ({"namespace": "b", "job": "kubelet"}, make_values(60, 180, 60, offset=1)),
+        ({"namespace": "a"}, make_values(0, 60, 60, offset=2))])
+
+
+def test_from_series_encodes_labels():
+    series_set = make_series_set()
+
+    assert len(series_set) == 3
+    assert series_set.num_samples() == 8
+    assert series_set.label_names == ["job", "namespace"]
+    assert series_set.label_values == {"job": ["kubelet"], "namespace": ["a", "b"]}
+    np.testing.assert_array_equal(series_set.label_codes, [[0, 0], [0, 1], [-1, 0]])
+    assert series_set.labels(1) == {"job": "kubelet", "namespace": "b"}
+    assert series_set.labels(2) == {"namespace": "a"}
+
+
+def test_series_are_views():
+    series_set = make_series_set()
+
+    timestamps, values = series_set.series(1)
+
+    np.testing.assert_array_equal(timestamps, [60, 120, 180])
+    np.testing.assert_array_equal(values, [61, 21, 81])
+    assert np.shares_memory(values, series_set.values)
+
+
+def test_series_name():
+    series_set = make_series_set()
+
+    assert series_set.series_name(0) == 'cpu{job="kubelet",namespace="a"}'
+    assert series_set.series_name(2) == 'cpu{namespace="a"}'
+    single = SeriesSet.from_series("cpu", [({"job": "x"}, make_values(0, 60, 60))])
+    assert single.series_name(0) == "cpu"
+
+
+def test_to_long():
+    long_df = make_series_set().to_long()
+
+    assert list(long_df.columns) == ["job", "namespace", "value"]
+    assert isinstance(long_df["namespace"].dtype, pd.CategoricalDtype)
+    assert long_df["namespace"].tolist() == ["a"] * 3 + ["b"] * 3 + ["a"] * 2
+    assert long_df["job"].isna().sum() == 2
+
+
+def test_to_wide():
+    wide_df = make_series_set().to_wide()
+
+    assert wide_df.columns.names == ["job", "namespace"]
+    assert wide_df.shape == (4, 3)
+    assert np.isnan(wide_df[("kubelet", "b")].iloc[0])
+    assert wide_df[("kubelet", "b")].iloc[1] == 61
+
+
+def test_to_dataframe_single_series():
+    values = make_values(1652904480, 1652905080, 60)
+    series_set = SeriesSet.from_series("cpu", [({"job": "x"}, values)])
+
+    assert series_set.to_dataframe().equals(timeseries.array_to_dataframe(values, "cpu"))
+
+
+def test_get_time_series_keeps_series_apart(prometheus_server, http_prometheus):
+    prometheus_server.series = [{"namespace": "a"}, {"namespace": "b"}]
+    prometheus_obj = http_prometheus()
+
+    time_series = prometheus_obj.get_time_series(metric_name="cpu", from_timestamp=1652904480,
+                                                 to_timestamp=1652905080, step_size=60)
+
+    assert list(time_series.columns) == ['cpu{namespace="a"}', 'cpu{namespace="b"}']
+    assert len(time_series) == 11
+
+
+def test_to_grid_matches_dataframe():
+    series_set = make_series_set()
+
+    grid = series_set.to_grid(60)
+
+    assert (len(grid), grid.count, grid.start, grid.step) == (3, 4, 0.0, 60.0)
+    np.testing.assert_array_equal(grid.mask, [[True, True, True, False],
+                                              [False, True, True, True],
+                                              [True, True, False, False]])
+    time_series_df = grid.to_dataframe()
+    pd.testing.assert_frame_equal(time_series_df, series_set.to_dataframe())
+    # the columns of the DataFrame are views into the grid
+    assert np.shares_memory(time_series_df.iloc[:, 1].to_numpy(), grid.values)
+
+
+def test_to_grid_float32_memmap_and_gaps(tmp_path):
+    series_set = SeriesSet.from_series("cpu", [({}, make_values(0, 60, 60)),
+                                               ({}, make_values(240, 300, 60))])
+
+    grid = series_set.to_grid(60, dtype=np.float32, directory=str(tmp_path))
+
+    assert isinstance(grid.values, np.memmap)
+    assert grid.values.dtype == np.float32
+    assert grid.nbytes == 2 * 6 * 5
+    assert list(tmp_path.iterdir()) == []
+    values, mask = grid.series(1)
+    assert mask.tolist() == [False] * 4 + [True] * 2
+    # grid points without any sample are left out, as in SeriesSet.to_dataframe
+    time_series_df = grid.to_dataframe()
+    assert len(time_series_df) == 4
+    pd.testing.assert_frame_equal(time_series_df.astype(np.float64),
+                                  series_set.to_dataframe())
+    # keeping every grid point keeps the columns memory-mapped
+    time_series_df = grid.to_dataframe(keep_gaps=True)
+    assert len(time_series_df) == 6
+    assert time_series_df.iloc[2].isna().all()
+    assert np.shares_memory(time_series_df.iloc[:, 1].to_numpy(), grid.values)
+
+
+def test_to_grid_rejects_irregular_samples():
+    series_set = SeriesSet.from_series("cpu", [({}, np.array([[0., 1.], [60., 2.], [90., 3.]]))])
+
+    with pytest.raises(ValueError):
+        series_set.to_grid(60)
+    assert SeriesSet.from_series("cpu", []).to_grid(60) is None
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from f3tch import utils
+from f3tch.slices import TimeSliceIndex, parse_time_slices
+
+TIME_SLICES = [{"label": "late", "color": "red",
+                "time_range": ["01.09.2022 02:00:00", "01.09.2022 02:30:00"]},
+               {"label": "early", "color": "green",
+                "time_range": ["01.09.2022 00:10:00", "01.09.2022 00:20:07"]},
+               {"label": "outside", "color": "blue",
+                "time_range": ["02.10.2022 00:00:00", "03.10.2022 00:00:00"]}]
+
+
+def make_time_series(num_samples=1000):
+    start = utils.strtime_to_timestamp("01.09.2022 00:00:00")
+    timestamps = start + 15 * np.arange(num_samples)
+    index = utils.timestamps_to_datetime(timestamps).rename("timestamp")
+    return pd.Series(np.arange(num_samples, dtype=float), index=index)
+
+
+def test_parse_time_slices_is_idempotent():
+    parsed = parse_time_slices(TIME_SLICES)
+
+    assert parsed[1]["from_timestamp"] == utils.strtime_to_timestamp("01.09.2022 00:10:00")
+    assert parse_time_slices(parsed) == parsed
+    assert "from_timestamp" not in TIME_SLICES[0]
+
+
+def test_slice_index_matches_date_filter():
+    vals = make_time_series()
+    slice_index = TimeSliceIndex(vals.index, TIME_SLICES)
+
+    for time_slice, start, stop in slice_index:
+        expected = utils.date_filter(vals, time_slice["time_range"])
+        pd.testing.assert_series_equal(vals.iloc[start:stop], expected)
+    assert slice_index.positions[2] == (1000, 1000)
+
+
+def test_slice_index_sorted():
+    slice_index = TimeSliceIndex(make_time_series().index, TIME_SLICES)
+
+    assert [time_slice["label"] for time_slice, _, _ in slice_index.sorted()] == \
+        ["early", "late", "outside"]
+
+
+def test_slice_index_across_fall_back(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        # clocks go back from 02:00 EDT to 01:00 EST on 06.11.2022, so 01:00-02:00 repeats
+        start = utils.strtime_to_timestamp("06.11.2022 00:00:00")
+        timestamps = start + 900 * np.arange(20)
+        index = utils.timestamps_to_datetime(timestamps)
+        assert not index.is_monotonic_increasing
+        np.testing.assert_array_equal(utils.datetime_to_timestamps(index), timestamps)
+
+        time_slices = [{"label": "repeated", "color": "red",
+                        "time_range": ["06.11.2022 01:15:00", "06.11.2022 01:45:00"]},
+                       {"label": "across", "color": "blue",
+                        "time_range": ["06.11.2022 01:30:00", "06.11.2022 03:00:00"]}]
+        slice_index = TimeSliceIndex(index, time_slices)
+
+        assert slice_index.positions == [
+            tuple(np.searchsorted(timestamps, [time_slice["from_timestamp"],
+                                               time_slice["to_timestamp"]]))
+            for time_slice in parse_time_slices(time_slices)]
+        # a repeated local time is its first occurrence
+        assert slice_index.positions == [(5, 7), (6, 16)]
+    finally:
+        monkeypatch.undo()
+        time.tzset()
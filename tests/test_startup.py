@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+
+# Dependencies of fetching and plotting, which --help and spec validation must not import
+HEAVY_MODULES = ["matplotlib", "numpy", "pandas", "openshift", "requests"]
+# Seconds --help and spec validation may spend importing f3tch, in a fresh interpreter
+IMPORT_BUDGET = 0.75
+
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+from f3tch import __main__
+try:
+    __main__.main(sys.argv[1:])
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_startup(*args):
+    out = subprocess.run([sys.executable, "-c", STARTUP, *args], capture_output=True,
+                         text=True, check=True).stdout
+    startup = json.loads(out.splitlines()[-1])
+    startup["output"] = "\n".join(out.splitlines()[:-1])
+    return startup
+
+
+def test_help_import_budget():
+    startup = run_startup("--help")
+
+    assert [name for name in HEAVY_MODULES if name in startup["modules"]] == []
+    assert startup["elapsed"] < IMPORT_BUDGET
+
+
+def test_spec_validation_import_budget(tmp_path):
+    spec = {"step_size": 60, "moving_window": 0, "from_timestamp": "12.09.2022 14:00:00",
+            "to_timestamp": "12.09.2022 17:00:00", "metric_list": [{"metric": "a"}]}
+    filename = tmp_path / "spec.json"
+    filename.write_text(json.dumps(spec))
+
+    startup = run_startup("-k", str(tmp_path / "kubeconfig"), "-d", str(filename), "--explain")
+
+    assert "Estimated samples per series" in startup["output"]
+    assert [name for name in HEAVY_MODULES if name in startup["modules"]] == []
+    assert startup["elapsed"] < IMPORT_BUDGET
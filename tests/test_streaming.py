@@ -0,0 +1,166 @@
+import json
+import os
+
+import numpy as np
+import openshift
+import pandas as pd
+import pytest
+
+from f3tch import __main__, cache, core, export, streaming
+from f3tch.series import SeriesSet
+from f3tch.streaming import MetricStream
+
+
+def make_metric(from_timestamp=0, to_timestamp=6000, moving_window=3):
+    return {"metric_name": "up", "from_timestamp": from_timestamp,
+            "to_timestamp": to_timestamp, "step_size": 60, "moving_window": moving_window,
+            "moving_quantiles": [0.5], "save_rolling_stats": True, "max_points": 20}
+
+
+def make_series_set(timestamps, names):
+    return SeriesSet.from_series("up", [({"pod": name}, np.column_stack((timestamps,
+                                                                         timestamps % 7)))
+                                        for name in names])
+
+
+def test_next_range_sized_after_series(monkeypatch):
+    monkeypatch.setattr(streaming, "FIRST_CHUNK_POINTS", 10)
+    metric_stream = MetricStream(make_metric(), memory_bytes=streaming.BYTES_PER_SAMPLE * 40)
+
+    assert metric_stream.next_range() == (0, 540)
+    metric_stream.update(make_series_set(np.arange(0, 541, 60.0), ["a", "b"]))
+    assert metric_stream.next_range() == (600, 1740)
+    metric_stream.next_from = 5400
+    assert metric_stream.next_range() == (5400, 6000)
+    assert metric_stream.next_range() is None
+
+    # the first chunk is held within the budget too
+    metric_stream = MetricStream(make_metric(), memory_bytes=streaming.BYTES_PER_SAMPLE * 4)
+    assert metric_stream.next_range() == (0, 180)
+
+
+def test_update_carries_rolling_window_over(tmp_path):
+    metric = make_metric()
+    timestamps = np.arange(0, 6001, 60.0)
+    metric_stream = MetricStream(metric, memory_bytes=1, basename=str(tmp_path / "up"))
+    for chunk in np.array_split(timestamps, 7):
+        metric_stream.update(make_series_set(chunk, ["a"]))
+    # a series appearing mid-stream starts a new file
+    metric_stream.update(make_series_set(np.array([6060.0]), ["a", "b"]))
+    filenames = metric_stream.close()
+
+    assert [os.path.basename(name) for name in filenames] == \
+        ["up.csv", "up_rolling.csv", "up_part1.csv", "up_part1_rolling.csv"]
+    expected = make_series_set(timestamps, ["a"]).to_dataframe()
+    pd.testing.assert_frame_equal(export.load(filenames[0]), expected, check_freq=False)
+    rolling_df = export.load(filenames[1])
+    np.testing.assert_allclose(rolling_df["moving_avg_up"],
+                               expected["up"].rolling(3).mean(), equal_nan=True)
+    assert list(export.load(filenames[2]).columns) == ['up{pod="a"}', 'up{pod="b"}']
+
+    [(_, decimated_df, rolling_stats), _] = metric_stream.to_dataframes()
+    assert len(decimated_df) <= 3 + 20
+    assert decimated_df.iloc[:, 0].max() == expected["up"].max()
+    assert len(rolling_stats) == len(decimated_df)
+
+
+def write_spec(tmp_path, directory):
+    spec = {"step_size": 60, "moving_window": 5, "from_timestamp": "12.09.2022 14:00:00",
+            "to_timestamp": "12.09.2022 20:00:00", "save_fetched_data": True,
+            "save_rolling_stats": True, "plot_fetched_data": True,
+            "output_directory": str(directory),
+            "metric_list": [{"metric": "up", "plot_filename": str(directory / "up.png"),
+                             "time_slices": [{"label": "all", "color": "red",
+                                              "time_range": ["12.09.2022 14:00:00",
+                                                             "12.09.2022 20:00:00"]}]}]}
+    filename = tmp_path / f"{directory.name}.json"
+    filename.write_text(json.dumps(spec))
+    return str(filename)
+
+
+def load_saved(directory):
+    return [export.load(str(directory / name)) for name in sorted(os.listdir(directory))
+            if name.endswith(".csv")]
+
+
+def test_run_stream_matches_in_memory_run(prometheus_server, kubeconfig, monkeypatch, tmp_path):
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    monkeypatch.setattr(streaming, "FIRST_CHUNK_POINTS", 50)
+    prometheus_server.series = [{"pod": "a"}, {"pod": "b"}]
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "stream").mkdir()
+    common = ["-k", kubeconfig, "-u", prometheus_server.url, "--no-cache", "--headless",
+              "--render-workers", "1"]
+
+    assert __main__.main(common + ["-d", write_spec(tmp_path, tmp_path / "memory")]) == 0
+    assert __main__.main(common + ["-d", write_spec(tmp_path, tmp_path / "stream"),
+                                   "--stream-memory", "0.005"]) == 0
+
+    assert len(prometheus_server.requests) > 2
+    streamed_frames = load_saved(tmp_path / "stream")
+    assert len(streamed_frames) == 2
+    for streamed, fetched in zip(streamed_frames, load_saved(tmp_path / "memory")):
+        pd.testing.assert_frame_equal(streamed, fetched, check_freq=False)
+    assert os.path.exists(tmp_path / "stream" / "up_1.png")
+
+
+def test_run_stream_bypasses_series_cache(prometheus_server, kubeconfig, monkeypatch,
+                                          tmp_path):
+    monkeypatch.setattr(openshift, "get_server_version", lambda: "4.11.0")
+    monkeypatch.setattr(streaming, "FIRST_CHUNK_POINTS", 50)
+    (tmp_path / "stream").mkdir()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the series cache is used by a stream")
+
+    monkeypatch.setattr(cache.SeriesCache, "load", fail)
+    monkeypatch.setattr(cache.SeriesCache, "store", fail)
+    assert __main__.main(["-k", kubeconfig, "-u", prometheus_server.url, "--headless",
+                          "--render-workers", "1", "--cache-dir", str(tmp_path / "cache"),
+                          "-d", write_spec(tmp_path, tmp_path / "stream"),
+                          "--stream-memory", "0.005"]) == 0
+    assert len(load_saved(tmp_path / "stream")) == 2
+
+
+def test_run_stream_rejects_watch(kubeconfig, tmp_path, capsys):
+    (tmp_path / "out").mkdir()
+
+    assert __main__.main(["-k", kubeconfig, "-d", write_spec(tmp_path, tmp_path / "out"),
+                          "--stream-memory", "64", "--watch", "10"]) != 0
+    assert "--stream-memory" in capsys.readouterr().out
+
+
+def test_stream_without_samples(http_prometheus, prometheus_server):
+    prometheus_server.series = []
+    prometheus_obj = http_prometheus()
+    metric = dict(make_metric(), plot_title="up", plot_filename="", time_slices={},
+                  plot_color="blue")
+
+    assert core.stream(prometheus_obj, [metric], 1 << 20, save_data=False,
+                       plot_data=False) == core.ExitStatus.SUCCESS
+
+
+def test_stream_reports_plotting_errors(http_prometheus, tmp_path, capsys):
+    prometheus_obj = http_prometheus()
+    # the discontiguous plot of a metric without time slices fails
+    metrics = [dict(make_metric(), metric_name=name, plot_title=name,
+                    plot_filename=str(tmp_path / f"{name}.png"), time_slices={},
+                    plot_color="blue", plot_time_slices_discontiguous={})
+               for name in ("up", "down")]
+
+    exit_status = core.stream(prometheus_obj, metrics, 1 << 20, save_data=True,
+                              plot_data=True, output_dir=str(tmp_path),
+                              renderer=core.Renderer(headless=True))
+
+    assert exit_status == core.ExitStatus.ERROR
+    assert capsys.readouterr().out.count("Error: unable to render plot.") == 2
+    assert len(load_saved(tmp_path)) == 4
+
+
+@pytest.mark.parametrize("memory_bytes", [1, 1 << 30])
+def test_chunk_points(memory_bytes):
+    points = streaming.chunk_points(memory_bytes, 4)
+
+    assert points >= 1
+    assert points * 4 * streaming.BYTES_PER_SAMPLE <= max(memory_bytes,
+                                                            4 * streaming.BYTES_PER_SAMPLE)
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import f3tch.timeseries as timeseries
+import f3tch.utils as utils
+
+
+def test_values_to_columns():
+    timestamps, values = timeseries.values_to_columns([[1652904485, "1.5"],
+                                                       [1652904500.25, "NaN"],
+                                                       [1652904515, "+Inf"]])
+
+    assert timestamps.dtype == np.float64
+    np.testing.assert_array_equal(timestamps, [1652904485, 1652904500.25, 1652904515])
+    np.testing.assert_array_equal(values, [1.5, np.nan, np.inf])
+
+
+def test_timestamps_to_datetime_matches_local_time():
+    # Spans the 2022 daylight saving time transitions of most time zones
+    timestamps = np.arange(1647000000, 1668000000, 3599.5)
+
+    actual = utils.timestamps_to_datetime(timestamps)
+    expected = pd.DatetimeIndex([datetime.fromtimestamp(int(t)) for t in timestamps])
+
+    assert (actual == expected).all()
+
+
+def test_array_to_dataframe():
+    arr = np.array([[1652904485., 1.], [1652904545., 2.]])
+
+    actual = timeseries.array_to_dataframe(arr, "foo")
+
+    assert list(actual.columns) == ["foo"]
+    assert actual.index.name == "timestamp"
+    assert actual.index[0] == pd.Timestamp(datetime.fromtimestamp(1652904485))
+    np.testing.assert_array_equal(actual["foo"].to_numpy(), [1., 2.])
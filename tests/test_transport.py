@@ -0,0 +1,134 @@
+import base64
+import gzip
+import json
+
+import pytest
+
+from f3tch import exceptions, parser, transport
+
+
+def test_http_transport_query_range(prometheus_server):
+    http = transport.HttpTransport(base_url=prometheus_server.url, token="sha256~secret")
+
+    out = http.get("/api/v1/query_range", params={"query": 'up{job="x"}', "start": 1652904485,
+                                                  "end": 1652904545, "step": "60s"})
+    http.close()
+
+    assert json.loads(out)["data"]["result"][0]["values"][1] == [1652904545, "45"]
+    request = prometheus_server.requests[0]
+    assert request["params"]["query"] == 'up{job="x"}'
+    assert request["authorization"] == "Bearer sha256~secret"
+
+
+def test_http_transport_reuses_connections(prometheus_server):
+    http = transport.HttpTransport(base_url=prometheus_server.url)
+
+    for _ in range(5):
+        http.get("/api/v1/query_range", params={"query": "up", "start": 1, "end": 2,
+                                                "step": "60s"})
+    http.close()
+
+    assert len({request["client"] for request in prometheus_server.requests}) == 1
+
+
+def test_http_transport_failure(prometheus_server):
+    http = transport.HttpTransport(base_url=prometheus_server.url)
+
+    with pytest.raises(exceptions.PrometheusQueryFailure):
+        http.get("/api/v1/unknown", params={})
+    http.close()
+
+
+def test_get_kubeconfig_token(tmp_path):
+    kubeconfig = tmp_path / "kubeconfig"
+    kubeconfig.write_text("""
+apiVersion: v1
+current-context: admin
+contexts:
+- name: admin
+  context: {cluster: c1, user: kube:admin}
+- name: other
+  context: {cluster: c1, user: other}
+users:
+- name: kube:admin
+  user: {token: sha256~admin}
+- name: other
+  user: {client-certificate-data: Zm9v}
+""")
+
+    assert transport.get_kubeconfig_token(str(kubeconfig)) == "sha256~admin"
+    assert transport.get_kubeconfig_token(str(kubeconfig), context="other") is None
+
+
+class ExecResult:
+    def __init__(self, out):
+        self._out = out
+
+    def status(self):
+        return 0
+
+    def out(self):
+        return self._out
+
+
+class FakePrometheusPod:
+    """Stand-in for the Prometheus pod object, returning a canned command output"""
+
+    def __init__(self, out):
+        self.out = out
+        self.commands = []
+
+    def execute(self, cmd_to_exec, auto_raise=True):
+        self.commands.append(cmd_to_exec)
+        return ExecResult(self.out)
+
+
+QUERY_RANGE_BODY = json.dumps({"status": "success", "data": {"resultType": "matrix", "result": [
+    {"metric": {}, "values": [[1652904485 + 60 * i, str(i)] for i in range(1000)]}]}}).encode()
+
+
+def base64_lines(data):
+    encoded = base64.b64encode(data).decode()
+    return "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76)) + "\n"
+
+
+def test_exec_transport_compressed():
+    pod = FakePrometheusPod(base64_lines(gzip.compress(QUERY_RANGE_BODY)))
+    exec_transport = transport.ExecTransport(prometheus_pod=pod, compressed=True)
+
+    with exec_transport.stream("/api/v1/query_range", params={"query": "up"}) as body:
+        status, _, series = parser.parse_query_range(body, chunk_size=1024)
+
+    assert status == "success"
+    assert series[0][1].shape == (1000, 2)
+    assert exec_transport.get("/api/v1/query_range", params={"query": "up"}) == QUERY_RANGE_BODY
+    command = pod.commands[0]
+    assert command[:2] == ["sh", "-c"]
+    assert "Accept-Encoding: gzip" in command[2] and command[2].endswith("| base64")
+    assert len(pod.out) < len(QUERY_RANGE_BODY) / 2
+
+
+def test_exec_transport_compressed_identity_encoding():
+    pod = FakePrometheusPod(base64_lines(QUERY_RANGE_BODY))
+    exec_transport = transport.ExecTransport(prometheus_pod=pod, compressed=True)
+
+    assert exec_transport.get("/api/v1/query_range", params={"query": "up"}) == QUERY_RANGE_BODY
+
+
+@pytest.mark.parametrize("out", ["", "not base64!",
+                                 base64_lines(gzip.compress(QUERY_RANGE_BODY)[:200])])
+def test_exec_transport_compressed_failure(out):
+    exec_transport = transport.ExecTransport(prometheus_pod=FakePrometheusPod(out),
+                                             compressed=True)
+
+    with pytest.raises(exceptions.PrometheusQueryFailure):
+        with exec_transport.stream("/api/v1/query_range", params={"query": "up"}) as body:
+            parser.parse_query_range(body)
+
+
+def test_transport_requires_get():
+    class StreamOnly(transport.Transport):
+        pass
+
+    with pytest.raises(TypeError):
+        StreamOnly()
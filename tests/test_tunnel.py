@@ -0,0 +1,96 @@
+import json
+import os
+import stat
+import sys
+import textwrap
+
+import pytest
+
+from f3tch import exceptions, transport, tunnel
+
+# Stand-in for `oc port-forward pod/<name> <local>:<remote>`, forwarding the local port to
+# the remote port on localhost
+FAKE_OC = textwrap.dedent("""\
+    import socket, socketserver, sys, threading
+    if "pod/fail" in sys.argv:
+        sys.stderr.write("error: pod not found")
+        sys.exit(1)
+    local_port, remote_port = map(int, sys.argv[-1].split(":"))
+
+    def pipe(source, target):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            target.close()
+
+    class Forward(socketserver.BaseRequestHandler):
+        def handle(self):
+            upstream = socket.create_connection(("127.0.0.1", remote_port))
+            thread = threading.Thread(target=pipe, args=(upstream, self.request))
+            thread.start()
+            pipe(self.request, upstream)
+            thread.join()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    socketserver.ThreadingTCPServer(("127.0.0.1", local_port), Forward).serve_forever()
+""")
+
+
+@pytest.fixture
+def fake_oc(tmp_path):
+    script = tmp_path / "forward.py"
+    script.write_text(FAKE_OC)
+    oc_path = tmp_path / "oc"
+    oc_path.write_text(f"#!/bin/sh\nexec {sys.executable} {script} \"$@\"\n")
+    oc_path.chmod(oc_path.stat().st_mode | stat.S_IEXEC)
+    return str(oc_path)
+
+
+def query(tunnel_transport):
+    out = tunnel_transport.get("/api/v1/query_range",
+                               params={"query": "up", "start": 1652904485, "end": 1652904545,
+                                       "step": "60s"})
+    return json.loads(out)["status"]
+
+
+def test_port_forward_reestablished(prometheus_server, fake_oc):
+    port_forward = tunnel.PortForward("openshift-monitoring", "prometheus-k8s-0",
+                                      remote_port=prometheus_server.server_port,
+                                      oc_path=fake_oc, health_check_interval=0).start()
+    tunnel_transport = transport.TunnelTransport(port_forward)
+    local_port = port_forward.local_port
+
+    assert query(tunnel_transport) == "success"
+    assert port_forward.command()[1:] == ["--namespace", "openshift-monitoring", "port-forward",
+                                          "pod/prometheus-k8s-0",
+                                          f"{local_port}:{prometheus_server.server_port}"]
+
+    port_forward.process.kill()
+    port_forward.process.wait()
+    assert not port_forward.healthy()
+    assert query(tunnel_transport) == "success"
+    assert port_forward.restarts == 1
+    assert port_forward.local_port == local_port
+
+    process = port_forward.process
+    tunnel_transport.close()
+    assert process.poll() is not None
+    assert port_forward.process is None
+
+
+def test_port_forward_failure(fake_oc):
+    port_forward = tunnel.PortForward("openshift-monitoring", "fail", oc_path=fake_oc)
+
+    with pytest.raises(exceptions.PortForwardFailure, match="pod not found"):
+        port_forward.start()
+    assert port_forward.process is None
+
+    with pytest.raises(exceptions.PortForwardFailure):
+        tunnel.PortForward("openshift-monitoring", "prometheus-k8s-0",
+                           oc_path=os.devnull + "/oc").start()
@@ -0,0 +1,79 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from f3tch import core, export
+from f3tch.rolling import RollingStats
+from f3tch.series import SeriesSet
+from f3tch.watch import MetricWatch
+
+
+def make_metric(moving_window=3):
+    return {"metric_name": "up", "from_timestamp": 0, "to_timestamp": 600, "step_size": 60,
+            "moving_window": moving_window, "time_slices": [], "plot_title": "up",
+            "plot_filename": "", "plot_color": "blue"}
+
+
+def make_series_set(from_timestamp, to_timestamp, labels=({},)):
+    timestamps = np.arange(from_timestamp, to_timestamp + 1, 60, dtype=float)
+    return SeriesSet.from_series("up", [(dict(_labels), np.column_stack((timestamps,
+                                                                        timestamps / 60 + i)))
+                                        for i, _labels in enumerate(labels)])
+
+
+def test_next_range():
+    metric_watch = MetricWatch(make_metric())
+
+    assert metric_watch.next_range(100030) == (99420, 100020)
+    metric_watch.update(make_series_set(99420, 100020))
+    assert metric_watch.next_range(100050) is None
+    assert metric_watch.next_range(100090) == (100080, 100080)
+    assert metric_watch.next_range(200000) == (199380, 199980)
+
+
+def test_metric_watch_keeps_trailing_window():
+    metric_watch = MetricWatch(make_metric())
+
+    assert metric_watch.update(make_series_set(0, 600)) == 11
+    # the tail overlaps the last sample seen, which is not appended again
+    assert metric_watch.update(make_series_set(600, 1200)) == 10
+
+    time_series_df = metric_watch.to_dataframe()
+    assert len(time_series_df) == 11
+    np.testing.assert_array_equal(time_series_df["up"], np.arange(10, 21))
+    # rolling statistics carry over from the samples that left the window
+    expected = RollingStats(3).append(np.arange(0, 21, dtype=float))
+    rolling_stats = metric_watch.get_rolling_stats()["up"]
+    assert len(rolling_stats) == 11
+    np.testing.assert_allclose(rolling_stats.mean, expected.mean[-11:])
+
+
+def test_metric_watch_new_series():
+    metric_watch = MetricWatch(make_metric(moving_window=0))
+    metric_watch.update(make_series_set(0, 120, labels=[{"pod": "a"}]))
+    metric_watch.update(make_series_set(180, 240, labels=[{"pod": "a"}, {"pod": "b"}]))
+
+    time_series_df = metric_watch.to_dataframe()
+    assert list(time_series_df.columns) == ['up{pod="a"}', 'up{pod="b"}']
+    assert time_series_df['up{pod="b"}'].isna().sum() == 3
+    assert metric_watch.get_rolling_stats() == {}
+
+
+def test_watch_fetches_tail(http_prometheus, prometheus_server, tmp_path, monkeypatch):
+    clock = iter([1652904485, 1652904485 + 120])
+    monkeypatch.setattr(core, "time", SimpleNamespace(time=lambda: next(clock),
+                                                      monotonic=time.monotonic,
+                                                      sleep=lambda seconds: None))
+    prometheus_obj = http_prometheus()
+
+    status = core.watch(prometheus_obj, [make_metric()], interval=0, save_data=True,
+                        plot_data=False, output_dir=str(tmp_path), ticks=2)
+
+    assert status == core.ExitStatus.SUCCESS
+    first, second = (request["params"] for request in prometheus_server.requests)
+    assert int(first["end"]) - int(first["start"]) == 600
+    assert (int(second["start"]), int(second["end"])) == (int(first["end"]) + 60,
+                                                          int(first["end"]) + 120)
+    saved = export.load(str(tmp_path / "up_watch.csv"))
+    assert len(saved) == 11